@@ -0,0 +1,240 @@
+"""
+    asynchronous.py
+
+    Python source file declaring the asynchronous execution API, which runs FORTH programs on an
+    asyncio event loop along with the awaitable builtins that let them perform non-blocking I/O.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+import interpreter
+
+class AsynchronousError(StandardError):
+    """
+        Exception representing misuse of the asynchronous API, such as using it without an asyncio
+        implementation or running an awaitable builtin outside of an event loop.
+    """
+
+    pass
+
+def require_asyncio():
+    """
+        Raises an AsynchronousError if no asyncio implementation is available.
+    """
+
+    if asyncio is None:
+        raise AsynchronousError("Asynchronous execution requires asyncio or trollius")
+
+def suspend(interp, awaitable):
+    """
+        Suspends the program running on an interpreter until the given awaitable completes. This is meant
+        to be called by builtins. The current slice ends right after the builtin returns and the result
+        of the awaitable is pushed to the stack before the program resumes, unless it is None.
+
+        :parameters:
+            interp - The interpreter running the builtin.
+            awaitable - The coroutine or future to wait on.
+    """
+
+    if interp.event_loop is None:
+        raise AsynchronousError("Awaitable builtins can only be used with execute_async")
+
+    interp.pending = awaitable
+    # The dispatch loop ends the slice once the operation count reaches cycle_ops
+    interp.cycle_ops = 0
+
+def sleep(interp):
+    """
+        The sleep operation pops a number of milliseconds and suspends the program for that long.
+    """
+
+    milliseconds = int(interp.stack.pop())
+    suspend(interp, asyncio.sleep(milliseconds / 1000.0, loop=interp.event_loop))
+
+def readline(interp):
+    """
+        The readline operation reads a line from the input stream of the interpreter, an asyncio
+        StreamReader, and pushes it without its line terminator. An empty string is pushed at the end
+        of the stream.
+    """
+
+    if interp.input_stream is None:
+        raise AsynchronousError("The interpreter has no input stream to read from")
+
+    future = asyncio.Future(loop=interp.event_loop)
+
+    def read_done(read):
+        if read.exception() is not None:
+            future.set_exception(read.exception())
+        else:
+            future.set_result(read.result().rstrip("\r\n"))
+
+    asyncio.ensure_future(interp.input_stream.readline(), loop=interp.event_loop).add_done_callback(read_done)
+    suspend(interp, future)
+
+def query(interp):
+    """
+        The query operation pops a request and asks the service of the interpreter about it, pushing the
+        answer.
+    """
+
+    if interp.service is None:
+        raise AsynchronousError("The interpreter has no service to query")
+
+    request = interp.stack.pop()
+    suspend(interp, interp.service.query(request, interp.event_loop))
+
+class LocalService(object):
+    """
+        A stand-in for a remote service, answering queries from a dictionary after a simulated delay
+        without blocking the event loop.
+    """
+
+    answers = None
+    """
+        A dictionary mapping requests to their answers. Unknown requests are answered with an empty string.
+    """
+
+    delay = None
+    """
+        How many seconds each query takes to answer.
+    """
+
+    def __init__(self, answers=None, delay=0.0):
+        self.answers = {} if answers is None else answers
+        self.delay = delay
+
+    def query(self, request, loop):
+        """
+            Answers a request.
+
+            :returns:
+                A future resolving to the answer.
+        """
+
+        future = asyncio.Future(loop=loop)
+        answer = self.answers.get(request, "")
+        loop.call_later(self.delay, lambda: future.done() or future.set_result(answer))
+        return future
+
+commands = {"sleep": sleep, "readline": readline, "query": query}
+"""
+    The awaitable builtins installed by execute_async for any of these words without a command already.
+    They are removed again once the program completes, fails or is cancelled.
+"""
+
+def run(interp, callable, loop=None, slice_ops=100):
+    """
+        Runs a FORTH callable on an event loop. The program runs in slices of slice_ops operations,
+        yielding to the event loop in between and whenever an awaitable builtin suspends it.
+
+        :parameters:
+            interp - The interpreter to run the program on.
+            callable - The callable to run.
+            loop - The event loop to run on, or None for the current event loop.
+            slice_ops - How many operations to run between yielding to the event loop.
+
+        :returns:
+            A future resolving to the final stack of the interpreter once the program completes, or
+            raising the InterpreterRuntimeError it failed with.
+    """
+
+    require_asyncio()
+
+    if loop is None:
+        loop = asyncio.get_event_loop()
+
+    installed = [name for name in commands if name not in interp.commands]
+    for name in installed:
+        interp.commands[name] = commands[name]
+
+    cycle_ops = interp.cycle_ops
+    interp.cycle_time = None
+    interp.event_loop = loop
+    interp.pending = None
+    interp.prepare(callable)
+
+    result = asyncio.Future(loop=loop)
+
+    restored = []
+
+    def restore(future=None):
+        # Only the first of finishing and cancelling restores the interpreter
+        if len(restored) != 0:
+            return
+        restored.append(True)
+
+        interp.event_loop = None
+        interp.pending = None
+        interp.cycle_ops = cycle_ops
+
+        # Commands the program replaced the awaitable builtins with are its own
+        for name in installed:
+            if name in interp.commands and interp.commands[name] is commands[name]:
+                del interp.commands[name]
+
+    def finish(exception=None):
+        restore()
+
+        if exception is not None:
+            result.set_exception(exception)
+        else:
+            result.set_result(interp.stack)
+
+    def resume(awaited, completed):
+        if result.done():
+            return
+
+        if awaited.cancelled():
+            restore()
+            result.cancel()
+            return
+        if awaited.exception() is not None:
+            exception = awaited.exception()
+            finish(interpreter.InterpreterRuntimeError(interp, exception, (type(exception), exception, None)))
+            return
+
+        if awaited.result() is not None:
+            interp.stack.append(awaited.result())
+
+        if completed is True:
+            finish()
+        else:
+            step()
+
+    def step():
+        if result.done():
+            return
+
+        interp.cycle_ops = slice_ops
+        try:
+            completed = interp.update()
+        except StandardError as e:
+            finish(e)
+            return
+
+        # The last operation of the program may have suspended it as well, so it completes once resumed
+        if interp.pending is not None:
+            awaitable = asyncio.ensure_future(interp.pending, loop=loop)
+            interp.pending = None
+            awaitable.add_done_callback(lambda awaited: resume(awaited, completed))
+        elif completed is True:
+            finish()
+        else:
+            loop.call_soon(step)
+
+    # The caller may cancel the program as well
+    result.add_done_callback(restore)
+
+    loop.call_soon(step)
+    return result
@@ -0,0 +1,214 @@
+"""
+    batch.py
+
+    Python source file declaring the batch executor, which spreads many runs of a compiled codeblock
+    across a pool of worker processes.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import multiprocessing
+
+import bytecode
+import compiler
+import interpreter
+
+class RunResult(object):
+    """
+        A class representing the outcome of a single run of a batch.
+    """
+
+    index = None
+    """
+        The position of the input the run was started with.
+    """
+
+    stack = None
+    """
+        The final stack of the run.
+    """
+
+    global_variables = None
+    """
+        The final global variables of the run.
+    """
+
+    command_count = None
+    """
+        How many commands the run executed.
+    """
+
+    reason = None
+    """
+        If the run failed, the repr of the Python exception that made the interpreter fail.
+    """
+
+    error = None
+    """
+        If the run failed, the full report of the InterpreterRuntimeError, including the stack frame
+        snapshots and the disassembly. Otherwise None.
+    """
+
+    def __init__(self, index, stack, global_variables, command_count, reason=None, error=None):
+        self.index = index
+        self.stack = stack
+        self.global_variables = global_variables
+        self.command_count = command_count
+        self.reason = reason
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return "<RunResult %u failed: %s>" % (self.index, self.reason)
+        return "<RunResult %u %r>" % (self.index, self.stack)
+
+_worker_codeblock = None
+"""
+    The codeblock of the current worker process, loaded once by the pool initializer.
+"""
+
+_worker_entry = None
+"""
+    The name of the callable each run of the current worker process starts at.
+"""
+
+_worker_settings = None
+"""
+    A dictionary of interpreter attributes to set before each run of the current worker process.
+"""
+
+def _initialize(serialized, entry, settings):
+    """
+        Initializes a worker process, decoding the codeblock shared by all of its runs.
+    """
+
+    global _worker_codeblock, _worker_entry, _worker_settings
+
+    _worker_codeblock = bytecode.loads(serialized, compiler.Compiler())
+    _worker_entry = entry
+    _worker_settings = settings
+
+def _run(task):
+    """
+        Performs a single run within a worker process.
+
+        :parameters:
+            task - A tuple of the input index, the initial stack and the initial global variables.
+
+        :returns:
+            The RunResult.
+    """
+
+    index, stack, global_variables = task
+
+    interp = interpreter.Interpreter()
+    for name in _worker_settings:
+        setattr(interp, name, _worker_settings[name])
+    interp.register_codeblock(_worker_codeblock)
+
+    interp.stack = list(stack)
+    interp.global_variables = dict(global_variables)
+
+    try:
+        interp.execute(_worker_codeblock.callable_functions[_worker_entry])
+    except interpreter.InterpreterRuntimeError as e:
+        # The exception refers to the interpreter, so it is reported as text
+        return RunResult(index, interp.stack, interp.variables(), interp.command_count, repr(e.reason), str(e))
+
+    return RunResult(index, interp.stack, interp.variables(), interp.command_count)
+
+class BatchExecutor(object):
+    """
+        A class running a callable of a codeblock many times over in a pool of worker processes. The
+        codeblock is serialized once and handed to each worker as it starts, so the tasks only carry
+        their inputs.
+    """
+
+    pool = None
+    """
+        The multiprocessing pool of workers.
+    """
+
+    chunksize = None
+    """
+        How many runs are sent to a worker at a time.
+    """
+
+    def __init__(self, codeblock, entry, processes=None, settings=None, chunksize=1):
+        """
+            :parameters:
+                codeblock - The codeblock to run.
+                entry - The name of the callable each run starts at.
+                processes - How many worker processes to use, or None for one per CPU.
+                settings - A dictionary of interpreter attributes to set before each run, such as
+                    command_maximum or jit_threshold.
+                chunksize - How many runs are sent to a worker at a time.
+        """
+
+        if entry not in codeblock.callable_functions:
+            raise KeyError(entry)
+
+        serialized = bytecode.dumps(codeblock, compiler.Compiler(), "\0" * 20)
+        self.pool = multiprocessing.Pool(processes, _initialize, (serialized, entry, {} if settings is None else dict(settings)))
+        self.chunksize = chunksize
+
+    def map(self, inputs):
+        """
+            Starts a run for each input.
+
+            :parameters:
+                inputs - An iterable of initial stacks, or of tuples of the initial stack and the
+                    initial global variables.
+
+            :returns:
+                A generator producing the RunResult of each run as soon as it finishes, which is not
+                necessarily in the order of the inputs.
+        """
+
+        def tasks():
+            for index, data in enumerate(inputs):
+                if type(data) is tuple:
+                    yield (index, data[0], data[1])
+                else:
+                    yield (index, data, {})
+
+        return self.pool.imap_unordered(_run, tasks(), self.chunksize)
+
+    def close(self):
+        """
+            Shuts the worker processes down once they are done.
+        """
+
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.pool.terminate()
+        self.close()
+
+def run_batch(codeblock, entry, inputs, processes=None, settings=None, chunksize=1):
+    """
+        Runs a callable of a codeblock once for each input across a pool of worker processes.
+
+        :parameters:
+            codeblock - The codeblock to run.
+            entry - The name of the callable each run starts at.
+            inputs - An iterable of initial stacks, or of tuples of the initial stack and the initial
+                global variables.
+            processes - How many worker processes to use, or None for one per CPU.
+            settings - A dictionary of interpreter attributes to set before each run.
+            chunksize - How many runs are sent to a worker at a time.
+
+        :returns:
+            A generator producing the RunResult of each run as soon as it finishes.
+    """
+
+    with BatchExecutor(codeblock, entry, processes, settings, chunksize) as executor:
+        for result in executor.map(inputs):
+            yield result
@@ -0,0 +1,15 @@
+"""
+    benchmarks/__init__.py
+
+    Python package containing performance benchmarks for the FORTH compiler and interpreter.
+    Benchmarks are meant to be run from the application directory, for instance:
+
+        python -m benchmarks.dispatch
+
+    The full suite, which records its results as JSON and compares them against a baseline, lives in
+    benchmarks.suite.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
@@ -0,0 +1,142 @@
+"""
+    benchmarks/compilation.py
+
+    Python source file measuring compile throughput on a generated multi megabyte program, comparing
+    the single pass scanner against the per line regular expression tokenizer it replaced, and the
+    startup time of a program using a few words of the program as a library, compiled up front or
+    lazily.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import re
+import time
+
+import compiler
+import interpreter
+
+DEFINITION = """
+:word%u ( a definition with a comment )
+    0 "total" !
+    begin
+        "total" @ %u + "total" !
+        "total" @ 2 %% 0 = if
+            "even" "total" @ strcat pop
+        else
+            "total" @ 1 - "total" !
+        then
+        "total" @ 1000 >
+    until
+    "total" @ ;
+"""
+
+def generate(definitions):
+    """
+        Generates the benchmark program.
+
+        :parameters:
+            definitions - How many definitions the program should contain.
+    """
+
+    return "".join(DEFINITION % (index, index) for index in range(definitions))
+
+MAIN = """
+:main
+    "word%u" call
+"""
+"""
+    The program using the generated program as a library, calling one of its words. The program ends
+    along with the word, since the definitions do not return. It takes the number of the word.
+"""
+
+def startup(instance, source, main, lazy):
+    """
+        Compiles a library, registers it and runs a program calling a few of its words.
+
+        :parameters:
+            instance - The compiler.
+            source - The source of the library.
+            main - The source of the program.
+            lazy - Whether to compile the library lazily.
+
+        :returns:
+            The statistics of the library codeblock.
+    """
+
+    library = instance.compile_lazy(source) if lazy is True else instance.compile_forth(source)
+    program = instance.compile_forth(main)
+
+    interp = interpreter.Interpreter()
+    interp.command_maximum = 0
+    interp.stack_debug = False
+    interp.register_codeblock(library)
+    interp.register_codeblock(program)
+    interp.execute(program.callable_functions["main"])
+    return library.statistics()
+
+def regex_scan(input):
+    """
+        Tokenizes the input the way the compiler did before the single pass scanner, for reference.
+
+        :returns:
+            The number of tokens.
+    """
+
+    input = re.sub(r"\([^)]*\)", "", input)
+
+    count = 0
+    for line in input.split("\n"):
+        for match in re.finditer(r":.+|\"[^\"]+\"| *\S+ *", line.rstrip().lstrip()):
+            text = match.group(0).rstrip().lstrip()
+            try:
+                int(text)
+            except ValueError:
+                pass
+            count = count + 1
+    return count
+
+def measure(function, repeat):
+    """
+        Runs a function several times.
+
+        :returns:
+            A tuple of the result of the function and the fastest elapsed time in seconds.
+    """
+
+    best = None
+    for iteration in range(repeat):
+        start = time.time()
+        result = function()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main(definitions=20000, repeat=3):
+    source = generate(definitions)
+    instance = compiler.Compiler()
+
+    print("source     %.2f MB" % (len(source) / 1048576.0))
+
+    tokens, elapsed = measure(lambda: len(instance.scan(source)), repeat)
+    print("scan       %.4fs %10.0f tokens/s" % (elapsed, tokens / elapsed))
+    scan_elapsed = elapsed
+
+    tokens, elapsed = measure(lambda: regex_scan(source), repeat)
+    print("regex      %.4fs %10.0f tokens/s (%.2fx)" % (elapsed, tokens / elapsed, elapsed / scan_elapsed))
+
+    for level in (0, 2):
+        instance = compiler.Compiler(level)
+        result, elapsed = measure(lambda: instance.compile_forth(source), repeat)
+        print("compile O%u %.4fs %10.0f tokens/s" % (level, elapsed, tokens / elapsed))
+        print("analysis O%u %u of %u operations proven safe" % (level, instance.safe_operations, instance.analyzed_operations))
+
+    # Only the words numbered below 1000 finish their loop
+    main = MAIN % min(definitions // 2, 999)
+    for lazy in (False, True):
+        statistics, elapsed = measure(lambda: startup(compiler.Compiler(2), source, main, lazy), repeat)
+        print("startup %-6s %.4fs %u of %u definitions compiled" % ("lazy" if lazy is True else "eager", elapsed, statistics["loaded"], statistics["indexed"]))
+
+if __name__ == "__main__":
+    main()
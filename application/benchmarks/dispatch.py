@@ -0,0 +1,75 @@
+"""
+    benchmarks/dispatch.py
+
+    Python source file comparing the throughput of the interpreter's regular dispatch loop
+    against direct threaded execution and the JIT. Threaded code charges basic blocks at once
+    just like the regular loop, so the two are expected to run at about the same speed.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import time
+
+import compiler
+import interpreter
+
+PROGRAM = """
+:main
+    0 "total" !
+    0 "i" !
+    begin
+        "i" @ 1 + "i" !
+        "i" @ 2 %% 0 = if
+            "total" @ "i" @ + "total" !
+        else
+            "total" @ 1 - "total" !
+        then
+        "i" @ %u =
+    until
+    "total" @
+"""
+
+MODES = ("regular", "threaded", "jit")
+"""
+    The execution modes to compare.
+"""
+
+def run(mode, iterations):
+    """
+        Runs the benchmark program once with the given execution mode.
+
+        :parameters:
+            mode - One of the MODES to run the program with.
+            iterations - How many loop iterations the program should perform.
+
+        :returns:
+            A tuple of the number of commands executed and the elapsed time in seconds.
+    """
+
+    block = compiler.Compiler().compile_forth(PROGRAM % iterations)
+
+    interp = interpreter.Interpreter()
+    interp.command_maximum = 0
+    interp.stack_debug = False
+    interp.threaded = mode == "threaded"
+    interp.jit_threshold = 1 if mode == "jit" else None
+    interp.register_codeblock(block)
+
+    start = time.time()
+    interp.execute(block.callable_functions["main"])
+    return interp.command_count, time.time() - start
+
+def main(iterations=20000, repeat=5):
+    results = {}
+
+    for mode in MODES:
+        timings = [run(mode, iterations) for iteration in range(repeat)]
+        results[mode] = min(timing[1] for timing in timings)
+
+    for mode in MODES:
+        print("%-10s %.4fs (%.2fx)" % (mode, results[mode], results["regular"] / results[mode]))
+
+if __name__ == "__main__":
+    main()
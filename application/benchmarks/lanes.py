@@ -0,0 +1,81 @@
+"""
+    benchmarks/lanes.py
+
+    Python source file comparing separate interpreter executions against a single vectorized run
+    over many lanes.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import time
+
+import numpy
+
+import compiler
+import interpreter
+import vectorized
+
+PROGRAMS = {
+    "arithmetic": """
+:main
+    "x" !
+    "x" @ dup * 3 * "x" @ 7 * + 11 - 1000 % "y" !
+    "y" @ 500 > if
+        "y" @ 500 - "y" !
+    then
+    "y" @ "x" @ 3 / +
+""",
+
+    "collatz": """
+:main
+    "n" !
+    0 "steps" !
+    begin
+        "n" @ 1 =
+    while
+        "n" @ 2 % 0 = if
+            "n" @ 2 / "n" !
+        else
+            "n" @ 3 * 1 + "n" !
+        then
+        "steps" @ 1 + "steps" !
+    repeat
+    "steps" @
+""",
+}
+"""
+    The programs to compare. The arithmetic program barely diverges, while the lanes of the collatz
+    program each loop a different number of times.
+"""
+
+def run(source, lanes, sample):
+    codeblock = compiler.Compiler(2).compile_forth(source)
+    main = codeblock.callable_functions["main"]
+    inputs = numpy.arange(1, lanes + 1)
+
+    # Separate executions are timed over a sample of the lanes and extrapolated
+    start = time.time()
+    for lane in range(0, lanes, lanes // sample):
+        interp = interpreter.Interpreter()
+        interp.command_maximum = 0
+        interp.stack_debug = False
+        interp.register_codeblock(codeblock)
+        interp.stack = [int(inputs[lane])]
+        interp.execute(main)
+    serial_time = (time.time() - start) * lanes / sample
+
+    start = time.time()
+    result = vectorized.run_lanes(main, stack=[inputs])
+    lanes_time = time.time() - start
+
+    return serial_time, lanes_time, result.command_count.sum()
+
+def main(lanes=100000, sample=2000):
+    for name in sorted(PROGRAMS):
+        serial_time, lanes_time, commands = run(PROGRAMS[name], lanes, sample)
+        print("%-10s serial %.4fs (estimated), lanes %.4fs (%.2fx, %u commands)" % (name, serial_time, lanes_time, serial_time / lanes_time, commands))
+
+if __name__ == "__main__":
+    main()
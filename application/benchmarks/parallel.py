@@ -0,0 +1,64 @@
+"""
+    benchmarks/parallel.py
+
+    Python source file comparing running a batch of programs serially against the process pool batch
+    executor.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import time
+import multiprocessing
+
+import batch
+import compiler
+import interpreter
+
+PROGRAM = """
+:main
+    "limit" !
+    0 "total" !
+    0 "i" !
+    begin
+        "total" @ "i" @ + "total" !
+        "i" @ 1 + "i" !
+        "i" @ "limit" @ =
+    until
+    "total" @
+"""
+
+SETTINGS = {"command_maximum": 0, "stack_debug": False}
+
+def run_serial(codeblock, inputs):
+    results = []
+    for stack in inputs:
+        interp = interpreter.Interpreter()
+        for name in SETTINGS:
+            setattr(interp, name, SETTINGS[name])
+        interp.register_codeblock(codeblock)
+        interp.stack = list(stack)
+        interp.execute(codeblock.callable_functions["main"])
+        results.append(interp.stack)
+    return results
+
+def main(runs=64, limit=5000):
+    codeblock = compiler.Compiler(2).compile_forth(PROGRAM)
+    inputs = [[limit + index] for index in range(runs)]
+
+    start = time.time()
+    serial = run_serial(codeblock, inputs)
+    serial_time = time.time() - start
+
+    start = time.time()
+    results = sorted(batch.run_batch(codeblock, "main", inputs, settings=SETTINGS, chunksize=4), key=lambda result: result.index)
+    batch_time = time.time() - start
+
+    assert [result.stack for result in results] == serial
+
+    print("serial     %.4fs" % serial_time)
+    print("batch      %.4fs (%.2fx with %u processes)" % (batch_time, serial_time / batch_time, multiprocessing.cpu_count()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+    benchmarks/pooling.py
+
+    Python source file comparing constructing an interpreter for every run against recycling them
+    through an interpreter pool.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import time
+
+import compiler
+import interpreter
+import pool
+
+PROGRAM = """
+:main
+    dup * 3 + "result" !
+    "result" @
+"""
+
+SETTINGS = {"command_maximum": 0, "stack_debug": False}
+
+def construct(count):
+    start = time.time()
+    for index in range(count):
+        interpreter.Interpreter()
+    return count / (time.time() - start)
+
+def run_fresh(codeblock, count):
+    start = time.time()
+    for index in range(count):
+        interp = interpreter.Interpreter()
+        for name in SETTINGS:
+            setattr(interp, name, SETTINGS[name])
+        interp.register_codeblock(codeblock)
+        interp.stack = [index]
+        interp.execute(codeblock.callable_functions["main"])
+        assert interp.stack == [index * index + 3]
+    return count / (time.time() - start)
+
+def run_pooled(codeblock, count):
+    interpreters = pool.InterpreterPool(SETTINGS, [codeblock], maximum_idle=4)
+
+    start = time.time()
+    for index in range(count):
+        assert interpreters.run("main", [index]) == [index * index + 3]
+    return count / (time.time() - start), interpreters.created
+
+def main(count=20000):
+    codeblock = compiler.Compiler(2).compile_forth(PROGRAM)
+
+    print("instances  %10.0f per second" % construct(count))
+    print("fresh      %10.0f runs per second" % run_fresh(codeblock, count))
+
+    pooled, created = run_pooled(codeblock, count)
+    print("pooled     %10.0f runs per second (%u interpreters created)" % (pooled, created))
+
+if __name__ == "__main__":
+    main()
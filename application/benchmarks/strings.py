@@ -0,0 +1,71 @@
+"""
+    benchmarks/strings.py
+
+    Python source file comparing building multi-megabyte strings with strcat by copying them on every
+    concatenation against building them as ropes.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import time
+
+import compiler
+import interpreter
+import ropes
+
+PROGRAM = """
+:main
+    "" "text" !
+    0 "i" !
+    begin
+        "text" @ "0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef" strcat "text" !
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+    "text" @
+"""
+"""
+    The program appending 64 characters to a global variable for each iteration, taking the iteration
+    count.
+"""
+
+def run(codeblock, jit_threshold):
+    interp = interpreter.Interpreter()
+    interp.command_maximum = 0
+    interp.stack_debug = False
+    interp.jit_threshold = jit_threshold
+    interp.register_codeblock(codeblock)
+
+    start = time.time()
+    interp.execute(codeblock.callable_functions["main"])
+    elapsed = time.time() - start
+
+    assert type(interp.stack[-1]) is str
+    return elapsed, len(interp.stack[-1])
+
+def main(megabytes=(1, 2)):
+    minimum_length = ropes.MINIMUM_LENGTH
+
+    for size in megabytes:
+        codeblock = compiler.Compiler(2).compile_forth(PROGRAM % (size * 16384))
+
+        for mode, jit_threshold in (("regular", None), ("jit", 1)):
+            # Making ropes unreachable falls back to copying the string on every concatenation
+            ropes.MINIMUM_LENGTH = 1 << 62
+            try:
+                copying, length = run(codeblock, jit_threshold)
+            finally:
+                ropes.MINIMUM_LENGTH = minimum_length
+            roped, length = run(codeblock, jit_threshold)
+
+            print("%uMB %-8s copying %8.3fs ropes %8.3fs %6.1fx" % (length >> 20, mode, copying, roped, copying / roped))
+
+    # The literals of every codeblock compiled from the same source are shared
+    codeblocks = [compiler.Compiler(2).compile_forth(PROGRAM % 1) for index in range(16)]
+    literals = set(id(value) for codeblock in codeblocks for value in codeblock.constants.values if type(value) is str)
+    print("%u codeblocks share %u literal strings" % (len(codeblocks), len(literals)))
+
+if __name__ == "__main__":
+    main()
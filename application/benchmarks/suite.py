@@ -0,0 +1,476 @@
+"""
+    benchmarks/suite.py
+
+    Python source file declaring the benchmark suite: microbenchmarks of every builtin and of the
+    dispatch loop, macrobenchmarks running realistic FORTH programs and compile throughput cases.
+    Results are written as JSON and can be compared against a stored baseline, for instance:
+
+        python -m benchmarks.suite run --output baseline.json
+        python -m benchmarks.suite run --output results.json
+        python -m benchmarks.suite compare baseline.json results.json
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+
+import compiler
+import interpreter
+
+from benchmarks import compilation
+
+LOOP = """
+:main
+    7 "v" !
+    0 "i" !
+    begin
+%s
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+;
+:leaf
+    return
+"""
+"""
+    The program microbenchmarks run, repeating their snippet within a counted loop. It takes the
+    repeated snippets and the iteration count.
+"""
+
+UNROLL = 16
+"""
+    How many times microbenchmark snippets are repeated within each loop iteration.
+"""
+
+MICRO = [
+    ("strcat", "\"a\" \"b\" strcat pop", 0),
+    ("swap", "1 2 swap pop pop", 0),
+    ("pop", "1 pop", 0),
+    ("dup", "1 dup pop pop", 0),
+    ("random", "random pop", 0),
+    ("+", "7 3 + pop", 0),
+    ("-", "7 3 - pop", 0),
+    ("*", "7 3 * pop", 0),
+    ("/", "7 3 / pop", 0),
+    ("%", "7 3 % pop", 0),
+    ("over", "1 over pop pop", 0),
+    ("rot", "1 2 rot pop pop", 0),
+    ("<", "1 2 < pop", 0),
+    (">", "1 2 > pop", 0),
+    (">=", "1 2 >= pop", 0),
+    ("<=", "1 2 <= pop", 0),
+    ("=", "1 2 = pop", 0),
+    ("if", "0 if nop then", 0),
+    ("else", "1 if nop else nop then", 0),
+    ("jump", "2 jump nop", 0),
+    ("not", "1 not pop", 0),
+    ("call", "\"leaf\" call", 0),
+    ("nop", "nop", 0),
+    ("begin-until", "begin 1 until", 0),
+    ("while-repeat", "0 begin dup while 1 + repeat pop", 0),
+    ("!", "1 \"w\" !", 0),
+    ("@", "\"v\" @ pop", 0),
+    ("print", "1 print", 0),
+    ("_stack", "_stack", 0),
+    ("literal+", "\"v\" @ 3 + pop", 2),
+    ("literal-", "\"v\" @ 3 - pop", 2),
+    ("literal*", "\"v\" @ 3 * pop", 2),
+    ("literal/", "\"v\" @ 3 / pop", 2),
+    ("literal%", "\"v\" @ 3 % pop", 2),
+    ("literal@", "\"v\" @ pop", 2),
+    ("literal!", "\"v\" @ \"w\" !", 2),
+    ("global@", "variable g 1 \"g\" ! \"g\" @ pop", 0),
+    ("global!", "variable g 1 \"g\" !", 0),
+    ("local@", "local l 1 \"l\" ! \"l\" @ pop", 0),
+    ("local!", "local l 1 \"l\" !", 0),
+    ("dup*", "\"v\" @ dup * pop", 2),
+    ("nip", "\"v\" @ \"v\" @ swap pop pop", 2),
+]
+"""
+    The microbenchmarks as tuples of the name, the stack neutral snippet to repeat and the optimization
+    level to compile it at. Superinstructions only exist at higher optimization levels, except for the
+    variable accesses resolved to slots by declaring the variable. The 'call' snippet also covers
+    'return' and the loop around every snippet covers 'begin' and 'until'.
+"""
+
+MODES = ("regular", "threaded", "jit")
+"""
+    The execution modes the dispatch loop is measured in.
+"""
+
+MACRO = {
+    "nested-loops": ("""
+:main
+    0 "total" !
+    0 "i" !
+    begin
+        0 "j" !
+        begin
+            "total" @ "i" @ "j" @ * + "total" !
+            "j" @ 1 + "j" !
+            "j" @ 50 =
+        until
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+;
+""", 20),
+
+    "recursion": ("""
+:main
+    0 "i" !
+    begin
+        12 "fib" call pop
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+;
+:fib
+    dup 2 > if
+        return
+    then
+    dup 1 - "fib" call
+    swap 2 - "fib" call
+    + return
+""", 5),
+
+    "tail-calls": ("""
+:main
+    0 "i" !
+    begin
+        100 "countdown" call
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+;
+:countdown
+    dup 0 = if
+        pop return
+    then
+    1 - "countdown" call
+    return
+""", 50),
+
+    "strings": ("""
+:main
+    0 "i" !
+    begin
+        "" "text" !
+        0 "j" !
+        begin
+            "text" @ "j" @ strcat "," strcat "text" !
+            "j" @ 1 + "j" !
+            "j" @ 32 =
+        until
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+;
+""", 20),
+
+    "string-builder": ("""
+:main
+    0 "i" !
+    begin
+        "" "text" !
+        0 "j" !
+        begin
+            "text" @ "0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef" strcat "text" !
+            "j" @ 1 + "j" !
+            "j" @ 16384 =
+        until
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+;
+""", 2),
+
+    "variables": ("""
+:main
+    0 "a" ! 1 "b" ! 2 "c" !
+    0 "i" !
+    begin
+        "a" @ "b" @ + "c" !
+        "b" @ "c" @ + "a" !
+        "c" @ "a" @ - "b" !
+        "a" @ 1000 %% "a" !
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+;
+""", 2000),
+
+    "variables-declared": ("""
+:main
+    variable a variable b variable c variable i
+    0 "a" ! 1 "b" ! 2 "c" !
+    0 "i" !
+    begin
+        "a" @ "b" @ + "c" !
+        "b" @ "c" @ + "a" !
+        "c" @ "a" @ - "b" !
+        "a" @ 1000 %% "a" !
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+;
+""", 2000),
+
+    "variables-local": ("""
+:main
+    local a local b local c local i
+    0 "a" ! 1 "b" ! 2 "c" !
+    0 "i" !
+    begin
+        "a" @ "b" @ + "c" !
+        "b" @ "c" @ + "a" !
+        "c" @ "a" @ - "b" !
+        "a" @ 1000 %% "a" !
+        "i" @ 1 + "i" !
+        "i" @ %u =
+    until
+;
+""", 2000),
+}
+"""
+    The macrobenchmarks as a dictionary of name to a tuple of the program, taking its iteration count,
+    and the default number of iterations.
+"""
+
+class NullStream(object):
+    """
+        A stream discarding everything written to it, used to silence the printing builtins.
+    """
+
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+def run_program(source, optimization_level=0, mode="regular"):
+    """
+        Compiles and runs a benchmark program to completion.
+
+        :parameters:
+            source - The program source.
+            optimization_level - The optimization level to compile the program at.
+            mode - One of the MODES to run the program with, "integer" to run it on the integer stack or
+                "memoized" to cache the results of its pure callables.
+
+        :returns:
+            A tuple of the number of commands executed and the elapsed time in seconds.
+    """
+
+    block = compiler.Compiler(optimization_level).compile_forth(source)
+
+    interp = interpreter.Interpreter()
+    interp.command_maximum = 0
+    interp.stack_debug = False
+    interp.threaded = mode == "threaded"
+    interp.jit_threshold = 1 if mode == "jit" else None
+    interp.integer_stack = mode == "integer"
+    interp.memoize = 256 if mode == "memoized" else None
+    interp.register_codeblock(block)
+
+    stdout = sys.stdout
+    sys.stdout = NullStream()
+    try:
+        start = time.time()
+        interp.execute(block.callable_functions["main"])
+        elapsed = time.time() - start
+    finally:
+        sys.stdout = stdout
+
+    return interp.command_count, elapsed
+
+def run_exit(iterations):
+    """
+        Measures the 'exit' builtin, which ends the program and therefore cannot be looped.
+
+        :returns:
+            A tuple of the number of commands executed and the elapsed time in seconds.
+    """
+
+    block = compiler.Compiler().compile_forth(":main\n    exit")
+
+    interp = interpreter.Interpreter()
+    interp.command_maximum = 0
+    interp.stack_debug = False
+    interp.register_codeblock(block)
+
+    main = block.callable_functions["main"]
+    start = time.time()
+    for iteration in range(iterations):
+        interp.execute(main)
+    return iterations, time.time() - start
+
+def run_compile(source, optimization_level):
+    """
+        Measures compiling a program.
+
+        :returns:
+            A tuple of the number of tokens compiled and the elapsed time in seconds.
+    """
+
+    instance = compiler.Compiler(optimization_level)
+    tokens = len(instance.scan(source))
+
+    start = time.time()
+    instance.compile_forth(source)
+    return tokens, time.time() - start
+
+def benchmarks(scale=1.0):
+    """
+        Produces every benchmark of the suite.
+
+        :parameters:
+            scale - The factor to scale the default amount of work of every benchmark by.
+
+        :returns:
+            A list of tuples of the benchmark name and a function running it once, returning the
+            number of operations performed and the elapsed time in seconds.
+    """
+
+    result = []
+    loops = max(1, int(500 * scale))
+
+    for name, snippet, level in MICRO:
+        source = LOOP % ("\n".join(["        " + snippet] * UNROLL), loops)
+        result.append(("micro/%s" % name, lambda source=source, level=level: run_program(source, level)))
+    result.append(("micro/exit", lambda: run_exit(loops * UNROLL)))
+
+    # The JIT does not count the commands it runs natively, so count them in the regular loop instead
+    source = LOOP % ("\n".join(["        nop"] * UNROLL), loops * 4)
+    count = run_program(source)[0]
+    for mode in MODES:
+        result.append(("micro/dispatch-%s" % mode, lambda source=source, count=count, mode=mode: (count, run_program(source, 0, mode)[1])))
+
+    for name in sorted(MACRO):
+        source, iterations = MACRO[name]
+        source = source % max(1, int(iterations * scale))
+        for level in (0, 2):
+            result.append(("macro/%s-O%u" % (name, level), lambda source=source, level=level: run_program(source, level)))
+        # Only optimized code gets rid of the variable names the integer stack cannot hold
+        result.append(("macro/%s-O2-integer" % name, lambda source=source: run_program(source, 2, "integer")))
+        # Calls answered from the cache are not counted, so these are compared by their time only
+        result.append(("macro/%s-O2-memoized" % name, lambda source=source: run_program(source, 2, "memoized")))
+
+    source = compilation.generate(max(1, int(2000 * scale)))
+    for level in (0, 2):
+        result.append(("compile/O%u" % level, lambda level=level: run_compile(source, level)))
+
+    return result
+
+def run(pattern=None, repeat=3, scale=1.0):
+    """
+        Runs the benchmark suite.
+
+        :parameters:
+            pattern - A regular expression selecting the benchmarks to run by name, or None to run all.
+            repeat - How many times to run each benchmark. The fastest run is kept.
+            scale - The factor to scale the default amount of work of every benchmark by.
+
+        :returns:
+            A dictionary of the environment the suite ran in and the results of each benchmark.
+    """
+
+    results = {}
+    for name, function in benchmarks(scale):
+        if pattern is not None and re.search(pattern, name) is None:
+            continue
+
+        runs = [function() for iteration in range(repeat)]
+        operations = runs[0][0]
+        seconds = min(elapsed for count, elapsed in runs)
+
+        results[name] = {"operations": operations, "seconds": seconds, "operations_per_second": operations / seconds if seconds > 0 else 0.0}
+        print("%-28s %10.4fs %14.0f ops/s" % (name, seconds, results[name]["operations_per_second"]))
+
+    environment = {"python": platform.python_version(), "implementation": platform.python_implementation(), "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": repeat, "scale": scale}
+    return {"environment": environment, "results": results}
+
+def compare(baseline, current, threshold=0.1):
+    """
+        Compares two sets of results.
+
+        :parameters:
+            baseline - The results to compare against.
+            current - The new results.
+            threshold - How much slower, as a fraction, a benchmark may become before it is considered
+                a regression.
+
+        :returns:
+            A list of tuples of the name, the baseline seconds, the current seconds and the ratio between
+            them for every benchmark that regressed.
+    """
+
+    regressions = []
+    for name in sorted(current["results"]):
+        if name not in baseline["results"]:
+            print("%-28s %10s  %10.4fs   (new)" % (name, "", current["results"][name]["seconds"]))
+            continue
+
+        before = baseline["results"][name]["seconds"]
+        after = current["results"][name]["seconds"]
+        ratio = after / before if before > 0 else 1.0
+
+        status = ""
+        if ratio > 1.0 + threshold:
+            status = "REGRESSION"
+            regressions.append((name, before, after, ratio))
+        elif ratio < 1.0 - threshold:
+            status = "improved"
+
+        print("%-28s %10.4fs %10.4fs %6.2fx %s" % (name, before, after, ratio, status))
+
+    for name in sorted(set(baseline["results"]) - set(current["results"])):
+        print("%-28s %10.4fs %10s   (missing)" % (name, baseline["results"][name]["seconds"], ""))
+
+    return regressions
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description="FORTH interpreter benchmark suite.")
+    commands = parser.add_subparsers(dest="command")
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument("--output", help="The JSON file to write the results to.")
+    run_parser.add_argument("--filter", help="A regular expression selecting the benchmarks to run.")
+    run_parser.add_argument("--repeat", type=int, default=3, help="How many times to run each benchmark.")
+    run_parser.add_argument("--scale", type=float, default=1.0, help="The factor to scale the amount of work by.")
+
+    compare_parser = commands.add_parser("compare", help="Compare results against a baseline.")
+    compare_parser.add_argument("baseline", help="The JSON file of the baseline results.")
+    compare_parser.add_argument("current", help="The JSON file of the new results.")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="The fraction a benchmark may slow down by.")
+
+    arguments = parser.parse_args(arguments)
+
+    if arguments.command == "run":
+        results = run(arguments.filter, arguments.repeat, arguments.scale)
+        if arguments.output is not None:
+            with open(arguments.output, "w") as handle:
+                json.dump(results, handle, indent=4, sort_keys=True)
+        return 0
+
+    with open(arguments.baseline, "r") as handle:
+        baseline = json.load(handle)
+    with open(arguments.current, "r") as handle:
+        current = json.load(handle)
+
+    regressions = compare(baseline, current, arguments.threshold)
+    if len(regressions) != 0:
+        print("%u benchmark(s) regressed by more than %u%%" % (len(regressions), arguments.threshold * 100))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,16 +12,25 @@
 import struct
 import random
 
+import ropes
+import compiler
+
+UNSET = object()
+"""
+    The value of a variable slot that has not been stored to yet.
+"""
+
 def strcat(interp):
     """
         strcat operator takes the two values at the top of the stack and concatenates them as a string.
+        Long strings are built as ropes, so that appending to them in a loop does not copy them.
 
         FIXME: Should we convert non-str types when doing the concat or throw an error?
     """
 
-    rhs = str(interp.stack.pop())
-    lhs = str(interp.stack.pop())
-    interp.stack.append(lhs + rhs)
+    rhs = interp.stack.pop()
+    lhs = interp.stack.pop()
+    interp.stack.append(ropes.concatenate(lhs, rhs))
 
 def swap(interp):
     """
@@ -127,10 +136,12 @@ def store(interp):
     value = interp.stack.pop()
 
     # First we look at locals, if its not there, just try to assign to globals
-    if key not in interp.local_variables:
-        interp.global_variables[key] = value
-    else:
+    if key in interp.local_variables:
         interp.local_variables[key] = value
+    elif key in interp.variable_table.slots:
+        assign_global(interp, interp.variable_table.slots[key], value)
+    else:
+        interp.global_variables[key] = value
 
 def fetch(interp):
     """
@@ -140,10 +151,12 @@ def fetch(interp):
 
     key = interp.stack.pop()
 
-    if key not in interp.local_variables:
-        interp.stack.append(interp.global_variables[key])
-    else:
+    if key in interp.local_variables:
         interp.stack.append(interp.local_variables[key])
+    elif key in interp.variable_table.slots:
+        fetch_global(interp, interp.variable_table.slots[key])
+    else:
+        interp.stack.append(interp.global_variables[key])
 
 def jump(interp):
     """
@@ -160,33 +173,14 @@ def ifblock(interp):
         a certain codepath if it happens to be true. A different codepath if false and there
         is an 'else' operation.
 
-        FIXME: This will jump to the wrong locations if we have nested if's
+        The location of the matching 'else' or 'then' is resolved by the compiler.
     """
 
     condition = bool(interp.stack.pop())
 
-    # Jump to the else or the then
+    # Jump past the else or the then
     if condition is False:
-        jump_offset = 0
-
-        remaining_operations = interp.callable.payload[interp.instruction_pointer:]
-
-        try:
-            else_offset = remaining_operations.index("else")
-        except ValueError:
-            else_offset = None
-
-        try:
-            then_offset = remaining_operations.index("then")
-        except ValueError:
-            then_offset = None
-
-        if else_offset is not None and then_offset is not None and else_offset < then_offset:
-            jump_offset = else_offset + 1
-        elif else_offset is not None and then_offset is not None and then_offset < else_offset:
-            jump_offset = then_offset + 1
-
-        interp.jump_target = interp.instruction_pointer + jump_offset
+        interp.jump_target = interp.callable.branch_targets[interp.instruction_pointer]
 
 def elseblock(interp):
     """
@@ -194,9 +188,7 @@ def elseblock(interp):
         to handle jumping over the false codepath.
     """
 
-    remaining_operations = interp.callable.payload[interp.instruction_pointer:]
-    then_offset = remaining_operations.index("then")
-    interp.jump_target = interp.instruction_pointer + (then_offset + 1)
+    interp.jump_target = interp.callable.branch_targets[interp.instruction_pointer]
 
 def equals(interp):
     """
@@ -255,10 +247,11 @@ def less_than_equal(interp):
 
 def begin(interp):
     """
-        The begin operation begins a loop.
+        The begin operation begins a loop. The loop ends refer back to it through jump
+        targets resolved by the compiler, so there is nothing to do at run time.
     """
 
-    interp.loop_starts.append(interp.instruction_pointer + 1)
+    pass
 
 def until(interp):
     """
@@ -268,10 +261,8 @@ def until(interp):
 
     condition = bool(interp.stack.pop())
 
-    if condition:
-        interp.loop_starts.pop()
-    else:
-        interp.jump_target = interp.loop_starts[len(interp.loop_starts) - 1]
+    if condition is False:
+        interp.jump_target = interp.callable.branch_targets[interp.instruction_pointer]
 
 def print_stack(interp):
     """
@@ -335,16 +326,14 @@ def whileblock(interp):
     top = bool(interp.stack.pop())
 
     if top:
-        remaining_operations = interp.callable.payload[interp.instruction_pointer:]
-        then_offset = remaining_operations.index("then")
-        interp.jump_target = interp.instruction_pointer + (then_offset + 1)
+        interp.jump_target = interp.callable.branch_targets[interp.instruction_pointer]
 
 def repeat(interp):
     """
         The repeat operation jumps back to the beginning of the loop we are currently in.
     """
 
-    interp.jump_target = interp.loop_starts[len(interp.loop_starts) - 1]
+    interp.jump_target = interp.callable.branch_targets[interp.instruction_pointer]
 
 def call(interp):
     """
@@ -353,15 +342,252 @@ def call(interp):
 
     name = interp.stack.pop()
     callable = interp.callable_functions[name]
-    interp.call_stack.append({"eip": interp.instruction_pointer, "callable": interp.callable})
+
+    # Callables compiled lazily may have brought new opcodes along
+    if len(interp.dispatch_table) < len(compiler.opcodes.names):
+        interp.extend_dispatch_table()
+
+    # Pure callables may have been called with the same inputs before
+    if interp.memoize is not None and interp.memoized_call(callable, False) is True:
+        return
+
+    interp.call_stack.append((interp.instruction_pointer, interp.callable, interp.frame))
     interp.jump_target = 0
     interp.callable = callable
+    interp.frame = [UNSET] * len(callable.local_variables)
 
 def returnop(interp):
     """
         The return operation returns from the current subroutine.
     """
 
-    return_to = interp.call_stack.pop()
-    interp.callable = return_to["callable"]
-    interp.jump_target = return_to["eip"] + 1
+    if interp.memoize is not None:
+        interp.memoized_return()
+
+    # The returns tail calls skipped at this depth are reached along with this one. Should the budget run out
+    # at one of them, the dispatch loop fails right after
+    tail_returns = interp.tail_returns
+    if len(tail_returns) != 0:
+        depth = len(interp.call_stack)
+        while len(tail_returns) != 0 and tail_returns[-1][0] >= depth:
+            interp.charge_tail_returns(tail_returns.pop()[2])
+
+    instruction_pointer, interp.callable, interp.frame = interp.call_stack.pop()
+    interp.jump_target = instruction_pointer + 1
+
+def call_direct(interp, link):
+    """
+        Superinstruction for a call the linker resolved to a callable. It stands for pushing the name of
+        the callable and calling it, and is charged to the command budget as both. Should the budget run
+        out at the push, it only pushes the name.
+    """
+
+    if interp.command_maximum > 0 and interp.command_count >= interp.command_maximum:
+        interp.stack.append(link.name)
+        return
+    interp.command_count = interp.command_count + 1
+
+    # Callables registered since the last call may have replaced the linked one
+    callable = link.callable
+    if link.version != interp.callable_functions.version:
+        callable = link.resolve(interp.callable_functions)
+        if len(interp.dispatch_table) < len(compiler.opcodes.names):
+            interp.extend_dispatch_table()
+
+    if interp.memoize is not None and interp.memoized_call(callable, False) is True:
+        return
+
+    interp.call_stack.append((interp.instruction_pointer, interp.callable, interp.frame))
+    interp.jump_target = 0
+    interp.callable = callable
+    interp.frame = [UNSET] * len(callable.local_variables)
+
+def tail_call(interp, link):
+    """
+        Superinstruction for a call the linker resolved to a callable, right before a return. Rather than
+        returning to the caller only to return again, control is transferred to the callable in place of
+        the caller, so the call stack does not grow. It is charged to the command budget as the push, the
+        call and the return it stands for. The return is only charged once the callable returns, as it would
+        have been reached, and should the budget run out at the push, it only pushes the name.
+    """
+
+    if interp.command_maximum > 0 and interp.command_count >= interp.command_maximum:
+        interp.stack.append(link.name)
+        return
+    interp.command_count = interp.command_count + 1
+
+    callable = link.callable
+    if link.version != interp.callable_functions.version:
+        callable = link.resolve(interp.callable_functions)
+        if len(interp.dispatch_table) < len(compiler.opcodes.names):
+            interp.extend_dispatch_table()
+
+    # A cached result is returned to the caller right away. The skipped return is charged to the calls pending
+    # before this one, not to the result of the callable itself
+    pending = len(interp.memo_pending)
+    if interp.memoize is not None and interp.memoized_call(callable, True) is True:
+        interp.command_count = interp.command_count + 1
+        returnop(interp)
+        return
+
+    # Tail calls repeated at the same depth, as in tail recursion, owe their returns together
+    tail_returns = interp.tail_returns
+    depth = len(interp.call_stack)
+    if len(tail_returns) != 0 and tail_returns[-1][0] == depth and tail_returns[-1][1] == pending:
+        tail_returns[-1] = (depth, pending, tail_returns[-1][2] + 1)
+    else:
+        tail_returns.append((depth, pending, 1))
+
+    interp.jump_target = 0
+    interp.callable = callable
+    interp.frame = [UNSET] * len(callable.local_variables)
+
+def inline(interp, name):
+    """
+        Superinstruction marking where the linker inlined a callable, whose code follows it. It stands
+        for pushing the name of the callable and calling it, and is charged to the command budget as
+        both. Should the budget run out at the push, it pushes the name.
+    """
+
+    if interp.command_maximum > 0 and interp.command_count >= interp.command_maximum:
+        interp.stack.append(name)
+        return
+    interp.command_count = interp.command_count + 1
+
+def add_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the + operator.
+    """
+
+    interp.stack.append(int(interp.stack.pop()) + value)
+
+def sub_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the - operator.
+    """
+
+    interp.stack.append(int(interp.stack.pop()) - value)
+
+def mult_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the * operator.
+    """
+
+    interp.stack.append(int(interp.stack.pop()) * value)
+
+def div_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the / operator.
+    """
+
+    interp.stack.append(int(interp.stack.pop()) / value)
+
+def mod_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the % operator.
+    """
+
+    interp.stack.append(int(interp.stack.pop()) % value)
+
+def square(interp, value):
+    """
+        Superinstruction for dup followed by the * operator.
+    """
+
+    top = int(interp.stack.pop())
+    interp.stack.append(top * top)
+
+def nip(interp, value):
+    """
+        Superinstruction for swap followed by pop, throwing away the element behind the top of
+        the stack.
+    """
+
+    top = interp.stack.pop()
+    interp.stack.pop()
+    interp.stack.append(top)
+
+def fetch_literal(interp, key):
+    """
+        Superinstruction for a string literal followed by the fetch operator (@).
+    """
+
+    if key in interp.local_variables:
+        interp.stack.append(interp.local_variables[key])
+    elif key in interp.variable_table.slots:
+        fetch_global(interp, interp.variable_table.slots[key])
+    else:
+        interp.stack.append(interp.global_variables[key])
+
+def store_literal(interp, key):
+    """
+        Superinstruction for a string literal followed by the store operator (!).
+    """
+
+    value = interp.stack.pop()
+
+    if key in interp.local_variables:
+        interp.local_variables[key] = value
+    elif key in interp.variable_table.slots:
+        assign_global(interp, interp.variable_table.slots[key], value)
+    else:
+        interp.global_variables[key] = value
+
+def assign_global(interp, slot, value):
+    """
+        Assigns a value to the slot of a declared global variable, growing the slots of the interpreter
+        if the variable was declared after they were reserved.
+    """
+
+    try:
+        interp.global_slots[slot] = value
+    except IndexError:
+        interp.reserve_slots()
+        interp.global_slots[slot] = value
+
+def read_global(interp, slot):
+    """
+        Reads the slot of a declared global variable. A variable that has not been stored to yet is looked
+        up in the global variables by name instead, so that they may be used to set its initial value.
+    """
+
+    try:
+        value = interp.global_slots[slot]
+    except IndexError:
+        value = UNSET
+
+    if value is UNSET:
+        value = interp.global_variables[interp.variable_table.names[slot]]
+    return value
+
+def fetch_global(interp, slot):
+    """
+        Superinstruction for fetching a declared global variable.
+    """
+
+    interp.stack.append(read_global(interp, slot))
+
+def store_global(interp, slot):
+    """
+        Superinstruction for storing to a declared global variable.
+    """
+
+    assign_global(interp, slot, interp.stack.pop())
+
+def fetch_local(interp, slot):
+    """
+        Superinstruction for fetching a local variable of the current call.
+    """
+
+    value = interp.frame[slot]
+
+    if value is UNSET:
+        raise KeyError(interp.callable.local_variables[slot])
+    interp.stack.append(value)
+
+def store_local(interp, slot):
+    """
+        Superinstruction for storing to a local variable of the current call.
+    """
+
+    interp.frame[slot] = interp.stack.pop()
@@ -0,0 +1,434 @@
+"""
+    bytecode.py
+
+    Python source file declaring the binary serialization of compiled codeblocks, along with the
+    on-disk cache built on top of it.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import os
+import sys
+import mmap
+import array
+import struct
+import hashlib
+
+import linker
+import builtins
+import integers
+import compiler
+import interpreter
+
+class BytecodeError(Exception):
+    """
+        Exception representing bytecode that cannot be written or loaded, including bytecode
+        produced from a different source or by a different compiler.
+    """
+
+    pass
+
+MAGIC = "FTHC"
+"""
+    The magic bytes at the start of every bytecode file.
+"""
+
+FORMAT_VERSION = 2
+"""
+    The version of the bytecode format. This must be bumped whenever the layout below changes.
+
+    The layout is, with all integers being unsigned 32 bit little endian:
+        header: magic, format version, 20 byte compiler fingerprint, 20 byte source hash
+        names: count, then each opcode name as a value
+        constants: count, then each constant as a value
+        index: count, then each callable name as a value followed by its record offset and length
+        records: for each callable, the opcode count, opcodes, operands, branch target count, the
+            (instruction pointer, target) pairs, then the count and names of its local variables and the
+            count and names of its global variables
+
+    Values are a one byte type tag followed by a length and the encoded data. Opcodes within the
+    file index the names table and global variable slots are stored by name, so they are independent
+    of the opcodes and slots of the process that wrote them. Linked calls are stored by the name of the
+    callable they refer to within the codeblock.
+"""
+
+_header = struct.Struct("<4sI20s20s")
+_integer = struct.Struct("<I")
+_value = struct.Struct("<cI")
+
+_fingerprints = {}
+"""
+    A dictionary caching the fingerprint for each compiler configuration.
+"""
+
+_fingerprinted = (compiler, builtins, linker, integers, interpreter)
+"""
+    The modules whose source code the fingerprint covers: the compiler with its opcode table, and every
+    module defining opcodes or superinstructions the compiler and the linker emit.
+"""
+
+def fingerprint(instance):
+    """
+        Produces the fingerprint of a compiler, which changes whenever its configuration or the source code
+        of the compiler or of any module defining opcodes changes.
+
+        :parameters:
+            instance - The compiler instance.
+
+        :returns:
+            The 20 byte fingerprint.
+    """
+
+    configuration = "%u %r" % (FORMAT_VERSION, instance.optimization_level)
+
+    if configuration not in _fingerprints:
+        digest = hashlib.sha1()
+        for module in _fingerprinted:
+            path = os.path.splitext(module.__file__)[0] + ".py"
+            with open(path, "rb") as handle:
+                digest.update(handle.read())
+        digest.update(configuration)
+        _fingerprints[configuration] = digest.digest()
+
+    return _fingerprints[configuration]
+
+def encode_value(value):
+    """
+        Encodes a name or constant as a tagged value.
+    """
+
+    if value is None:
+        return _value.pack("n", 0)
+    elif type(value) is compiler.Link:
+        data = encode_value(value.name)
+        return _value.pack("c", len(data)) + data
+    elif type(value) is compiler.GlobalSlot:
+        # The name of the variable is nested as a value of its own
+        data = encode_value(value.name)
+        return _value.pack("g", len(data)) + data
+    elif type(value) is int or type(value) is long:
+        data = str(value)
+        return _value.pack("i", len(data)) + data
+    elif type(value) is str:
+        return _value.pack("s", len(value)) + value
+    elif type(value) is unicode:
+        data = value.encode("utf-8")
+        return _value.pack("u", len(data)) + data
+
+    raise BytecodeError("Cannot serialize constant %r" % value)
+
+def decode_value(buffer, offset, variables=None):
+    """
+        Decodes a value from the buffer.
+
+        :parameters:
+            buffer - The buffer to decode from.
+            offset - The offset of the value.
+            variables - The VariableTable to give declared global variables their slot in, if the value
+                may be one.
+
+        :returns:
+            A tuple of the value and the offset right after it.
+    """
+
+    tag, length = _value.unpack_from(buffer, offset)
+    offset = offset + _value.size
+    data = buffer[offset:offset + length]
+    if len(data) != length:
+        raise BytecodeError("Truncated bytecode")
+
+    if tag == "n":
+        value = None
+    elif tag == "i":
+        value = int(data)
+    elif tag == "s":
+        value = intern(data)
+    elif tag == "u":
+        value = data.decode("utf-8")
+    elif tag == "c":
+        value = compiler.Link(decode_value(data, 0)[0])
+    elif tag == "g" and variables is not None:
+        name = decode_value(data, 0)[0]
+        value = compiler.GlobalSlot(variables.lookup(name), name)
+    else:
+        raise BytecodeError("Unknown value tag %r" % tag)
+
+    return value, offset + length
+
+def read_count(buffer, offset):
+    """
+        Decodes the count of the values following it, which must fit into the rest of the buffer.
+
+        :parameters:
+            buffer - The buffer to decode from.
+            offset - The offset of the count.
+
+        :returns:
+            The count.
+    """
+
+    count = _integer.unpack_from(buffer, offset)[0]
+    if count * _value.size > len(buffer) - offset - _integer.size:
+        raise BytecodeError("Truncated bytecode")
+    return count
+
+def encode_array(values):
+    """
+        Encodes a sequence of integers as little endian 32 bit integers.
+    """
+
+    values = array.array("i", values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tostring()
+
+def decode_array(data):
+    """
+        Decodes little endian 32 bit integers into an array.
+    """
+
+    values = array.array("i")
+    values.fromstring(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def dumps(codeblock, instance, source_hash):
+    """
+        Serializes a codeblock.
+
+        :parameters:
+            codeblock - The codeblock to serialize.
+            instance - The compiler instance the codeblock was produced by.
+            source_hash - The 20 byte hash of the source the codeblock was produced from.
+
+        :returns:
+            The serialized codeblock as a string.
+    """
+
+    # Only store the names this codeblock actually uses, renumbered locally
+    local_opcodes = {compiler.OPCODE_NUMBER: compiler.OPCODE_NUMBER, compiler.OPCODE_STRING: compiler.OPCODE_STRING}
+    names = ["<number>", "<string>"]
+
+    records = []
+    for name in codeblock.callable_functions:
+        callable = codeblock.callable_functions[name]
+        if callable.constants is not codeblock.constants:
+            raise BytecodeError("Callable '%s' does not use the constant pool of its codeblock" % name)
+
+        code = []
+        for opcode in callable.code:
+            if opcode not in local_opcodes:
+                local_opcodes[opcode] = len(names)
+                names.append(compiler.opcodes.names[opcode])
+            code.append(local_opcodes[opcode])
+
+        targets = []
+        for index in sorted(callable.branch_targets):
+            targets.append(index)
+            targets.append(callable.branch_targets[index])
+
+        record = [_integer.pack(len(code)), encode_array(code), encode_array(callable.operands), _integer.pack(len(targets) / 2), encode_array(targets)]
+        record.append(_integer.pack(len(callable.local_variables)))
+        record.extend(encode_value(variable) for variable in callable.local_variables)
+        record.append(_integer.pack(len(callable.global_variables)))
+        record.extend(encode_value(variable) for variable in callable.global_variables)
+        records.append((name, "".join(record)))
+
+    output = [_header.pack(MAGIC, FORMAT_VERSION, fingerprint(instance), source_hash)]
+
+    output.append(_integer.pack(len(names)))
+    output.extend(encode_value(name) for name in names)
+
+    output.append(_integer.pack(len(codeblock.constants.values)))
+    output.extend(encode_value(value) for value in codeblock.constants.values)
+
+    # The record offsets are relative to the end of the index
+    output.append(_integer.pack(len(records)))
+    offset = 0
+    for name, record in records:
+        output.append(encode_value(name) + _integer.pack(offset) + _integer.pack(len(record)))
+        offset = offset + len(record)
+
+    output.extend(record for name, record in records)
+    return "".join(output)
+
+def loads(buffer, instance, source_hash=None):
+    """
+        Loads a serialized codeblock. Only the header, names, constants and index are decoded up front,
+        each callable is decoded the first time it is looked up.
+
+        :parameters:
+            buffer - The serialized codeblock, which may be a string or an mmap.
+            instance - The compiler instance the codeblock must have been produced by.
+            source_hash - The 20 byte hash the source must have, or None to accept any source.
+
+        :returns:
+            The CodeBlock, whose callable_functions is a LazyCallableTable.
+    """
+
+    if len(buffer) < _header.size:
+        raise BytecodeError("Truncated bytecode")
+
+    magic, version, compiler_fingerprint, stored_source_hash = _header.unpack_from(buffer, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise BytecodeError("Unsupported bytecode format")
+    if compiler_fingerprint != fingerprint(instance):
+        raise BytecodeError("Bytecode was produced by a different compiler")
+    if source_hash is not None and stored_source_hash != source_hash:
+        raise BytecodeError("Bytecode was produced from a different source")
+
+    offset = _header.size
+
+    try:
+        count = read_count(buffer, offset)
+        offset = offset + _integer.size
+        remap = array.array("i")
+        for iteration in range(count):
+            name, offset = decode_value(buffer, offset)
+            remap.append(compiler.opcodes.lookup(name))
+
+        constants = compiler.ConstantPool()
+        count = read_count(buffer, offset)
+        offset = offset + _integer.size
+        for iteration in range(count):
+            value, offset = decode_value(buffer, offset, instance.variables)
+            constants.indices.setdefault((type(value), value), len(constants.values))
+            constants.values.append(value)
+
+        index = []
+        count = read_count(buffer, offset)
+        offset = offset + _integer.size
+        for iteration in range(count):
+            name, offset = decode_value(buffer, offset)
+            record_offset, record_length = struct.unpack_from("<II", buffer, offset)
+            offset = offset + 2 * _integer.size
+            index.append((name, record_offset, record_length))
+    except (struct.error, ValueError) as e:
+        raise BytecodeError("Corrupt bytecode: %s" % e)
+
+    identity = list(remap) == range(len(remap))
+
+    def load_callable(name, start, length):
+        # Callables are decoded long after the header was checked, so a damaged file only shows up now
+        try:
+            return decode_callable(name, start, length)
+        except (struct.error, ValueError, IndexError) as e:
+            raise BytecodeError("Corrupt bytecode for callable '%s': %s" % (name, e))
+
+    def decode_callable(name, start, length):
+        data = buffer[start:start + length]
+        if len(data) != length:
+            raise BytecodeError("Truncated bytecode for callable '%s'" % name)
+        count = _integer.unpack_from(data, 0)[0]
+
+        code = decode_array(data[4:4 + count * 4])
+        if identity is False:
+            code = array.array("i", [remap[opcode] for opcode in code])
+
+        result = compiler.Callable([], name, None, constants)
+        result.code = code
+        result.operands = decode_array(data[4 + count * 4:4 + count * 8])
+        if len(result.code) != count or len(result.operands) != count:
+            raise BytecodeError("Truncated bytecode for callable '%s'" % name)
+
+        offset = 4 + count * 8
+        count = _integer.unpack_from(data, offset)[0]
+        targets = decode_array(data[offset + 4:offset + 4 + count * 8])
+        if len(targets) != count * 2:
+            raise BytecodeError("Truncated bytecode for callable '%s'" % name)
+        for position in range(0, len(targets), 2):
+            result.branch_targets[targets[position]] = targets[position + 1]
+
+        offset = offset + 4 + count * 8
+        for variables in (result.local_variables, result.global_variables):
+            count = read_count(data, offset)
+            offset = offset + _integer.size
+            for iteration in range(count):
+                variable, offset = decode_value(data, offset)
+                variables.append(variable)
+
+        # Declared globals get their slot in the table of the compiler
+        for variable in result.global_variables:
+            instance.variables.lookup(variable)
+
+        # The unchecked code is not stored, since it depends on the analysis
+        compiler.analyze(result)
+        return result
+
+    loaders = {}
+    for name, record_offset, record_length in index:
+        loaders[name] = lambda name=name, start=offset + record_offset, length=record_length: load_callable(name, start, length)
+
+    table = compiler.LazyCallableTable(loaders)
+    for value in constants.values:
+        if type(value) is compiler.Link:
+            value.table = table
+
+    return compiler.CodeBlock(table, constants, instance.variables)
+
+def cache_path(source_path, cache_directory=None):
+    """
+        Determines where the bytecode for a source file is cached.
+
+        :parameters:
+            source_path - The path of the FORTH source file.
+            cache_directory - The directory to cache bytecode in. If None, the bytecode is written next to
+                the source file.
+    """
+
+    if cache_directory is None:
+        return source_path + ".fthc"
+
+    name = hashlib.sha1(os.path.abspath(source_path)).hexdigest()
+    return os.path.join(cache_directory, "%s.fthc" % name)
+
+def compile_file(source_path, instance=None, cache_directory=None):
+    """
+        Compiles a FORTH source file, going through the bytecode cache. The cached bytecode is used if it
+        was produced from the same source by the same compiler. Otherwise the source is compiled and the
+        bytecode is written to the cache.
+
+        :parameters:
+            source_path - The path of the FORTH source file.
+            instance - The compiler instance to use. If None, a default compiler is used.
+            cache_directory - The directory to cache bytecode in. If None, the bytecode is written next to
+                the source file.
+
+        :returns:
+            The compiled CodeBlock.
+    """
+
+    if instance is None:
+        instance = compiler.Compiler()
+
+    with open(source_path, "rb") as handle:
+        source = handle.read()
+    source_hash = hashlib.sha1(source).digest()
+
+    path = cache_path(source_path, cache_directory)
+
+    try:
+        with open(path, "rb") as handle:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return loads(buffer, instance, source_hash)
+    except (IOError, OSError, ValueError, mmap.error, BytecodeError):
+        pass
+
+    codeblock = instance.compile_forth(source)
+
+    # Write to a temporary file first so that readers never see partial bytecode
+    try:
+        if cache_directory is not None and not os.path.isdir(cache_directory):
+            os.makedirs(cache_directory)
+
+        temporary_path = "%s.%u.tmp" % (path, os.getpid())
+        with open(temporary_path, "wb") as handle:
+            handle.write(dumps(codeblock, instance, source_hash))
+        os.rename(temporary_path, path)
+    except (IOError, OSError):
+        pass
+
+    return codeblock
@@ -9,8 +9,10 @@
     more information.
 """
 
-import re
+import copy
+import array
 import string
+import itertools
 
 class CompilerError(Exception):
     """
@@ -19,6 +21,47 @@ class CompilerError(Exception):
 
     pass
 
+TOKEN_DEFINITION = 0
+"""
+    The kind of a token declaring a callable, such as ':main'.
+"""
+
+TOKEN_NUMBER = 1
+"""
+    The kind of a token representing a number.
+"""
+
+TOKEN_STRING = 2
+"""
+    The kind of a token representing a quoted string.
+"""
+
+TOKEN_WORD = 3
+"""
+    The kind of any other token, naming a command.
+"""
+
+class Token(object):
+    """
+        A class representing a single token of FORTH source. Its fields are the kind (one of the TOKEN_*
+        constants), the text, the value (the number, the string without quotes, the definition name or
+        the word), the line number, the character position it starts at and the source line text for
+        error reporting.
+    """
+
+    __slots__ = ("kind", "text", "value", "line", "start", "source")
+
+    def __init__(self, kind, text, value, line, start, source):
+        self.kind = kind
+        self.text = text
+        self.value = value
+        self.line = line
+        self.start = start
+        self.source = source
+
+    def __repr__(self):
+        return "<Token %u %r>" % (self.kind, self.text)
+
 class CodeNumber(object):
     """
         A class representing a regular number in the FORTH program.
@@ -42,246 +85,2022 @@ class CodeString(object):
 
     data = None
     """
-        The raw string data.
+        The raw string data, interned so that every codeblock using the same literal shares it.
     """
 
     def __init__(self, data):
-        self.data = data
+        self.data = intern(data) if type(data) is str else data
 
     def __repr__(self):
         return "<CodeString \"%s\">" % self.data
 
-class Callable(object):
+class CodeSuperinstruction(object):
     """
-        A class representing a callable block of FORTH code.
+        A class representing a sequence of operations that the optimizer has fused into a single
+        operation, optionally carrying a literal operand.
     """
 
-    payload = None
-
     name = None
+    """
+        The name of the superinstruction, used to look up its implementation in the interpreter.
+    """
 
-    global_variables = None
+    data = None
     """
-        A list of all global variables declared on this specific codeblock.
+        The literal operand of the superinstruction, if any.
     """
 
-    local_variables = None
+    def __init__(self, name, data=None):
+        self.name = name
+        self.data = data
+
+    def __repr__(self):
+        return "<CodeSuperinstruction %s %r>" % (self.name, self.data)
+
+def unchecked_name(name):
     """
-        A list of all local variables declared on this specific codeblock.
+        Produces the opcode name of the unchecked variant of an opcode.
+
+        :parameters:
+            name - The opcode name, such as '+' or '{literal+}'.
+
+        :returns:
+            The opcode name of the unchecked variant.
     """
 
-    def disassemble(self):
-        result = ""
+    return "<unchecked %s>" % name
 
-        for index, op in enumerate(self.payload):
-            if type(op) is CodeString:
-                result += "\t(EIP %u): \"%s\"\n" % (index, op.data)
-            elif type(op) is CodeNumber:
-                result += "\t(EIP %u): %u\n" % (index, op.data)
-            else:
-                result += "\t(EIP %u): %s\n" % (index, op)
+def checked_name(name):
+    """
+        Produces the opcode name an unchecked variant was made from, or None if the name is not one.
+    """
 
-        return result
+    if name.startswith("<unchecked ") and name[-1] == ">":
+        return name[11:-1]
+    return None
 
-    def __init__(self, payload, name):
-        self.name = name
-        self.payload = payload
+class OpcodeTable(object):
+    """
+        A class assigning integer opcodes to the names of words and superinstructions. Opcodes are
+        handed out in order of first use and never change afterwards, so that compiled code stays valid
+        for the lifetime of the process. Superinstructions are registered by their name in braces so
+        that they cannot clash with a word.
+    """
 
-class CodeBlock(object):
+    names = None
     """
-        A class representing a fully compiled output.
+        The list of names, indexed by opcode.
     """
 
-    callable_functions = None
+    opcodes = None
+    """
+        A dictionary mapping names to their opcode.
+    """
 
-    def __init__(self, callable_functions):
-        self.callable_functions = callable_functions
+    def __init__(self):
+        self.names = []
+        self.opcodes = {}
 
-    def disassemble(self):
+        # The literal opcodes are reserved
+        self.lookup("<number>")
+        self.lookup("<string>")
+
+    def lookup(self, name):
         """
-            Produces a disassembly of the codeblock, calling the callable's disassemble
-            function for each instance.
+            Looks up the opcode for a name, assigning a new one if the name has not been seen before.
+
+            :parameters:
+                name - The word or superinstruction name.
 
             :returns:
-                The disassembly in the form of a string.
+                The opcode of the name.
         """
 
-        result = ""
-        for callable_name in self.callable_functions:
-            result += "Callable Function %s: \n" % callable_name
-            result += self.callable_functions[callable_name].disassemble()
-        return result
+        opcode = self.opcodes.get(name)
 
-class Compiler(object):
-    _comment_regex = re.compile("\\(.*?\\)", re.DOTALL)
+        if opcode is None:
+            # Unchecked variants always come after the opcode they were made from
+            if checked_name(name) is not None:
+                self.lookup(checked_name(name))
+
+            opcode = len(self.names)
+            self.names.append(name)
+            self.opcodes[name] = opcode
+
+        return opcode
+
+opcodes = OpcodeTable()
+"""
+    The opcode table shared by all compiled code.
+"""
+
+OPCODE_NUMBER = opcodes.lookup("<number>")
+"""
+    The opcode pushing a number from the constant pool.
+"""
+
+OPCODE_STRING = opcodes.lookup("<string>")
+"""
+    The opcode pushing a string from the constant pool.
+"""
+
+class VariableTable(object):
+    """
+        A class assigning slots to the names of declared global variables. Like opcodes, slots are handed
+        out in order of first declaration and never change afterwards, so an interpreter can keep its
+        declared globals in a list indexed by slot. Each compiler and each interpreter has a table of its
+        own, see CodeBlock.relocate.
     """
-        A regular expression pattern representing a comment. This is simply used to strip
-        out all commenting data as we don't need it.
+
+    names = None
+    """
+        The list of variable names, indexed by slot.
     """
 
-    _language_regex = re.compile(":.+|[\"]([^\"])+[\"]| *\S+ *")
+    slots = None
     """
-        A regular expression representing a token in the FORTH language. This is used to locate
-        all meaningful symbols within our input buffer.
+        A dictionary mapping variable names to their slot.
     """
 
     def __init__(self):
-        pass
+        self.names = []
+        self.slots = {}
 
-    def get_tokens(self, input):
+    def lookup(self, name):
         """
-            A list of lists where the second layer of lists is the token content that appeared on each
-            line from the top of the input buffer to the bottom.
+            Looks up the slot of a variable, assigning a new one if the variable has not been declared before.
 
             :parameters:
-                input - The input string.
+                name - The variable name.
+
+            :returns:
+                The slot of the variable.
         """
 
-        output = []
-        input = re.sub(self._comment_regex, "", input)
-        input = input.rstrip().lstrip()
+        slot = self.slots.get(name)
 
-        lines = input.split("\n")
-        for index, line in enumerate(lines):
-            line = line.rstrip().lstrip()
+        if slot is None:
+            slot = len(self.names)
+            self.names.append(name)
+            self.slots[name] = slot
 
-            if line == "":
-                continue
+        return slot
+
+    def copy(self):
+        """
+            Produces a table assigning the same slots, which assigns new ones independently of this one.
+        """
+
+        result = VariableTable()
+        result.names = list(self.names)
+        result.slots = dict(self.slots)
+        return result
+
+class GlobalSlot(int):
+    """
+        A class representing the slot of a declared global variable as the operand of a superinstruction.
+        It is used just like the slot number itself, but is kept apart from numbers of the same value in
+        the constant pool and knows the name of its variable, which refers to it outside of its table.
+    """
+
+    name = None
+    """
+        The name of the variable.
+    """
+
+    def __new__(cls, slot, name):
+        result = int.__new__(cls, slot)
+        result.name = name
+        return result
 
-            line_data = {"text": line, "tokens": []}
+    def __repr__(self):
+        return "<GlobalSlot %s>" % self.name
 
-            # For each matching token, record the start and end positions as well as line
-            for match in re.finditer(self._language_regex, line):
-                token_data = {"line": index + 1, "start": match.start(), "end": match.end(), "text": match.group(0).lstrip().rstrip()}
-                line_data["tokens"].append(token_data)
+class Link(object):
+    """
+        A class representing a reference to a callable by name as the operand of a superinstruction
+        produced by the linker. The callable is looked up the first time it is needed and kept until the
+        table it was looked up in changes.
+    """
 
-            output.append(line_data)
+    __slots__ = ("name", "table", "callable", "version")
 
-        return output
+    def __init__(self, name, table=None, callable=None):
+        self.name = name
+        self.table = table
+        self.callable = callable
+        self.version = None
 
-    def collapse_tokens(self, input):
+    def resolve(self, table=None):
         """
-            Collapses the line delineated list of tokens down to a long list of tokens to process.
+            Looks up the referenced callable, unless it was looked up in the same version of the table
+            already.
 
             :parameters:
-                input - The input line data to process.
+                table - The LazyCallableTable to look the callable up in. If None, the table the link
+                    was made for is used.
+
+            :returns:
+                The callable.
         """
 
-        result = []
-        for line in input:
-            result += line["tokens"]
-        return result
+        if table is None:
+            table = self.table
+
+        if self.version != table.version:
+            self.callable = table[self.name]
+            self.version = table.version
+        return self.callable
+
+    def __repr__(self):
+        return "<Link %s>" % self.name
+
+class ConstantPool(object):
+    """
+        A class representing the literal values used by callables. A pool is shared by all of the callables
+        of a codeblock and stores each distinct value only once.
+    """
+
+    values = None
+    """
+        The list of values, indexed by constant number.
+    """
+
+    indices = None
+    """
+        A dictionary mapping each (type, value) pair to its constant number.
+    """
 
-    def syntax_analysis(self, tokens):
+    def __init__(self):
+        self.values = []
+        self.indices = {}
+
+    def lookup(self, value):
         """
-            Performs a syntax analysis on the input FORTH, ensuring that the syntax is correct.
+            Looks up the constant number of a value, adding it to the pool if necessary.
 
             :parameters:
-                tokens - The input tokens to process.
+                value - The literal value.
+
+            :returns:
+                The constant number of the value.
         """
 
-        processed_code_block = False
+        key = (type(value), value)
+        index = self.indices.get(key)
 
-        def throw_error(error_message, token):
-            """
-                Helper function to throw an error with some useful information including visually where the problem lies.
+        if index is None:
+            # Strings are shared with the pools of other codeblocks and compare by identity as dictionary keys
+            if type(value) is str:
+                value = intern(value)
+            index = len(self.values)
+            self.values.append(value)
+            self.indices[key] = index
 
-                :parameters:
-                    error_message - The message to throw.
-                    token - The offending token.
-            """
-            highlight_text = ""
+        return index
 
-            for iteration in range(len(error_message) + token["start"]):
-                highlight_text += " "
-            highlight_text += "^"
-            error_message += line_data["text"]
+class Callable(object):
+    """
+        A class representing a callable block of FORTH code.
 
-            helper_text = "The Error is Here---"
-            if len(helper_text) < len(highlight_text):
-                text_data = list(highlight_text)
+        The code is stored as an array of opcodes alongside an array of operands, which index the constant
+        pool for literals and superinstructions and are -1 otherwise.
+    """
 
-                start_index = (len(highlight_text) - 1) - len(helper_text)
-                for index, character in enumerate(helper_text):
-                    text_data[start_index + index] = character
+    code = None
+    """
+        The array of opcodes making up the callable.
+    """
 
-                highlight_text = "".join(text_data)
+    operands = None
+    """
+        The array of operands, one per opcode.
+    """
 
-            raise CompilerError("\n%s\n%s" % (error_message, highlight_text))
+    constants = None
+    """
+        The ConstantPool the operands refer to.
+    """
 
-        for line_data in tokens:
-            for token in line_data["tokens"]:
-                # If we're not processing a code block and our current token isn't one, we have an issue
-                if processed_code_block is False and token["text"][0] != ":":
-                    throw_error("Began FORTH programming, but no code block was declared on line %u, character %u: " % (token["line"], token["start"]), token)
+    name = None
 
-                # If we passed the above check, then we're good on code blocks
-                processed_code_block = True
+    global_variables = None
+    """
+        A list of all global variables declared on this specific codeblock.
+    """
 
-                # Any tokens with " at the beginning or end should be complete
-                token_end = len(token["text"]) - 1
-                if (token["text"][0] == "\"" and token["text"][token_end] != "\"") or (token["text"][token_end] == "\"" and token["text"][0] != "\""):
-                    throw_error("Found incomplete string on line %u, character %u: " % (token["line"], token["start"]), token)
+    local_variables = None
+    """
+        A list of all local variables declared on this specific codeblock, indexed by their slot in
+        the frame of each call.
+    """
 
-    def lexical_analysis(self, tokens):
-        """
-            Performs a lexical analysis on the input tokens. This is used to ensure that the program actually makes sense once it is verified to be syntactically
-            correct.
-        """
+    branch_targets = None
+    """
+        A dictionary mapping the instruction pointer of each control flow word (if, else, until,
+        while, repeat) to the absolute instruction pointer it transfers control to. This is
+        resolved by the compiler so that branching at run time does not need to search the payload.
+    """
 
-        pass
+    fast_code = None
+    """
+        The array of opcodes the dispatch loop runs, which is the code with the operations proven safe by
+        the analysis replaced by their unchecked variant. It is the code itself until the callable is
+        analyzed, and has to be analyzed again whenever the code changes. See analyze.
+    """
 
-    def build_result(self, tokens):
+    analysis = None
+    """
+        The Analysis of the callable, or None if it was not analyzed.
+    """
+
+    block_lengths = None
+    """
+        The array holding, for each instruction pointer, how many operations are left from it to the end of
+        its basic block, not counting the operation transferring control that ends it. Whichever operation
+        control enters a block at, this many operations run one after the other, which lets the interpreter
+        charge them to its budget at once. It is None until the callable is analyzed. See analyze.
+    """
+
+    origin = None
+    """
+        The callable this one is a copy of, or None. See CodeBlock.copy.
+    """
+
+    unlinked = None
+    """
+        A tuple of the code, operands and branch targets of the callable before it was linked, or None
+        if it was not linked. See linker.link_callable.
+    """
+
+    inlined = None
+    """
+        The frozenset of the names of the callables the linker inlined into this one, or None if it was
+        not linked.
+    """
+
+    inline_origins = None
+    """
+        A dictionary mapping the positions of the operations the linker inlined into this callable to
+        tuples of the callable each came from and its position there, or None if it was not linked.
+    """
+
+    def decode(self):
         """
-            Builds the final codeblock containing callable functions.
+            Decodes the code of the callable back into a list of operations, where numbers, strings and
+            superinstructions are represented by CodeNumber, CodeString and CodeSuperinstruction instances
+            and all other words by their name.
 
-            :parameters:
-                tokens - The input tokens.
+            :returns:
+                The list of operations.
         """
 
-        result = {}
-        callable_data = None
+        result = []
+        values = self.constants.values
+        names = opcodes.names
+
+        for index, opcode in enumerate(self.code):
+            if opcode == OPCODE_NUMBER:
+                result.append(CodeNumber(values[self.operands[index]]))
+            elif opcode == OPCODE_STRING:
+                result.append(CodeString(values[self.operands[index]]))
+            elif self.operands[index] >= 0:
+                result.append(CodeSuperinstruction(names[opcode][1:-1], values[self.operands[index]]))
+            else:
+                result.append(names[opcode])
 
-        current_callable_name = None
-        for token_data in tokens:
-            if token_data["text"][0] == ":":
-                if callable_data is not None:
-                    result[current_callable_name] = Callable(callable_data, current_callable_name)
+        return result
 
-                current_callable_name = token_data["text"][1:].rstrip().lstrip()
-                callable_data = []
+    payload = property(decode)
+    """
+        The list of operations making up the callable, decoded on every access.
+    """
+
+    def disassemble(self):
+        result = ""
+
+        for index, op in enumerate(self.payload):
+            if type(op) is CodeString:
+                result += "\t(EIP %u): \"%s\"\n" % (index, op.data)
+            elif type(op) is CodeNumber:
+                result += "\t(EIP %u): %u\n" % (index, op.data)
+            elif type(op) is CodeSuperinstruction and op.name in ("global@", "global!"):
+                result += "\t(EIP %u): {%s \"%s\"}\n" % (index, op.name, op.data.name)
+            elif type(op) is CodeSuperinstruction and op.name in ("local@", "local!"):
+                result += "\t(EIP %u): {%s \"%s\"}\n" % (index, op.name, self.local_variables[op.data])
+            elif type(op) is CodeSuperinstruction and type(op.data) is Link:
+                result += "\t(EIP %u): {%s \"%s\"}\n" % (index, op.name, op.data.name)
+            elif type(op) is CodeSuperinstruction and op.data is None:
+                result += "\t(EIP %u): {%s}\n" % (index, op.name)
+            elif type(op) is CodeSuperinstruction and type(op.data) is int:
+                result += "\t(EIP %u): {%s %u}\n" % (index, op.name, op.data)
+            elif type(op) is CodeSuperinstruction:
+                result += "\t(EIP %u): {%s \"%s\"}\n" % (index, op.name, op.data)
+            elif index in self.branch_targets:
+                result += "\t(EIP %u): %s -> %u\n" % (index, op, self.branch_targets[index])
             else:
-                token_text = token_data["text"]
-                token_index_last = len(token_text) - 1
+                result += "\t(EIP %u): %s\n" % (index, op)
 
-                # If it is a number, add it as a codenumber
-                try:
-                    callable_data.append(CodeNumber(int(token_text)))
-                    continue
-                except ValueError:
-                    pass
+        return result
+
+    def __init__(self, payload, name, branch_targets=None, constants=None, local_variables=None, global_variables=None):
+        self.name = name
+        self.local_variables = local_variables if local_variables is not None else []
+        self.global_variables = global_variables if global_variables is not None else []
+        self.branch_targets = branch_targets if branch_targets is not None else {}
+        self.constants = constants if constants is not None else ConstantPool()
+        self.code = array.array("i")
+        self.operands = array.array("i")
+        self.fast_code = self.code
+
+        for op in payload:
+            if type(op) is CodeNumber:
+                self.code.append(OPCODE_NUMBER)
+                self.operands.append(self.constants.lookup(op.data))
+            elif type(op) is CodeString:
+                self.code.append(OPCODE_STRING)
+                self.operands.append(self.constants.lookup(op.data))
+            elif type(op) is CodeSuperinstruction:
+                self.code.append(opcodes.lookup("{%s}" % op.name))
+                self.operands.append(self.constants.lookup(op.data))
+            else:
+                self.code.append(opcodes.lookup(op))
+                self.operands.append(-1)
 
-                if token_text[0] == "\"" and token_text[token_index_last] == "\"":
-                    callable_data.append(CodeString(token_text.rstrip("\"").lstrip("\"")))
-                else:
-                    callable_data.append(token_text)
+_versions = itertools.count(1)
+"""
+    The source of the versions of LazyCallableTable instances, which are never handed out twice.
+"""
 
-        if current_callable_name is not None and callable_data is not None and len(callable_data) != 0:
-            result[current_callable_name] = Callable(callable_data, current_callable_name)
+class LazyCallableTable(dict):
+    """
+        A dictionary mapping names to callables where some of the callables are only produced the first
+        time they are looked up. Pending callables are represented by a loader function accepting no
+        parameters and returning the callable. Pending names take part in membership tests, iteration and
+        the length of the table just like loaded ones.
+    """
+
+    loaders = None
+    """
+        A dictionary mapping the names of the callables not loaded yet to their loader.
+    """
 
-        return CodeBlock(result)
+    version = None
+    """
+        A number changing whenever a name is bound to a different callable or loader, unique among all
+        tables. Loading a pending callable does not change it.
+    """
 
-    def compile_forth(self, payload):
+    def __init__(self, loaders=None):
+        dict.__init__(self)
+        self.loaders = loaders if loaders is not None else {}
+        self.version = next(_versions)
+
+    def __missing__(self, name):
+        callable = self.loaders.pop(name)()
+        dict.__setitem__(self, name, callable)
+        return callable
+
+    def __setitem__(self, name, callable):
+        self.loaders.pop(name, None)
+        dict.__setitem__(self, name, callable)
+        self.version = next(_versions)
+
+    def __delitem__(self, name):
+        if self.loaders.pop(name, None) is None:
+            dict.__delitem__(self, name)
+        self.version = next(_versions)
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self.loaders
+
+    def __iter__(self):
+        for name in dict.keys(self):
+            yield name
+        for name in list(self.loaders):
+            yield name
+
+    def __len__(self):
+        return dict.__len__(self) + len(self.loaders)
+
+    def get(self, name, default=None):
+        if name not in self:
+            return default
+        return self[name]
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+    def set_loader(self, name, loader):
         """
-            Builds the input FORTH into a usable interpreted sequence.
+            Registers a callable to be loaded on first use, replacing any existing callable of the same name.
 
             :parameters:
-                payload - The input string.
+                name - The name of the callable.
+                loader - The function producing the callable.
         """
 
-        tokens = self.get_tokens(payload)
-        self.syntax_analysis(tokens)
-        self.lexical_analysis(tokens)
+        if dict.__contains__(self, name):
+            dict.__delitem__(self, name)
+        self.loaders[name] = loader
+        self.version = next(_versions)
 
-        tokens = self.collapse_tokens(tokens)
-        return self.build_result(tokens)
+    def is_loaded(self, name):
+        """
+            Returns whether the callable of the given name was loaded already.
+        """
+
+        return dict.__contains__(self, name)
+
+    def merge(self, other):
+        """
+            Adds all of the callables of another table to this one without loading them. Callables pending
+            in the other table are loaded through it, so that both tables end up sharing the same instance.
+
+            :parameters:
+                other - The table to merge, which may be a regular dictionary.
+        """
+
+        pending = other.loaders if isinstance(other, LazyCallableTable) else {}
+
+        for name in dict.keys(other):
+            self[name] = dict.__getitem__(other, name)
+        for name in pending:
+            self.set_loader(name, lambda name=name: other[name])
+
+    def statistics(self):
+        """
+            Counts the callables of the table by whether they were loaded yet.
+
+            :returns:
+                A dictionary of how many callables the table indexes, how many of them were loaded and how
+                many are still pending.
+        """
+
+        loaded = dict.__len__(self)
+        return {"indexed": loaded + len(self.loaders), "loaded": loaded, "pending": len(self.loaders)}
+
+class CodeBlock(object):
+    """
+        A class representing a fully compiled output.
+    """
+
+    callable_functions = None
+
+    constants = None
+    """
+        The ConstantPool shared by the callables of the codeblock.
+    """
+
+    variables = None
+    """
+        The VariableTable holding the slots of the global variables the callables of the codeblock declare.
+    """
+
+    linked = False
+    """
+        Whether the calls between the callables of the codeblock have been linked. See linker.link_codeblock.
+    """
+
+    def __init__(self, callable_functions, constants=None, variables=None):
+        self.callable_functions = callable_functions
+        self.constants = constants if constants is not None else ConstantPool()
+        self.variables = variables if variables is not None else VariableTable()
+
+    def relocate(self, variables):
+        """
+            Moves the declared global variables of the codeblock to their slots in another table, which
+            assigns them slots first if it has not yet.
+
+            :parameters:
+                variables - The VariableTable to move the variables to.
+
+            :returns:
+                The codeblock itself if each of its variables has the same slot in the table already, and
+                a copy of it using the slots of the table otherwise, see copy.
+        """
+
+        slots = [variables.lookup(name) for name in self.variables.names]
+        if slots == range(len(slots)):
+            return self
+        return self.copy(variables)
+
+    def copy(self, variables=None):
+        """
+            Produces a copy of the codeblock whose callables may be changed without affecting it. The
+            callables of the copy share their code with the originals, but have a constant pool of their
+            own. Callables the codeblock has not loaded yet are copied once they are loaded.
+
+            :parameters:
+                variables - The VariableTable the copy keeps its declared global variables in, which
+                    assigns them slots first if it has not yet. If None, the table of the codeblock.
+
+            :returns:
+                The copy, whose callable_functions is a LazyCallableTable.
+        """
+
+        if variables is None:
+            variables = self.variables
+
+        table = LazyCallableTable()
+        result = CodeBlock(table, ConstantPool(), variables)
+        numbers = {}
+
+        def renumber(constants, number):
+            key = (id(constants), number)
+
+            if key not in numbers:
+                value = constants.values[number]
+                if type(value) is GlobalSlot:
+                    value = GlobalSlot(variables.lookup(value.name), value.name)
+                elif type(value) is Link:
+                    value = Link(value.name, table)
+                numbers[key] = result.constants.lookup(value)
+
+            return numbers[key]
+
+        def load(name):
+            original = self.callable_functions[name]
+
+            callable = copy.copy(original)
+            callable.origin = original
+            callable.constants = result.constants
+            callable.operands = array.array("i", [renumber(original.constants, number) if number >= 0 else number for number in original.operands])
+            return callable
+
+        pending = self.callable_functions.loaders if isinstance(self.callable_functions, LazyCallableTable) else {}
+
+        for name in self.callable_functions:
+            if name in pending:
+                table.set_loader(name, lambda name=name: load(name))
+            else:
+                dict.__setitem__(table, name, load(name))
+
+        return result
+
+    def disassemble(self):
+        """
+            Produces a disassembly of the codeblock, calling the callable's disassemble
+            function for each instance.
+
+            :returns:
+                The disassembly in the form of a string.
+        """
+
+        result = ""
+        for callable_name in self.callable_functions:
+            result += "Callable Function %s: \n" % callable_name
+            result += self.callable_functions[callable_name].disassemble()
+        return result
+
+    def statistics(self):
+        """
+            Counts the callables of the codeblock by whether they were loaded yet. Codeblocks produced by
+            Compiler.compile_lazy or bytecode.loads only load each callable the first time it is looked up.
+
+            :returns:
+                A dictionary of how many callables the codeblock indexes, how many of them were loaded and
+                how many are still pending.
+        """
+
+        if isinstance(self.callable_functions, LazyCallableTable):
+            return self.callable_functions.statistics()
+
+        count = len(self.callable_functions)
+        return {"indexed": count, "loaded": count, "pending": 0}
+
+def remap_branches(length, origins, branch_targets):
+    """
+        Remaps branch targets to a payload that operations were combined, removed or inserted into.
+
+        :parameters:
+            length - The length of the original payload.
+            origins - The original index of each operation of the new payload, in order. Operations
+                inserted in place of an original operation share its index.
+            branch_targets - The branch targets of the original payload.
+
+        :returns:
+            The branch targets of the new payload.
+    """
+
+    # Map every original index to the index of the first operation at or after it
+    remap = [None] * length + [len(origins)]
+    for new_index, index in enumerate(origins):
+        if remap[index] is None:
+            remap[index] = new_index
+
+    for index in range(length - 1, -1, -1):
+        if remap[index] is None:
+            remap[index] = remap[index + 1]
+
+    result_targets = {}
+    for index in branch_targets:
+        result_targets[remap[index]] = remap[branch_targets[index]]
+
+    return result_targets
+
+ANY = "any"
+"""
+    The type the analysis gives a value it knows nothing about.
+"""
+
+UNSET = "unset"
+"""
+    The type the analysis gives a local variable that was not stored to yet.
+"""
+
+_numbers = ("int", "bool")
+"""
+    The types the arithmetic builtins accept without converting them, booleans behaving as 1 and 0.
+"""
+
+_arithmetic_words = ("+", "-", "*", "/", "%")
+"""
+    The arithmetic words, which convert their operands with int().
+"""
+
+_arithmetic_superinstructions = ("literal+", "literal-", "literal*", "literal/", "literal%", "dup*")
+"""
+    The superinstructions converting the top of the stack with int().
+"""
+
+_comparison_words = ("<", ">", ">=", "<=", "=")
+"""
+    The comparison words, each pushing a boolean.
+"""
+
+analyzed_words = frozenset(_arithmetic_words + _comparison_words + ("strcat", "swap", "pop", "dup", "over", "rot",
+    "random", "not", "if", "else", "then", "begin", "until", "while", "repeat", "return", "exit", "call", ";",
+    "nop", "!", "@", "print", "_stack", "jump", "{literal@}", "{literal!}", "{global@}", "{global!}", "{local@}",
+    "{local!}", "{call-direct}", "{tail-call}", "{inline}", "{nip}") + tuple("{%s}" % name for name in _arithmetic_superinstructions))
+"""
+    The opcode names whose behavior the analysis relies on. Replacing the command of any of them invalidates
+    what the analysis proved, so interpreters doing so do not use the unchecked variants.
+"""
+
+straight_words = frozenset(_arithmetic_words + _comparison_words + ("strcat", "swap", "pop", "dup", "over", "rot",
+    "random", "not", "then", "begin", ";", "nop", "!", "@", "print", "_stack", "{literal@}", "{literal!}", "{global@}",
+    "{global!}", "{local@}", "{local!}", "{nip}") + tuple("{%s}" % name for name in _arithmetic_superinstructions))
+"""
+    The opcode names of the words whose builtins never transfer control: they neither jump, call, return
+    nor exit, so the operation after them is always the next one. A basic block ends at the first operation
+    that is not one of these or a literal.
+"""
+
+ANALYSIS_WINDOW = 16
+"""
+    How many values from the top of the stack the analysis keeps track of. Values further down are
+    treated as unknown, which bounds the work done at each operation and keeps the analysis linear.
+"""
+
+class Analysis(object):
+    """
+        A class representing what the analysis of a callable proved about it. The analysis interprets the
+        callable abstractly along its control flow, tracking the depth of the stack relative to where the
+        callable was entered and the type of the values near its top and of its local variables.
+    """
+
+    operations = 0
+    """
+        How many operations the callable has.
+    """
+
+    safe = None
+    """
+        The set of the instruction pointers of the operations proven never to fail: they never take a value
+        the callable did not push itself and never receive a value of the wrong type.
+    """
+
+    unchecked = None
+    """
+        The set of the instruction pointers of the arithmetic operations proven to only receive numbers
+        pushed by the callable, which run as their unchecked variant.
+    """
+
+    inputs = None
+    """
+        How many values the callable takes from the stack of its caller along its known paths, or None if
+        the callable uses relative jumps.
+    """
+
+    diagnostics = None
+    """
+        A list of messages about the operations that always fail when reached and the callable taking
+        values from the stack of its caller.
+    """
+
+    def __init__(self):
+        self.safe = set()
+        self.unchecked = set()
+        self.diagnostics = []
+
+class AbstractState(object):
+    """
+        A class representing the abstract state of a callable at one of its operations: the types of the
+        values at the top of the stack, the depth of the stack relative to the entry of the callable and
+        the types of the local variables.
+    """
+
+    known = None
+    """
+        The list of the types of the values at the top of the stack that were pushed by the callable, from
+        the bottom up.
+    """
+
+    depth = None
+    """
+        How many values the stack holds beyond those it held on entry, or None if this is not known.
+    """
+
+    local_types = None
+    """
+        The list of the types of the local variables, None for a local variable that may not be set.
+    """
+
+    lowest = None
+    """
+        The lowest depth the stack reached through the current operation.
+    """
+
+    def __init__(self, key):
+        self.known = list(key[0])
+        self.depth = key[1]
+        self.local_types = list(key[2])
+        self.lowest = self.depth
+
+    def key(self):
+        """
+            Produces the immutable form of the state, which is what is kept at each operation.
+        """
+
+        return (tuple(self.known), self.depth, tuple(self.local_types))
+
+    def pop(self):
+        """
+            Pops a value.
+
+            :returns:
+                The type of the value or None if the value was not pushed by the callable.
+        """
+
+        if self.depth is not None:
+            self.depth = self.depth - 1
+            self.lowest = min(self.lowest, self.depth)
+
+        if len(self.known) != 0:
+            return self.known.pop()
+        return None
+
+    def push(self, value_type):
+        """
+            Pushes a value of the given type.
+        """
+
+        self.known.append(value_type)
+        if len(self.known) > ANALYSIS_WINDOW:
+            del self.known[0]
+        if self.depth is not None:
+            self.depth = self.depth + 1
+
+    def forget(self):
+        """
+            Forgets everything about the stack, after an operation with an unknown effect on it.
+        """
+
+        self.known = []
+        self.depth = None
+
+def join_states(first, second):
+    """
+        Joins the abstract states of two paths meeting at an operation.
+
+        :returns:
+            The state holding what is true on both paths.
+    """
+
+    if first is None:
+        return second
+
+    first_known, first_depth, first_locals = first
+    second_known, second_depth, second_locals = second
+
+    # The stacks are lined up from the top
+    count = min(len(first_known), len(second_known))
+    known = []
+    for offset in range(count, 0, -1):
+        known.append(first_known[-offset] if first_known[-offset] == second_known[-offset] else ANY)
+
+    local_types = []
+    for first_type, second_type in zip(first_locals, second_locals):
+        if first_type == second_type:
+            local_types.append(first_type)
+        elif first_type in (UNSET, None) or second_type in (UNSET, None):
+            local_types.append(None)
+        else:
+            local_types.append(ANY)
+
+    return (tuple(known), first_depth if first_depth == second_depth else None, tuple(local_types))
+
+def literal_type(value):
+    """
+        Produces the type of a literal. Strings that int() accepts are treated as unknown values, since the
+        arithmetic builtins accept them.
+    """
+
+    if type(value) is not str:
+        return "int"
+
+    try:
+        int(value)
+    except ValueError:
+        return "str"
+    return ANY
+
+def transfer(callable, index, op, state, report=None):
+    """
+        Applies the effect of an operation to an abstract state.
+
+        :parameters:
+            callable - The callable.
+            index - The instruction pointer of the operation.
+            op - The decoded operation.
+            state - The AbstractState before the operation, which is changed into the state after it.
+            report - If not None, the Analysis to record whether the operation is safe and what always
+                fails into.
+
+        :returns:
+            The list of the instruction pointers that may follow the operation.
+    """
+
+    following = [index + 1]
+    safe = True
+    failure = None
+
+    if type(op) is CodeNumber:
+        state.push("int")
+    elif type(op) is CodeString:
+        state.push(literal_type(op.data))
+    elif type(op) is CodeSuperinstruction:
+        name = op.name
+        if name in _arithmetic_superinstructions:
+            operand = state.pop()
+            safe = operand in _numbers and (name == "dup*" or literal_type(op.data) == "int")
+            if operand == "str":
+                failure = "converts a string that is not a number"
+            state.push("int")
+            if safe is True and report is not None:
+                report.unchecked.add(index)
+            # The compiler never fuses a division by zero, but the bytecode may come from elsewhere
+            safe = safe and (name not in ("literal/", "literal%") or op.data != 0)
+        elif name in ("literal@", "global@"):
+            safe = False
+            state.push(ANY)
+        elif name in ("literal!", "global!"):
+            safe = state.pop() is not None
+        elif name == "local@":
+            local_type = state.local_types[op.data]
+            safe = local_type not in (None, UNSET)
+            if local_type == UNSET:
+                failure = "reads the local variable '%s' before it is stored to" % callable.local_variables[op.data]
+            state.push(local_type if safe is True else ANY)
+        elif name == "local!":
+            value_type = state.pop()
+            safe = value_type is not None
+            state.local_types[op.data] = value_type if value_type is not None else ANY
+        elif name == "nip":
+            top = state.pop()
+            below = state.pop()
+            safe = top is not None and below is not None
+            state.push(top if top is not None else ANY)
+        elif name == "call-direct":
+            safe = False
+            state.forget()
+        elif name == "tail-call":
+            safe = False
+            following = []
+        elif name == "inline":
+            pass
+        else:
+            safe = False
+            state.forget()
+    elif op in _arithmetic_words:
+        rhs = state.pop()
+        lhs = state.pop()
+        safe = rhs in _numbers and lhs in _numbers
+        if rhs == "str" or lhs == "str":
+            failure = "converts a string that is not a number"
+        state.push("int")
+        if safe is True and report is not None:
+            report.unchecked.add(index)
+        # Division by zero may still fail
+        safe = safe and op not in ("/", "%")
+    elif op in _comparison_words or op == "strcat":
+        rhs = state.pop()
+        lhs = state.pop()
+        safe = rhs is not None and lhs is not None
+        state.push("bool" if op != "strcat" else ANY)
+    elif op == "swap":
+        top = state.pop()
+        below = state.pop()
+        safe = top is not None and below is not None
+        state.push(top if top is not None else ANY)
+        state.push(below if below is not None else ANY)
+    elif op == "pop" or op == "print":
+        safe = state.pop() is not None
+    elif op == "dup":
+        top = state.pop()
+        safe = top is not None
+        state.push(top if top is not None else ANY)
+        state.push(top if top is not None else ANY)
+    elif op == "over":
+        top = state.pop()
+        safe = top is not None
+        state.push(top if top is not None else ANY)
+        # The copy goes to the bottom of the stack, below everything tracked
+        if state.depth is not None:
+            state.depth = state.depth + 1
+    elif op == "rot":
+        # Rotating fewer than two values does nothing, so this never fails
+        if len(state.known) >= 2:
+            state.known[-1], state.known[-2] = state.known[-2], state.known[-1]
+        else:
+            state.known = [ANY] * len(state.known)
+    elif op == "random":
+        state.push("int")
+    elif op == "not":
+        safe = state.pop() is not None
+        state.push("bool")
+    elif op == "if":
+        safe = state.pop() is not None
+        following = [index + 1, callable.branch_targets[index]]
+    elif op == "else" or op == "repeat":
+        following = [callable.branch_targets[index]]
+    elif op == "until" or op == "while":
+        safe = state.pop() is not None
+        following = [callable.branch_targets[index], index + 1]
+    elif op in ("then", "begin", ";", "nop", "_stack"):
+        pass
+    elif op == "return" or op == "exit":
+        following = []
+    elif op == "call":
+        safe = False
+        state.pop()
+        state.forget()
+    elif op == "!":
+        key = state.pop()
+        value = state.pop()
+        safe = key is not None and value is not None
+    elif op == "@":
+        state.pop()
+        safe = False
+        state.push(ANY)
+    else:
+        # Any other command may do anything to the stack
+        safe = False
+        state.forget()
+
+    if report is not None:
+        if safe is True:
+            report.safe.add(index)
+        if failure is not None:
+            report.diagnostics.append("Callable '%s' always fails at EIP %u (%s): it %s." % (callable.name, index, op, failure))
+
+    return following
+
+def analyze(callable):
+    """
+        Analyzes a callable, attaching the Analysis to it, splitting it into basic blocks and setting its
+        fast code to run the operations proven safe as their unchecked variant. This has to be done again
+        whenever the code of the callable changes.
+
+        :parameters:
+            callable - The callable to analyze.
+
+        :returns:
+            The Analysis.
+    """
+
+    payload = callable.payload
+    result = Analysis()
+    result.operations = len(payload)
+
+    callable.analysis = result
+    callable.fast_code = callable.code
+
+    # Basic blocks run from the operation after a transfer of control to the next one
+    code = callable.code
+    names = opcodes.names
+    block_lengths = array.array("i", [0]) * len(code)
+    length = 0
+    for index in range(len(code) - 1, -1, -1):
+        if code[index] <= OPCODE_STRING or names[code[index]] in straight_words:
+            length = length + 1
+        else:
+            length = 0
+        block_lengths[index] = length
+    callable.block_lengths = block_lengths
+
+    # Relative jumps are computed at run time, so the control flow is not known
+    if "jump" in payload:
+        return result
+
+    # Abstract states are only kept at the operations control flow may reach other than from the previous one
+    leaders = set(callable.branch_targets.values())
+    leaders.update(index + 1 for index in callable.branch_targets)
+    leaders.add(0)
+
+    states = {0: ((), 0, tuple([UNSET] * len(callable.local_variables)))} if len(payload) != 0 else {}
+    worklist = list(states)
+    pending = set(worklist)
+
+    # What each block proved, as of the last time it was run
+    reports = {}
+
+    while len(worklist) != 0:
+        start = worklist.pop()
+        pending.discard(start)
+
+        state = AbstractState(states[start])
+        report = Analysis()
+        entry = state.lowest if state.lowest is not None and state.lowest < 0 else 0
+        underflow = None
+
+        index = start
+        while True:
+            following = transfer(callable, index, payload[index], state, report)
+            if underflow is None and state.lowest is not None and state.lowest < entry:
+                underflow = index
+
+            if len(following) != 1 or following[0] != index + 1 or index + 1 in leaders:
+                break
+            if index + 1 >= len(payload):
+                following = []
+                break
+            index = index + 1
+
+        reports[start] = (report, state.lowest, underflow)
+
+        key = state.key()
+        for successor in following:
+            if successor >= len(payload):
+                continue
+
+            joined = join_states(states.get(successor), key)
+            if joined != states.get(successor):
+                states[successor] = joined
+                if successor not in pending:
+                    pending.add(successor)
+                    worklist.append(successor)
+
+    lowest = 0
+    underflow = None
+    for start in sorted(reports):
+        report, block_lowest, block_underflow = reports[start]
+        result.safe.update(report.safe)
+        result.unchecked.update(report.unchecked)
+        result.diagnostics.extend(report.diagnostics)
+
+        if block_lowest is not None and block_lowest < lowest:
+            lowest = block_lowest
+        if underflow is None:
+            underflow = block_underflow
+
+    result.inputs = -lowest
+    if underflow is not None:
+        result.diagnostics.append("Callable '%s' takes %u value(s) from the stack of its caller, the first at EIP %u (%s)." % (callable.name, result.inputs, underflow, payload[underflow]))
+
+    if len(result.unchecked) != 0:
+        fast_code = array.array("i", callable.code)
+        for index in result.unchecked:
+            fast_code[index] = opcodes.lookup(unchecked_name(opcodes.names[fast_code[index]]))
+        callable.fast_code = fast_code
+
+    return result
+
+class Compiler(object):
+    _whitespace = " \t\n\r\f\v"
+    """
+        The characters separating tokens.
+    """
+
+    _arithmetic_operations = {
+        "+": lambda lhs, rhs: lhs + rhs,
+        "-": lambda lhs, rhs: lhs - rhs,
+        "*": lambda lhs, rhs: lhs * rhs,
+        "/": lambda lhs, rhs: lhs / rhs,
+        "%": lambda lhs, rhs: lhs % rhs,
+    }
+    """
+        The arithmetic words the optimizer may fold or fuse, mapped to their implementation on
+        two integers. These mirror the builtins of the same name.
+    """
+
+    _dead_operations = ("nop", "then", ";", "begin")
+    """
+        Words that do nothing at run time once branch targets have been resolved. The optimizer
+        removes these entirely.
+    """
+
+    _declarations = ("variable", "local")
+    """
+        The words declaring a global variable and a variable local to the definition, each followed by
+        the name of the variable. They are handled entirely by the compiler: a local variable is declared
+        for the whole definition, while a global variable is declared from its definition to the end of
+        the source.
+    """
+
+    optimization_level = 0
+    """
+        How aggressively the compiler should optimize each callable. 0 disables the optimizer, 1 performs
+        constant folding and removes dead operations and 2 additionally fuses common sequences into
+        superinstructions.
+    """
+
+    diagnostics = None
+    """
+        The list of the messages the analysis reported about the callables compiled by the last call to
+        compile_forth or compile_stream. See analyze.
+    """
+
+    analyzed_operations = 0
+    """
+        How many operations the analysis looked at since the last call to compile_forth or compile_stream.
+    """
+
+    safe_operations = 0
+    """
+        How many of the operations the analysis looked at were proven safe.
+    """
+
+    variables = None
+    """
+        The VariableTable holding the slots of the global variables declared by everything the compiler
+        compiled.
+    """
+
+    def __init__(self, optimization_level=0):
+        self.optimization_level = optimization_level
+        self.diagnostics = []
+        self.variables = VariableTable()
+
+    def strip_comments(self, chunks):
+        """
+            Removes comments from the input, yielding each line of it as soon as it is complete. Comments
+            may span lines and chunks. An opening parenthesis that is never closed is not a comment.
+
+            :parameters:
+                chunks - An iterable of consecutive pieces of the input.
+        """
+
+        line = []
+        comment = None
+
+        for chunk in chunks:
+            position = 0
+            while position < len(chunk):
+                if comment is not None:
+                    end = chunk.find(")", position)
+                    if end == -1:
+                        comment.append(chunk[position:])
+                        break
+
+                    comment = None
+                    position = end + 1
+                    continue
+
+                end = chunk.find("(", position)
+                text = chunk[position:] if end == -1 else chunk[position:end]
+
+                # Hand out every complete line within the text outside of the comment
+                lines = text.split("\n")
+                for index in range(len(lines) - 1):
+                    line.append(lines[index])
+                    yield "".join(line)
+                    line = []
+                line.append(lines[-1])
+
+                if end == -1:
+                    break
+
+                comment = ["("]
+                position = end + 1
+
+        # An unterminated comment is regular text after all
+        if comment is not None:
+            lines = "".join(comment).split("\n")
+            for index in range(len(lines) - 1):
+                line.append(lines[index])
+                yield "".join(line)
+                line = []
+            line.append(lines[-1])
+
+        yield "".join(line)
+
+    def scan_line(self, line, line_number):
+        """
+            Scans a single line with comments removed and surrounding whitespace stripped into tokens. At
+            each position, a definition (':' and the rest of the line) is matched first, then a string of at
+            least one character, then a word along with the spaces around it. Characters matching none of
+            these are skipped.
+
+            :parameters:
+                line - The line text.
+                line_number - The line number to report in errors.
+
+            :returns:
+                The list of Tokens on the line.
+        """
+
+        tokens = []
+        append = tokens.append
+        plain = "\t" not in line and "\r" not in line and "\f" not in line and "\v" not in line
+
+        # Lines of space separated words are by far the most common, so split those directly
+        if plain is True and ":" not in line and "\"" not in line:
+            position = 0
+            for text in line.split(" "):
+                if text != "":
+                    if text[0] in "+-0123456789" and (text[1:] if text[0] in "+-" else text).isdigit():
+                        try:
+                            append(Token(TOKEN_NUMBER, text, int(text), line_number, position, line))
+                            position = position + len(text) + 1
+                            continue
+                        except ValueError:
+                            pass
+                    append(Token(TOKEN_WORD, text, text, line_number, position, line))
+                position = position + len(text) + 1
+            return tokens
+
+        whitespace = self._whitespace
+        length = len(line)
+
+        position = 0
+        while position < length:
+            character = line[position]
+            start = position
+
+            if character == ":" and position + 1 < length:
+                text = line[position:]
+                append(Token(TOKEN_DEFINITION, text, text[1:].rstrip().lstrip(), line_number, start, line))
+                break
+            elif character == "\"" and line.find("\"", position + 1) > position + 1:
+                position = line.find("\"", position + 1) + 1
+                text = line[start:position]
+                append(Token(TOKEN_STRING, text, text.rstrip("\"").lstrip("\""), line_number, start, line))
+                continue
+
+            while character == " ":
+                position = position + 1
+                if position == length:
+                    return tokens
+                character = line[position]
+
+            if character in whitespace:
+                position = position + 1
+                continue
+
+            if plain is True:
+                end = line.find(" ", position)
+                if end == -1:
+                    end = length
+            else:
+                end = position
+                while end < length and line[end] not in whitespace:
+                    end = end + 1
+
+            text = line[position:end]
+            position = end
+            while position < length and line[position] == " ":
+                position = position + 1
+
+            # Words starting with ':' are only possible at the end of the line
+            first = text[0]
+            if first == ":":
+                append(Token(TOKEN_DEFINITION, text, text[1:].rstrip().lstrip(), line_number, start, line))
+                continue
+            elif first in "+-0123456789" and (text[1:] if first in "+-" else text).isdigit():
+                try:
+                    append(Token(TOKEN_NUMBER, text, int(text), line_number, start, line))
+                    continue
+                except ValueError:
+                    pass
+
+            if first == "\"" and text[-1] == "\"":
+                append(Token(TOKEN_STRING, text, text.rstrip("\"").lstrip("\""), line_number, start, line))
+            else:
+                append(Token(TOKEN_WORD, text, text, line_number, start, line))
+
+        return tokens
+
+    def scan_lines(self, lines):
+        """
+            Scans lines with comments removed into tokens. Blank lines are skipped and lines are numbered
+            from the first line that is not blank.
+
+            :parameters:
+                lines - An iterable of lines.
+
+            :returns:
+                A generator producing the list of Tokens on each line that is not blank.
+        """
+
+        line_number = 0
+        for line in lines:
+            line = line.rstrip().lstrip()
+
+            if line_number != 0 or line != "":
+                line_number = line_number + 1
+            if line == "":
+                continue
+
+            yield self.scan_line(line, line_number)
+
+    def scan(self, input):
+        """
+            Scans the input into tokens in a single pass.
+
+            :parameters:
+                input - The input string.
+
+            :returns:
+                The list of Tokens.
+        """
+
+        tokens = []
+        for line_tokens in self.scan_lines(self.strip_comments([input])):
+            tokens.extend(line_tokens)
+        return tokens
+
+    def syntax_analysis(self, tokens, processed_code_block=False):
+        """
+            Performs a syntax analysis on the input FORTH, ensuring that the syntax is correct.
+
+            :parameters:
+                tokens - The input tokens to process.
+                processed_code_block - Whether a code block was already declared before these tokens.
+        """
+
+        def throw_error(error_message, token):
+            """
+                Helper function to throw an error with some useful information including visually where the problem lies.
+
+                :parameters:
+                    error_message - The message to throw.
+                    token - The offending token.
+            """
+            highlight_text = ""
+
+            for iteration in range(len(error_message) + token.start):
+                highlight_text += " "
+            highlight_text += "^"
+            error_message += token.source
+
+            helper_text = "The Error is Here---"
+            if len(helper_text) < len(highlight_text):
+                text_data = list(highlight_text)
+
+                start_index = (len(highlight_text) - 1) - len(helper_text)
+                for index, character in enumerate(helper_text):
+                    text_data[start_index + index] = character
+
+                highlight_text = "".join(text_data)
+
+            raise CompilerError("\n%s\n%s" % (error_message, highlight_text))
+
+        for token in tokens:
+            # If we're not processing a code block and our current token isn't one, we have an issue
+            if processed_code_block is False and token.kind != TOKEN_DEFINITION:
+                throw_error("Began FORTH programming, but no code block was declared on line %u, character %u: " % (token.line, token.start), token)
+
+            # If we passed the above check, then we're good on code blocks
+            processed_code_block = True
+
+            # Any tokens with " at the beginning or end should be complete
+            if token.kind != TOKEN_STRING and (token.text[0] == "\"" or token.text[-1] == "\""):
+                throw_error("Found incomplete string on line %u, character %u: " % (token.line, token.start), token)
+
+    def lexical_analysis(self, callable):
+        """
+            Performs a lexical analysis on a built callable. This is used to ensure that the program actually makes sense once it is verified to be syntactically
+            correct: the stack effect and the types of the values of the callable are worked out, operations that always fail or take values from the
+            stack of the caller are reported to the diagnostics and the operations proven safe are run unchecked. See analyze.
+
+            :parameters:
+                callable - The callable.
+        """
+
+        result = analyze(callable)
+
+        self.diagnostics.extend(result.diagnostics)
+        self.analyzed_operations = self.analyzed_operations + result.operations
+        self.safe_operations = self.safe_operations + len(result.safe)
+
+    def resolve_branches(self, payload, positions):
+        """
+            Performs the control flow pass over a callable's payload, matching if/else/then, begin/until and
+            begin/while/repeat constructs (including nested ones) and resolving the absolute instruction pointer
+            that each branching word transfers control to. Loops written as begin/while/repeat/then, where each
+            while exits past the following then, are accepted as well, as long as that then does not close an
+            enclosing if.
+
+            :parameters:
+                payload - The list of operations making up the callable.
+                positions - The list of tokens each operation was produced from, used for error reporting.
+
+            :returns:
+                A dictionary mapping the instruction pointer of each branching word to its jump target.
+        """
+
+        targets = {}
+        open_blocks = []
+        loop_thens = set()
+
+        def throw_error(error_message, index):
+            raise CompilerError("%s on line %u, character %u." % (error_message, positions[index].line, positions[index].start))
+
+        for index, op in enumerate(payload):
+            if type(op) is CodeString or type(op) is CodeNumber:
+                continue
+
+            if op == "if" or op == "begin":
+                # Each open block is [opening word, opening index, list of pending exits]
+                open_blocks.append([op, index, []])
+            elif op == "else":
+                if len(open_blocks) == 0 or open_blocks[-1][0] != "if":
+                    throw_error("Found 'else' without a matching 'if'", index)
+
+                # A false if resumes right after the else, the true path jumps over the false path
+                block = open_blocks[-1]
+                targets[block[1]] = index + 1
+                block[0] = "else"
+                block[1] = index
+            elif op == "then":
+                if index in loop_thens:
+                    continue
+                if len(open_blocks) == 0 or open_blocks[-1][0] not in ("if", "else"):
+                    throw_error("Found 'then' without a matching 'if'", index)
+
+                targets[open_blocks.pop()[1]] = index + 1
+            elif op == "while":
+                if len(open_blocks) == 0 or open_blocks[-1][0] != "begin":
+                    throw_error("Found 'while' without a matching 'begin'", index)
+
+                open_blocks[-1][2].append(index)
+            elif op == "until" or op == "repeat":
+                if len(open_blocks) == 0 or open_blocks[-1][0] != "begin":
+                    throw_error("Found '%s' without a matching 'begin'" % op, index)
+
+                block = open_blocks.pop()
+                targets[index] = block[1] + 1
+
+                # A then right after the loop that closes no if ends the loop, and the exits leave past it
+                exit_target = index + 1
+                following = payload[index + 1] if index + 1 < len(payload) else None
+                if len(block[2]) != 0 and type(following) is not CodeString and type(following) is not CodeNumber and following == "then" and (len(open_blocks) == 0 or open_blocks[-1][0] not in ("if", "else")):
+                    loop_thens.add(index + 1)
+                    exit_target = index + 2
+
+                for exit_index in block[2]:
+                    targets[exit_index] = exit_target
+
+        if len(open_blocks) != 0:
+            throw_error("Found '%s' without a matching terminator" % payload[open_blocks[-1][1]], open_blocks[-1][1])
+
+        return targets
+
+    def optimize(self, payload, branch_targets):
+        """
+            Performs the peephole optimization pass over a callable's payload according to the
+            optimization level. Sequences are never combined across a branch target, and the branch
+            targets are remapped to the optimized payload.
+
+            :parameters:
+                payload - The list of operations making up the callable.
+                branch_targets - The resolved branch targets of the payload.
+
+            :returns:
+                A tuple of the optimized payload and its branch targets.
+        """
+
+        # Relative jumps are computed at run time, so we can't move anything around
+        if self.optimization_level <= 0 or "jump" in payload:
+            return payload, branch_targets
+
+        target_indices = set(branch_targets.values())
+
+        # Each output entry is [operation, original index, whether a branch lands on it]
+        output = []
+        barrier = False
+        for index, op in enumerate(payload):
+            barrier = barrier or index in target_indices
+            is_word = type(op) is not CodeNumber and type(op) is not CodeString
+
+            # Dead operations are dropped, a branch landing on them lands on whatever follows
+            if is_word and op in self._dead_operations:
+                continue
+
+            # Only the first operation of a combined sequence may have a branch land on it
+            previous = output[-1] if len(output) != 0 and barrier is False else None
+
+            if previous is not None and is_word and op in self._arithmetic_operations and previous[2] is False and len(output) >= 2 and type(previous[0]) is CodeNumber and type(output[-2][0]) is CodeNumber and (op not in ("/", "%") or previous[0].data != 0):
+                # Constant folding
+                output.pop()
+                output[-1][0] = CodeNumber(self._arithmetic_operations[op](output[-1][0].data, previous[0].data))
+            elif previous is not None and is_word and self.optimization_level >= 2 and self.fuse(previous[0], op) is not None:
+                previous[0] = self.fuse(previous[0], op)
+            else:
+                output.append([op, index, barrier])
+
+            barrier = False
+
+        return [entry[0] for entry in output], remap_branches(len(payload), [entry[1] for entry in output], branch_targets)
+
+    def fuse(self, previous, op):
+        """
+            Determines the superinstruction that a pair of operations may be fused into.
+
+            :parameters:
+                previous - The first operation of the pair.
+                op - The second operation of the pair, a word.
+
+            :returns:
+                The CodeSuperinstruction to replace the pair with or None if they cannot be fused.
+        """
+
+        if type(previous) is CodeNumber and op in self._arithmetic_operations:
+            if op in ("/", "%") and previous.data == 0:
+                return None
+            return CodeSuperinstruction("literal" + op, previous.data)
+        elif type(previous) is CodeString and op in ("@", "!"):
+            return CodeSuperinstruction("literal" + op, previous.data)
+        elif previous == "dup" and op == "*":
+            return CodeSuperinstruction("dup*")
+        elif previous == "swap" and op == "pop":
+            return CodeSuperinstruction("nip")
+
+        return None
+
+    def declare_variables(self, payload, positions, declared):
+        """
+            Removes the variable declarations from a callable's payload.
+
+            :parameters:
+                payload - The list of operations making up the callable.
+                positions - The list of tokens each operation was produced from.
+                declared - The set of global variables declared so far by the source, which the global
+                    variables declared by the callable are added to.
+
+            :returns:
+                A tuple of the payload and positions without the declarations, the list of local variables
+                and the list of global variables declared by the callable.
+        """
+
+        result_payload = []
+        result_positions = []
+        local_variables = []
+        global_variables = []
+
+        index = 0
+        while index < len(payload):
+            token = positions[index]
+
+            if token.kind == TOKEN_WORD and token.value in self._declarations:
+                if index + 1 >= len(payload) or positions[index + 1].kind != TOKEN_WORD:
+                    raise CompilerError("Expected a variable name after '%s' on line %u, character %u." % (token.value, token.line, token.start))
+
+                variable = positions[index + 1].value
+                if token.value == "local" and variable not in local_variables:
+                    local_variables.append(variable)
+                elif token.value == "variable" and variable not in global_variables:
+                    global_variables.append(variable)
+                    declared.add(variable)
+                    self.variables.lookup(variable)
+
+                index = index + 2
+                continue
+
+            result_payload.append(payload[index])
+            result_positions.append(token)
+            index = index + 1
+
+        return result_payload, result_positions, local_variables, global_variables
+
+    def declared_globals(self, tokens):
+        """
+            Finds the global variables the tokens of a definition declare, the way declare_variables does.
+
+            :parameters:
+                tokens - The tokens of the definition.
+
+            :returns:
+                The list of the names of the global variables, each of which is given a slot.
+        """
+
+        result = []
+
+        index = 0
+        while index < len(tokens) - 1:
+            token = tokens[index]
+
+            if token.kind == TOKEN_WORD and token.value in self._declarations and tokens[index + 1].kind == TOKEN_WORD:
+                if token.value == "variable":
+                    result.append(tokens[index + 1].value)
+                    self.variables.lookup(tokens[index + 1].value)
+                index = index + 2
+                continue
+
+            index = index + 1
+
+        return result
+
+    def resolve_variables(self, payload, branch_targets, local_variables, declared):
+        """
+            Performs the variable resolution pass over a callable's payload, replacing each access of a
+            declared variable by name, a string literal followed by '@' or '!', with a superinstruction
+            accessing its slot directly. Accesses of any other name are left alone.
+
+            :parameters:
+                payload - The list of operations making up the callable.
+                branch_targets - The resolved branch targets of the payload.
+                local_variables - The list of local variables declared by the callable.
+                declared - The set of global variables declared so far by the source.
+
+            :returns:
+                A tuple of the resolved payload and its branch targets.
+        """
+
+        target_indices = set(branch_targets.values())
+
+        # Relative jumps are computed at run time, so a nop takes the place of the fused word
+        compact = "jump" not in payload
+
+        output = []
+        origins = []
+        index = 0
+        while index < len(payload):
+            op = payload[index]
+            following = payload[index + 1] if index + 1 < len(payload) else None
+
+            if type(op) is CodeString and (following == "@" or following == "!") and index + 1 not in target_indices:
+                if op.data in local_variables:
+                    op = CodeSuperinstruction("local" + following, local_variables.index(op.data))
+                elif op.data in declared:
+                    op = CodeSuperinstruction("global" + following, GlobalSlot(self.variables.lookup(op.data), op.data))
+
+            output.append(op)
+            origins.append(index)
+            index = index + 1
+
+            if type(op) is CodeSuperinstruction:
+                if compact is False:
+                    output.append("nop")
+                    origins.append(index)
+                index = index + 1
+
+        if compact is False:
+            return output, branch_targets
+        return output, remap_branches(len(payload), origins, branch_targets)
+
+    def build_callable(self, payload, positions, name, constants, declared=None):
+        """
+            Builds a callable from its payload, resolving its branch targets and variables and optimizing it.
+
+            :parameters:
+                payload - The list of operations making up the callable.
+                positions - The list of tokens each operation was produced from.
+                name - The name of the callable.
+                constants - The ConstantPool to store literals in.
+                declared - The set of global variables declared so far by the source, or None if the callable
+                    is compiled on its own.
+        """
+
+        if declared is None:
+            declared = set()
+
+        payload, positions, local_variables, global_variables = self.declare_variables(payload, positions, declared)
+        branch_targets = self.resolve_branches(payload, positions)
+        payload, branch_targets = self.resolve_variables(payload, branch_targets, local_variables, declared)
+        payload, branch_targets = self.optimize(payload, branch_targets)
+
+        result = Callable(payload, name, branch_targets, constants, local_variables, global_variables)
+        self.lexical_analysis(result)
+        return result
+
+    def build_operation(self, token):
+        """
+            Builds the operation a token represents.
+
+            :parameters:
+                token - The token.
+
+            :returns:
+                A CodeNumber, CodeString or the name of the word.
+        """
+
+        if token.kind == TOKEN_NUMBER:
+            return CodeNumber(token.value)
+        elif token.kind == TOKEN_STRING:
+            return CodeString(token.value)
+        return token.value
+
+    def split_definitions(self, tokens):
+        """
+            Splits tokens into the definitions they make up.
+
+            :parameters:
+                tokens - An iterable of tokens.
+
+            :returns:
+                A generator producing a tuple of the name, operations and tokens of each definition as soon
+                as it is complete.
+        """
+
+        callable_data = None
+        callable_positions = None
+
+        current_callable_name = None
+        for token in tokens:
+            if token.kind == TOKEN_DEFINITION:
+                if callable_data is not None:
+                    yield current_callable_name, callable_data, callable_positions
+
+                current_callable_name = token.value
+                callable_data = []
+                callable_positions = []
+            else:
+                callable_positions.append(token)
+                callable_data.append(self.build_operation(token))
+
+        if current_callable_name is not None and callable_data is not None and len(callable_data) != 0:
+            yield current_callable_name, callable_data, callable_positions
+
+    def build_result(self, tokens):
+        """
+            Builds the final codeblock containing callable functions.
+
+            :parameters:
+                tokens - The input tokens.
+        """
+
+        result = {}
+        constants = ConstantPool()
+        declared = set()
+
+        for name, payload, positions in self.split_definitions(tokens):
+            result[name] = self.build_callable(payload, positions, name, constants, declared)
+
+        return CodeBlock(result, constants, self.variables)
+
+    def compile_forth(self, payload):
+        """
+            Builds the input FORTH into a usable interpreted sequence.
+
+            :parameters:
+                payload - The input string.
+        """
+
+        self.diagnostics = []
+        self.analyzed_operations = 0
+        self.safe_operations = 0
+
+        tokens = self.scan(payload)
+        self.syntax_analysis(tokens)
+
+        return self.build_result(tokens)
+
+    def compile_stream(self, stream, chunk_size=65536):
+        """
+            Compiles FORTH read incrementally from a file like object, producing each callable as soon as its
+            definition is complete. Only the current line and definition are held in memory, which allows
+            compiling very large sources.
+
+            :parameters:
+                stream - The file like object to read from.
+                chunk_size - How many characters to read at once.
+
+            :returns:
+                A generator producing each Callable in the order they are defined. All of the callables share
+                the same ConstantPool.
+        """
+
+        constants = ConstantPool()
+
+        self.diagnostics = []
+        self.analyzed_operations = 0
+        self.safe_operations = 0
+
+        def checked_tokens():
+            processed_code_block = False
+            for tokens in self.scan_lines(self.strip_comments(iter(lambda: stream.read(chunk_size), ""))):
+                self.syntax_analysis(tokens, processed_code_block)
+                processed_code_block = True
+
+                for token in tokens:
+                    yield token
+
+        declared = set()
+        for name, payload, positions in self.split_definitions(checked_tokens()):
+            yield self.build_callable(payload, positions, name, constants, declared)
+
+    def compile_lazy(self, payload):
+        """
+            Indexes the definitions of the input FORTH without compiling them. Each definition is only scanned
+            and compiled the first time its callable is looked up, so loading a large library costs little
+            more than finding where its definitions start and programs only pay for the words they use.
+
+            Only the lines declaring a definition or a global variable are scanned up front, the latter so that
+            each definition resolves the global variables declared before it just like compile_forth. Errors
+            within a definition are raised once it is compiled. Each pending definition only keeps its own
+            lines of the input, which are released once it is compiled.
+
+            :parameters:
+                payload - The input string.
+
+            :returns:
+                The CodeBlock, whose callable_functions is a LazyCallableTable.
+        """
+
+        constants = ConstantPool()
+
+        self.diagnostics = []
+        self.analyzed_operations = 0
+        self.safe_operations = 0
+
+        lines = []
+        numbers = array.array("i")
+
+        # Each definition as a list of its name, the tokens following it on its line, its first and last
+        # line and the tokens ahead of the next definition on the line of the latter
+        definitions = []
+
+        line_number = 0
+        for line in self.strip_comments([payload]):
+            line = line.rstrip().lstrip()
+
+            if line_number != 0 or line != "":
+                line_number = line_number + 1
+            if line == "":
+                continue
+
+            if ":" in line:
+                tokens = self.scan_line(line, line_number)
+                positions = [position for position, token in enumerate(tokens) if token.kind == TOKEN_DEFINITION]
+
+                if len(positions) != 0:
+                    self.syntax_analysis(tokens, len(definitions) != 0)
+
+                    # The tokens ahead of the first definition on the line belong to the previous one
+                    if len(definitions) != 0:
+                        definitions[-1][3] = len(lines)
+                        definitions[-1][4] = tokens[:positions[0]]
+
+                    for index, position in enumerate(positions):
+                        end = positions[index + 1] if index + 1 < len(positions) else len(tokens)
+                        definitions.append([tokens[position].value, tokens[position + 1:end], len(lines), len(lines), []])
+                    continue
+
+            if len(definitions) == 0:
+                self.syntax_analysis(self.scan_line(line, line_number))
+
+            lines.append(line)
+            numbers.append(line_number)
+
+        if len(definitions) != 0:
+            definitions[-1][3] = len(lines)
+
+        def definition_tokens(head, text, line_numbers, ending):
+            tokens = list(head)
+            for line, line_number in zip(text, line_numbers):
+                tokens.extend(self.scan_line(line, line_number))
+            tokens.extend(ending)
+            return tokens
+
+        def load(name, head, text, line_numbers, ending, declared):
+            tokens = definition_tokens(head, text, line_numbers, ending)
+            self.syntax_analysis(tokens, True)
+
+            payload = [self.build_operation(token) for token in tokens]
+            return self.build_callable(payload, tokens, name, constants, set(declared))
+
+        loaders = {}
+        declared = frozenset()
+        for index, (name, head, first, last, ending) in enumerate(definitions):
+            # Like split_definitions, a trailing definition without operations is left out
+            if index == len(definitions) - 1 and len(head) == 0 and first == last and len(ending) == 0:
+                break
+
+            # Each loader only holds the lines of its own definition, which are released once it has run
+            text = tuple(lines[first:last])
+            line_numbers = numbers[first:last]
+            loaders[name] = lambda name=name, head=head, text=text, line_numbers=line_numbers, ending=ending, declared=declared: load(name, head, text, line_numbers, ending, declared)
+
+            if any("variable" in line for line in text) or any(token.value == "variable" for token in head + ending):
+                declared = declared.union(self.declared_globals(definition_tokens(head, text, line_numbers, ending)))
+
+        return CodeBlock(LazyCallableTable(loaders), constants, self.variables)
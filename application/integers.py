@@ -0,0 +1,439 @@
+"""
+    integers.py
+
+    Python source file declaring the integer mode, which runs callables proven to only ever put numbers
+    on the stack with arithmetic builtins that skip converting their operands and update the top of the
+    stack in place, and the unchecked arithmetic the compiler uses for operations its analysis proved
+    to only receive numbers.
+
+    The stack stays the list every other builtin works with rather than a preallocated array of machine
+    integers. Such an array would turn booleans into 1 and 0 and could not hold the longs arithmetic
+    overflows into, and every builtin, the threaded and JIT code, snapshots and error reports would have
+    to go through its top index instead of the list.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import builtins
+import compiler
+
+_numbers = (int, long, bool)
+"""
+    The types of the values the integer mode handles. Booleans behave as the integers 1 and 0 in
+    arithmetic, so the results of comparisons may stay on the stack.
+"""
+
+def widen(interp):
+    """
+        Leaves the integer mode, as soon as a value other than a number shows up. The dispatch table of the
+        integer mode is patched back to the generic builtins in place, so that the dispatch loop running
+        with it picks them up from the next operation on.
+
+        :parameters:
+            interp - The interpreter running in the integer mode.
+    """
+
+    dispatch_table, integer_table, proven = interp.integer_dispatch
+    integer_table[:] = dispatch_table
+    interp.integer_dispatch = (dispatch_table, None, proven)
+
+def add(interp):
+    """
+        The + operator in the integer mode, replacing the element behind the top in place.
+    """
+
+    stack = interp.stack
+    rhs = stack.pop()
+    try:
+        stack[-1] = stack[-1] + rhs
+    except IndexError:
+        # Fail just like the builtin
+        stack.pop()
+
+def sub(interp):
+    """
+        The - operator in the integer mode.
+    """
+
+    stack = interp.stack
+    rhs = stack.pop()
+    try:
+        stack[-1] = stack[-1] - rhs
+    except IndexError:
+        stack.pop()
+
+def mult(interp):
+    """
+        The * operator in the integer mode.
+    """
+
+    stack = interp.stack
+    rhs = stack.pop()
+    try:
+        stack[-1] = stack[-1] * rhs
+    except IndexError:
+        stack.pop()
+
+def div(interp):
+    """
+        The / operator in the integer mode.
+    """
+
+    # A division by zero has to leave the stack just like the builtin
+    stack = interp.stack
+    rhs = stack.pop()
+    lhs = stack.pop()
+    stack.append(lhs / rhs)
+
+def mod(interp):
+    """
+        The % operator in the integer mode.
+    """
+
+    # A division by zero has to leave the stack just like the builtin
+    stack = interp.stack
+    rhs = stack.pop()
+    lhs = stack.pop()
+    stack.append(lhs % rhs)
+
+def add_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the + operator in the integer mode.
+    """
+
+    stack = interp.stack
+    try:
+        stack[-1] = stack[-1] + value
+    except IndexError:
+        stack.pop()
+
+def sub_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the - operator in the integer mode.
+    """
+
+    stack = interp.stack
+    try:
+        stack[-1] = stack[-1] - value
+    except IndexError:
+        stack.pop()
+
+def mult_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the * operator in the integer mode.
+    """
+
+    stack = interp.stack
+    try:
+        stack[-1] = stack[-1] * value
+    except IndexError:
+        stack.pop()
+
+def div_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the / operator in the integer mode.
+    """
+
+    stack = interp.stack
+    try:
+        stack[-1] = stack[-1] / value
+    except IndexError:
+        stack.pop()
+
+def mod_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the % operator in the integer mode.
+    """
+
+    stack = interp.stack
+    try:
+        stack[-1] = stack[-1] % value
+    except IndexError:
+        stack.pop()
+
+def square(interp, value):
+    """
+        Superinstruction for dup followed by the * operator in the integer mode.
+    """
+
+    stack = interp.stack
+    try:
+        stack[-1] = stack[-1] * stack[-1]
+    except IndexError:
+        stack.pop()
+
+def fetch_literal(interp, key):
+    """
+        Superinstruction for a string literal followed by the fetch operator (@) in the integer mode.
+    """
+
+    if key in interp.local_variables:
+        value = interp.local_variables[key]
+    elif key in interp.variable_table.slots:
+        value = builtins.read_global(interp, interp.variable_table.slots[key])
+    else:
+        value = interp.global_variables[key]
+
+    if type(value) not in _numbers:
+        widen(interp)
+    interp.stack.append(value)
+
+def fetch_global(interp, slot):
+    """
+        Superinstruction for fetching a declared global variable in the integer mode.
+    """
+
+    try:
+        value = interp.global_slots[slot]
+    except IndexError:
+        value = builtins.UNSET
+    if value is builtins.UNSET:
+        value = interp.global_variables[interp.variable_table.names[slot]]
+
+    if type(value) not in _numbers:
+        widen(interp)
+    interp.stack.append(value)
+
+def fetch_local(interp, slot):
+    """
+        Superinstruction for fetching a local variable of the current call in the integer mode.
+    """
+
+    value = interp.frame[slot]
+
+    if value is builtins.UNSET:
+        raise KeyError(interp.callable.local_variables[slot])
+    if type(value) not in _numbers:
+        widen(interp)
+    interp.stack.append(value)
+
+specialized = {
+    builtins.add: add,
+    builtins.sub: sub,
+    builtins.mult: mult,
+    builtins.div: div,
+    builtins.mod: mod,
+    builtins.add_literal: add_literal,
+    builtins.sub_literal: sub_literal,
+    builtins.mult_literal: mult_literal,
+    builtins.div_literal: div_literal,
+    builtins.mod_literal: mod_literal,
+    builtins.square: square,
+    builtins.fetch_literal: fetch_literal,
+    builtins.fetch_global: fetch_global,
+    builtins.fetch_local: fetch_local,
+}
+"""
+    A dictionary mapping builtins to their version for the integer mode. These leave the integer mode
+    before pushing anything other than a number.
+"""
+
+_preserving = frozenset([builtins.swap, builtins.pop, builtins.dup, builtins.over, builtins.rot, builtins.nip,
+    builtins.randint, builtins.equals, builtins.less_than, builtins.greater_than, builtins.less_than_equal,
+    builtins.greater_than_equal, builtins.not_command, builtins.nop, builtins.begin, builtins.ifblock,
+    builtins.elseblock, builtins.until, builtins.whileblock, builtins.repeat, builtins.returnop, builtins.exit,
+    builtins.println, builtins.print_stack, builtins.store_literal, builtins.store_global, builtins.store_local, builtins.inline])
+"""
+    Builtins that only ever push numbers when given numbers, so they run in the integer mode as they are.
+"""
+
+_calls = frozenset([builtins.call_direct, builtins.tail_call])
+"""
+    Superinstructions transferring control to the callable of a Link.
+"""
+
+_literal_operators = frozenset([builtins.add_literal, builtins.sub_literal, builtins.mult_literal,
+    builtins.div_literal, builtins.mod_literal])
+"""
+    Superinstructions taking a number as their operand.
+"""
+
+def is_integer_callable(callable, dispatch_table, proven):
+    """
+        Determines whether a callable and every callable it may call only ever put numbers on the stack
+        when run with the given dispatch table, as long as the variables they fetch hold numbers.
+
+        :parameters:
+            callable - The callable.
+            dispatch_table - The dispatch table the callable runs with.
+            proven - A dictionary of the callables already looked at to whether they passed, shared
+                between calls with the same dispatch table.
+
+        :returns:
+            True if the callable may run in the integer mode, False otherwise.
+    """
+
+    if callable in proven:
+        return proven[callable]
+
+    # Recursive calls assume the callable passes, since the rest of it is checked anyway
+    proven[callable] = True
+
+    constants = callable.constants.values
+
+    result = True
+    for index, opcode in enumerate(callable.code):
+        operand = callable.operands[index]
+
+        if opcode == compiler.OPCODE_STRING:
+            result = False
+        elif opcode == compiler.OPCODE_NUMBER:
+            result = type(constants[operand]) in _numbers
+        elif opcode >= len(dispatch_table):
+            result = False
+        else:
+            handler = dispatch_table[opcode]
+            if handler in _calls:
+                link = constants[operand]
+                result = link.name in link.table and is_integer_callable(link.table[link.name], dispatch_table, proven)
+            elif handler in _literal_operators:
+                result = type(constants[operand]) in _numbers
+            else:
+                result = handler in specialized or handler in _preserving
+
+        if result is False:
+            break
+
+    proven[callable] = result
+    return result
+
+def build_dispatch_table(dispatch_table):
+    """
+        Builds the dispatch table for the integer mode, replacing each builtin of a dispatch table by its
+        version for the integer mode. Commands that were replaced are kept as they are.
+
+        :parameters:
+            dispatch_table - The dispatch table to build from.
+
+        :returns:
+            The dispatch table for the integer mode.
+    """
+
+    return [specialized.get(handler, handler) if handler is not None else None for handler in dispatch_table]
+
+def unchecked_add(interp):
+    """
+        The + operator for operands proven to be numbers pushed by the callable. See compiler.analyze.
+    """
+
+    stack = interp.stack
+    rhs = stack.pop()
+    stack[-1] = stack[-1] + rhs
+
+def unchecked_sub(interp):
+    """
+        The - operator for operands proven to be numbers pushed by the callable.
+    """
+
+    stack = interp.stack
+    rhs = stack.pop()
+    stack[-1] = stack[-1] - rhs
+
+def unchecked_mult(interp):
+    """
+        The * operator for operands proven to be numbers pushed by the callable.
+    """
+
+    stack = interp.stack
+    rhs = stack.pop()
+    stack[-1] = stack[-1] * rhs
+
+def unchecked_div(interp):
+    """
+        The / operator for operands proven to be numbers pushed by the callable.
+    """
+
+    stack = interp.stack
+    rhs = stack.pop()
+    lhs = stack.pop()
+    stack.append(lhs / rhs)
+
+def unchecked_mod(interp):
+    """
+        The % operator for operands proven to be numbers pushed by the callable.
+    """
+
+    stack = interp.stack
+    rhs = stack.pop()
+    lhs = stack.pop()
+    stack.append(lhs % rhs)
+
+def unchecked_add_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the + operator, for an operand proven to be a number
+        pushed by the callable.
+    """
+
+    stack = interp.stack
+    stack[-1] = stack[-1] + value
+
+def unchecked_sub_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the - operator, for an operand proven to be a number.
+    """
+
+    stack = interp.stack
+    stack[-1] = stack[-1] - value
+
+def unchecked_mult_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the * operator, for an operand proven to be a number.
+    """
+
+    stack = interp.stack
+    stack[-1] = stack[-1] * value
+
+def unchecked_div_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the / operator, for an operand proven to be a number.
+    """
+
+    stack = interp.stack
+    stack[-1] = stack[-1] / value
+
+def unchecked_mod_literal(interp, value):
+    """
+        Superinstruction for a literal followed by the % operator, for an operand proven to be a number.
+    """
+
+    stack = interp.stack
+    stack[-1] = stack[-1] % value
+
+def unchecked_square(interp, value):
+    """
+        Superinstruction for dup followed by the * operator, for an operand proven to be a number.
+    """
+
+    stack = interp.stack
+    stack[-1] = stack[-1] * stack[-1]
+
+unchecked = {
+    "+": unchecked_add,
+    "-": unchecked_sub,
+    "*": unchecked_mult,
+    "/": unchecked_div,
+    "%": unchecked_mod,
+    "{literal+}": unchecked_add_literal,
+    "{literal-}": unchecked_sub_literal,
+    "{literal*}": unchecked_mult_literal,
+    "{literal/}": unchecked_div_literal,
+    "{literal%}": unchecked_mod_literal,
+    "{dup*}": unchecked_square,
+}
+"""
+    A dictionary mapping the opcode names of the arithmetic builtins to their unchecked variant, which
+    neither converts its operands nor checks the stack holds them. The compiler only uses these where its
+    analysis proved both, so they leave the stack exactly like the builtins.
+"""
+
+def is_integer_stack(stack):
+    """
+        Determines whether a stack only holds numbers.
+    """
+
+    for value in stack:
+        if type(value) not in _numbers:
+            return False
+    return True
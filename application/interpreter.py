@@ -11,11 +11,20 @@
 
 import os
 import sys
+import copy
 import random
 import datetime
+import itertools
+import collections
 import traceback
 
+import jit
+import linker
 import compiler
+import integers
+import ropes
+import memoization
+import asynchronous
 import builtins
 
 class InterpreterError(StandardError):
@@ -24,6 +33,144 @@ class InterpreterError(StandardError):
 class InterpreterTypeError(InterpreterError):
     pass
 
+class InterpreterLimitError(InterpreterError):
+    """
+        Exception raised once a program executes more commands than the command_maximum of its interpreter.
+        It is the reason of the InterpreterRuntimeError the interpreter fails with.
+    """
+
+    pass
+
+class UnknownValue(object):
+    """
+        A class representing a stack element whose value could not be recovered from the frame
+        history of an interpreter.
+    """
+
+    def __repr__(self):
+        return "?"
+
+_top_local = frozenset([builtins.strcat, builtins.swap, builtins.pop, builtins.dup, builtins.randint, builtins.add,
+    builtins.sub, builtins.mult, builtins.div, builtins.println, builtins.mod, builtins.store, builtins.fetch,
+    builtins.jump, builtins.ifblock, builtins.elseblock, builtins.equals, builtins.greater_than,
+    builtins.greater_than_equal, builtins.less_than, builtins.less_than_equal, builtins.begin, builtins.until,
+    builtins.print_stack, builtins.not_command, builtins.nop, builtins.rot, builtins.exit, builtins.whileblock,
+    builtins.repeat, builtins.inline, builtins.add_literal, builtins.sub_literal, builtins.mult_literal,
+    builtins.div_literal, builtins.mod_literal, builtins.square, builtins.nip, builtins.fetch_literal,
+    builtins.store_literal, builtins.fetch_global, builtins.store_global, builtins.fetch_local,
+    builtins.store_local]).union(integers.unchecked.values())
+"""
+    Builtins that only ever modify the top FrameHistory.window elements of the stack. Calls are left out, since
+    a memoized call replaces however many inputs the callable consumed.
+"""
+
+class FrameHistory(object):
+    """
+        A fixed size ring buffer of the most recent frames executed by an interpreter with stack debugging
+        enabled. Rather than a full copy of the stack, each frame records the stack depth and the few elements
+        at the top of the stack, which are the only ones most operations modify. Operations that may modify
+        the stack further down, such as over or commands that were replaced, record the full stack instead.
+        The full stacks are rebuilt backwards from the final stack of the interpreter when they are needed.
+    """
+
+    window = 3
+    """
+        How many elements from the top of the stack are recorded with each frame.
+    """
+
+    size = None
+    """
+        The maximum number of frames kept.
+    """
+
+    sample_rate = None
+    """
+        Only every sample_rate'th operation is recorded.
+    """
+
+    frames = None
+    """
+        The ring buffer of frames, each a tuple of the operation count, instruction pointer, callable,
+        stack depth and top of the stack, or the full stack for operations not known to leave the rest of it
+        alone.
+    """
+
+    position = None
+    """
+        The index in the ring buffer the next frame is written to.
+    """
+
+    count = None
+    """
+        How many operations have been seen, recorded or not.
+    """
+
+    def __init__(self, size, sample_rate=1):
+        self.size = size
+        self.sample_rate = sample_rate
+        self.frames = []
+        self.position = 0
+        self.count = 0
+
+    def record(self, interp):
+        """
+            Records the frame about to be executed by the given interpreter.
+
+            :parameters:
+                interp - The interpreter to record.
+        """
+
+        self.count = self.count + 1
+        if self.sample_rate != 1 and self.count % self.sample_rate != 0:
+            return
+
+        # Literals only ever push
+        opcode = interp.callable.code[interp.instruction_pointer]
+        if opcode <= compiler.OPCODE_STRING or (opcode < len(interp.dispatch_table) and interp.dispatch_table[opcode] in _top_local):
+            top = interp.stack[-self.window:]
+        else:
+            top = list(interp.stack)
+
+        frame = (self.count, interp.instruction_pointer, interp.callable, len(interp.stack), top)
+        if len(self.frames) < self.size:
+            self.frames.append(frame)
+        else:
+            self.frames[self.position] = frame
+            self.position = (self.position + 1) % self.size
+
+    def rebuild(self, stack):
+        """
+            Rebuilds the recorded frames from the final stack. Elements below the recorded top of the stack
+            are carried back from the following frame when no operation went unrecorded in between, and are
+            otherwise unknown.
+
+            :parameters:
+                stack - The stack after the most recent operation.
+
+            :returns:
+                A list of dictionaries with the operation count, stack, instruction pointer and callable
+                of each frame from the oldest to the most recent.
+        """
+
+        result = []
+        later = list(stack)
+        later_count = self.count + 1
+
+        for count, eip, callable, depth, top in reversed(self.frames[self.position:] + self.frames[:self.position]):
+            lower = depth - len(top)
+
+            if later_count == count + 1 and lower <= len(later):
+                snapshot = later[:lower] + top
+            else:
+                snapshot = [UnknownValue()] * lower + top
+
+            result.append({"count": count, "stack": snapshot, "eip": eip, "callable": callable})
+            later = snapshot
+            later_count = count
+
+        result.reverse()
+        return result
+
 class InterpreterRuntimeError(InterpreterError):
     """
         An exception class representing an exception raised by the FORTH interpreter,
@@ -41,10 +188,26 @@ class InterpreterRuntimeError(InterpreterError):
         raised.
     """
 
+    callable = None
+    """
+        The callable the error occurred in. For code the linker inlined, this is the callable the code
+        came from rather than the one it was inlined into.
+    """
+
+    instruction_pointer = None
+    """
+        The instruction pointer the error occurred at, within the callable it occurred in.
+    """
+
     def __init__(self, interpreter, reason, info):
         self.interpreter = interpreter
         self.reason = reason
 
+        self.callable = interpreter.callable
+        self.instruction_pointer = interpreter.instruction_pointer
+        if self.callable is not None and self.callable.inline_origins and type(self.instruction_pointer) is int:
+            self.callable, self.instruction_pointer = self.callable.inline_origins.get(self.instruction_pointer, (self.callable, self.instruction_pointer))
+
         exc_type, exc_obj, traceback = info
         self.exc_type = exc_type
         self.exc_obj = exc_obj
@@ -53,28 +216,36 @@ class InterpreterRuntimeError(InterpreterError):
     def __str__(self):
         # Produce frame snapshots
         snapshots = ""
-        for index, snapshot in enumerate(self.interpreter.frame_snapshots):
+        payloads = {}
+        for snapshot in self.interpreter.frame_history.rebuild(self.interpreter.stack):
             stack = snapshot["stack"]
             pointer = snapshot["eip"]
             callable = snapshot["callable"]
 
-            if pointer < 0 or pointer >= len(callable.payload):
+            if pointer < 0 or pointer >= len(callable.code):
                 pointer = "%u <Out of Bounds>" % pointer
             else:
-                pointer = "%u (%s)" % (pointer, callable.payload[pointer])
+                if callable not in payloads:
+                    payloads[callable] = callable.payload
+                pointer = "%u (%s)" % (pointer, payloads[callable][pointer])
 
-            snapshots = "%s\n        Frame %u, EIP %s in callable '%s': %s" % (snapshots, index, pointer, callable.name, stack)
+            snapshots = "%s\n        Frame %u, EIP %s in callable '%s': %s" % (snapshots, snapshot["count"], pointer, callable.name, stack)
 
         # To build the disassembly, we first pump out disassemblies for all the unique callables
-        disassembly = "\n\tCallable '%s'\n\tLength: %u\n%s" % (self.interpreter.callable.name, len(self.interpreter.callable.payload), self.interpreter.callable.disassemble())
+        disassembly = "\n\tCallable '%s'\n\tLength: %u\n%s" % (self.interpreter.callable.name, len(self.interpreter.callable.code), self.interpreter.callable.disassemble())
         disassembled_callables = []
 
-        for call in self.interpreter.call_stack:
-            if call["callable"] in disassembled_callables:
+        # Inlined code failing is disassembled where it came from as well
+        if self.callable is not self.interpreter.callable:
+            disassembly += "\n\tCallable '%s'\n\tLength: %u\n%s" % (self.callable.name, len(self.callable.code), self.callable.disassemble())
+            disassembled_callables.append(self.callable)
+
+        for instruction_pointer, callable, frame in self.interpreter.call_stack:
+            if callable in disassembled_callables:
                 continue
 
-            disassembly += "\n\tCallable '%s'\n\tLength: %u\n%s" % (call["callable"].name, len(call["callable"].payload), call["callable"].disassemble())
-            disassembled_callables.append(call["callable"])
+            disassembly += "\n\tCallable '%s'\n\tLength: %u\n%s" % (callable.name, len(callable.code), callable.disassemble())
+            disassembled_callables.append(callable)
 
         output = """
 
@@ -89,10 +260,238 @@ class InterpreterRuntimeError(InterpreterError):
         Program Disassembly:
         %s
 
-        """ % (repr(self.reason), self.interpreter.stack, self.interpreter.instruction_pointer, self.interpreter.callable.name, snapshots, disassembly)
+        """ % (repr(self.reason), self.interpreter.stack, self.instruction_pointer, self.callable.name, snapshots, disassembly)
 
         return output
 
+class InterpreterState(object):
+    """
+        A class representing the execution state of an interpreter at some point of a program, as taken by
+        Interpreter.snapshot. The state shares its containers with the interpreter rather than copying
+        them, so it is taken in constant time. The interpreter copies the containers it shares before it
+        modifies them again, so the state never changes afterwards.
+    """
+
+    stack = None
+    """
+        The stack.
+    """
+
+    global_variables = None
+    """
+        The dictionary of global variables.
+    """
+
+    local_variables = None
+    """
+        The dictionary of local variables.
+    """
+
+    global_slots = None
+    """
+        The list of global variable slots.
+    """
+
+    frame = None
+    """
+        The local variable slots of the current call.
+    """
+
+    call_stack = None
+    """
+        The call stack.
+    """
+
+    tail_returns = None
+    """
+        The depths of the call stack whose returns tail calls still owe to the command budget.
+    """
+
+    callable = None
+    """
+        The callable being executed.
+    """
+
+    instruction_pointer = None
+    """
+        The instruction pointer.
+    """
+
+    jump_target = None
+    """
+        The pending jump target, if any.
+    """
+
+    command_count = None
+    """
+        How many commands had been executed.
+    """
+
+    def __init__(self, interp):
+        self.stack = interp.stack
+        self.global_variables = interp.global_variables
+        self.local_variables = interp.local_variables
+        self.global_slots = interp.global_slots
+        self.frame = interp.frame
+        self.call_stack = interp.call_stack
+        self.tail_returns = interp.tail_returns
+        self.callable = interp.callable
+        self.instruction_pointer = interp.instruction_pointer
+        self.jump_target = interp.jump_target
+        self.command_count = interp.command_count
+
+def literal_handler(value):
+    """
+        Produces a handler for direct threaded code that pushes a literal value to the stack.
+
+        :parameters:
+            value - The literal value to push.
+
+        :returns:
+            A function accepting an interpreter, just like any builtin.
+    """
+
+    def push_literal(interp):
+        interp.stack.append(value)
+    return push_literal
+
+def deferred_handler(name):
+    """
+        Produces a handler for direct threaded code that looks up a command by name when it is
+        executed. This is used for words that are not known at the time a callable is threaded
+        so that they fail (or succeed, if registered later) at the same point the interpreter
+        would have.
+
+        :parameters:
+            name - The command name to look up.
+
+        :returns:
+            A function accepting an interpreter, just like any builtin.
+    """
+
+    def call_deferred(interp):
+        interp.commands[name](interp)
+    return call_deferred
+
+def superinstruction_handler(function, operand):
+    """
+        Produces a handler for direct threaded code that calls a superinstruction with its operand.
+
+        :parameters:
+            function - The superinstruction implementation.
+            operand - The literal operand of the superinstruction.
+
+        :returns:
+            A function accepting an interpreter, just like any builtin.
+    """
+
+    def call_superinstruction(interp):
+        function(interp, operand)
+    return call_superinstruction
+
+class FrozenTable(dict):
+    """
+        A dictionary that refuses to be modified, used for the tables of builtins shared by all interpreters.
+    """
+
+    def _refuse(self, *arguments, **keywords):
+        raise TypeError("The builtin table cannot be modified")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _refuse
+
+class CommandTable(collections.MutableMapping):
+    """
+        A mapping of commands layered over a base dictionary shared by many interpreters. The base is
+        never modified: adding, replacing or removing a command only affects this table, which holds just
+        the commands that differ from the base.
+    """
+
+    base = None
+    """
+        The shared dictionary of commands this table starts out with.
+    """
+
+    overrides = None
+    """
+        The dictionary of the commands added or replaced in this table.
+    """
+
+    removed = None
+    """
+        The set of names of the base that were removed from this table.
+    """
+
+    version = 0
+    """
+        A counter incremented on every modification of the table.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.overrides = {}
+        self.removed = set()
+
+    def is_pristine(self):
+        """
+            Returns whether the table holds exactly the commands of its base.
+        """
+
+        return len(self.overrides) == 0 and len(self.removed) == 0
+
+    def __getitem__(self, name):
+        if name in self.overrides:
+            return self.overrides[name]
+        if name in self.removed:
+            raise KeyError(name)
+        return self.base[name]
+
+    def __setitem__(self, name, command):
+        self.overrides[name] = command
+        self.removed.discard(name)
+        self.version = self.version + 1
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+
+        self.overrides.pop(name, None)
+        if name in self.base:
+            self.removed.add(name)
+        self.version = self.version + 1
+
+    def __contains__(self, name):
+        return name in self.overrides or (name in self.base and name not in self.removed)
+
+    def __iter__(self):
+        for name in self.overrides:
+            yield name
+        for name in self.base:
+            if name not in self.removed and name not in self.overrides:
+                yield name
+
+    def __len__(self):
+        return len(set(self.base) - self.removed | set(self.overrides))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def clear(self):
+        self.overrides.clear()
+        self.removed = set(self.base)
+        self.version = self.version + 1
+
+    def copy(self):
+        """
+            Produces a table over the same base holding the same changes, which may then be modified
+            independently of this one.
+        """
+
+        result = CommandTable(self.base)
+        result.overrides = dict(self.overrides)
+        result.removed = set(self.removed)
+        result.version = self.version
+        return result
+
 class Interpreter(object):
     """
         The interpreter is the meat and potatoes. This is the class that allows us to emulate some
@@ -105,6 +504,52 @@ class Interpreter(object):
         Alternatively, the mapped value may be a codeblock to execute some more
         interpreted FORTH instead. Each interpreter has its own command list as
         the command list may be manually extended post initialization for customization.
+        This is a CommandTable over builtin_commands, so only the changes are stored
+        per interpreter.
+    """
+
+    builtin_commands = None
+    """
+        The FrozenTable of standard commands shared by all interpreters.
+    """
+
+    builtin_superinstructions = None
+    """
+        The FrozenTable of standard superinstructions shared by all interpreters.
+    """
+
+    builtin_dispatch_table = [None, None]
+    """
+        The dispatch table of the standard commands and superinstructions shared by all interpreters that
+        did not change them. It is extended as new opcodes are assigned, but never modified otherwise.
+    """
+
+    dispatch_table = None
+    """
+        A list of python methods indexed by opcode, built from the commands and superinstructions.
+        Words without a command look their command up by name when executed, so that they fail
+        the same way an unknown command always has. This is rebuilt whenever a codeblock is registered
+        or a callable is executed, so changes to the commands take effect from then on. Interpreters
+        using the standard commands share the builtin_dispatch_table, so this must not be modified in place.
+    """
+
+    dispatch_key = None
+    """
+        The state of the commands and superinstructions the dispatch table was last built from, used to
+        skip rebuilding it when nothing changed.
+    """
+
+    analysis_trusted = True
+    """
+        Whether the commands of every word the compiler's analysis models are the builtins, so that what it
+        proved about the callables holds: their unchecked operations run unchecked and their basic blocks
+        are charged to the command budget at once. This is kept up to date by build_dispatch_table.
+    """
+
+    superinstructions = None
+    """
+        A dictionary of superinstruction names produced by the compiler's optimizer to python
+        methods accepting a stack state and the literal operand of the superinstruction.
     """
 
     stack = None
@@ -115,6 +560,26 @@ class Interpreter(object):
     global_variables = None
     local_variables = None
 
+    global_slots = None
+    """
+        A list of the values of the declared global variables, indexed by their slot in variable_table.
+        Slots that have not been stored to hold builtins.UNSET, in which case the variable is looked up in
+        global_variables by name. The slots are taken from global_variables when the interpreter starts
+        running and written back to it when it stops, see load_slots and store_slots.
+    """
+
+    variable_table = None
+    """
+        The compiler.VariableTable assigning the slots of global_slots. Codeblocks compiled with different
+        slots are relocated to these when they are registered, see compiler.CodeBlock.relocate.
+    """
+
+    frame = None
+    """
+        A list of the values of the local variables of the current call, indexed by their slot in the
+        callable. Each call gets a frame of its own, which is saved on the call stack.
+    """
+
     callable = None
     """
         The callable in use by this interpreter.
@@ -146,19 +611,23 @@ class Interpreter(object):
         execute method.
     """
 
-    loop_starts = []
+    call_stack = None
     """
-        The starting indices in loops that our program has to keep track of.
+        The call stack currently on the interpreter, as a list of (instruction pointer, callable, frame)
+        tuples of the calls to return to.
     """
 
-    call_stack = None
+    tail_returns = None
     """
-        The call stack currently on the interpreter.
+        The list of the depths of the call stack tail calls replaced a call at, each paired with the number
+        of memoized calls pending then and how many tail calls did so. Each tail call stands for a return it
+        skipped, which is charged once the call at that depth returns, just as the return it skipped would
+        have been reached.
     """
 
     callable_functions = None
     """
-        A dictionary mapping names to callable FORTH code blocks.
+        A LazyCallableTable mapping names to callable FORTH code blocks.
     """
 
     stack_debug = True
@@ -166,10 +635,21 @@ class Interpreter(object):
         Whether or not the stack debugging feature should be enabled.
     """
 
-    frame_snapshots = None
+    stack_debug_frames = 32
+    """
+        How many of the most recent frames stack debugging keeps track of.
+    """
+
+    stack_debug_sample_rate = 1
     """
-        If stack debugging is enabled, this is the list keeping track of the stack at
-        every op executed.
+        Stack debugging records every stack_debug_sample_rate'th operation. Raising this lowers
+        the cost of stack debugging at the price of a less complete history.
+    """
+
+    frame_history = None
+    """
+        If stack debugging is enabled, this is the FrameHistory keeping track of the stack at
+        the most recent ops executed.
     """
 
     cycle_time = None
@@ -191,16 +671,281 @@ class Interpreter(object):
         The last time that the interpreter was updated.
     """
 
+    threaded = False
+    """
+        Whether or not callables should be executed as direct threaded code. When enabled, each callable
+        is lowered once into a flat list of handlers with the commands bound directly, which the
+        interpreter calls one after the other, charging whole basic blocks to the budget just like the
+        regular loop. Since the regular loop already dispatches on arrays of opcodes and pushes literals
+        without calling a handler, threaded code runs about as fast as it, but not faster. See
+        benchmarks.dispatch.
+    """
+
+    threaded_callables = None
+    """
+        A dictionary mapping callables to their direct threaded code. Commands are bound at the time
+        a callable is first threaded, so the dictionary is cleared whenever the dispatch table is built
+        again from modified commands. See threaded_dispatch.
+    """
+
+    threaded_dispatch = None
+    """
+        The dispatch table the callables of threaded_callables were threaded with.
+    """
+
+    jit_threshold = None
+    """
+        How many invocations and loop back edges a callable may accumulate before it is compiled
+        into a native Python function by the JIT. If None, the JIT is disabled. Since compiled code
+        does not account for every operation, it is only used when command_maximum is 0, cycle_ops
+        is None and stack debugging is disabled.
+    """
+
+    jit_invocations = None
+    """
+        A dictionary mapping callables to how many times they have been entered from the start.
+    """
+
+    jit_back_edges = None
+    """
+        A dictionary mapping callables to how many backwards jumps they have performed.
+    """
+
+    jit_functions = None
+    """
+        A dictionary mapping hot callables to their compiled function or None if the JIT could not
+        compile them. Compiled functions bind commands and the variable table, so the functions and the
+        counters are dropped whenever either is replaced. See jit_key.
+    """
+
+    jit_key = None
+    """
+        A tuple of the dispatch table and the variable table the functions of jit_functions were compiled
+        with, or None.
+    """
+
+    profiler = None
+    """
+        If not None, the Profiler accounting every operation executed. Profiled execution runs in a loop
+        of its own, always dispatching opcodes one by one regardless of the threaded and JIT settings, so
+        the other loops pay nothing for it.
+    """
+
+    event_loop = None
+    """
+        The event loop the interpreter is running on while executing asynchronously, otherwise None.
+    """
+
+    pending = None
+    """
+        The awaitable an awaitable builtin has suspended the program on, until the event loop picks it up.
+    """
+
+    input_stream = None
+    """
+        The asyncio StreamReader the readline builtin reads from when executing asynchronously.
+    """
+
+    service = None
+    """
+        The service the query builtin asks when executing asynchronously, such as an asynchronous.LocalService.
+    """
+
+    inline_threshold = 8
+    """
+        How many operations a callable may have, not counting its return, to be inlined into its callers
+        when a codeblock is linked. Make this 0 to disable inlining.
+    """
+
+    integer_stack = False
+    """
+        Whether or not callables proven to only put numbers on the stack should run in the integer mode,
+        with arithmetic builtins that skip converting their operands and update the top of the stack in
+        place. The generic builtins take over as soon as a variable holding anything else is fetched. This
+        only applies to the regular dispatch loop with stack debugging disabled.
+    """
+
+    integer_dispatch = None
+    """
+        A tuple of the dispatch table the integer mode was last set up for, the matching dispatch table of
+        the integer mode, or None if it has to be built again, and the dictionary of callables proven to
+        run in the integer mode.
+    """
+
+    memoize = None
+    """
+        How many results to cache for each pure callable, or None to disable memoization. Calls of a pure
+        callable with inputs it was called with before apply the values it left on the stack then instead
+        of running it again, and are charged the commands it ran then. See memoization.stack_effect.
+    """
+
+    memo_caches = None
+    """
+        A dictionary mapping pure callables to their ResultCache. The caches are kept across programs,
+        like the compiled code caches, until the dispatch table or the callables change.
+    """
+
+    memo_effects = None
+    """
+        A tuple of the dispatch table and the version of the callable table the stack effects of the
+        callables were worked out with and the dictionary of the stack effects, or None.
+    """
+
+    memo_pending = None
+    """
+        The list of the calls whose result is stored once they return, each a tuple of the depth of
+        the call stack while it runs, its ResultCache, its key, the position of its first input and the
+        command count it was called at.
+    """
+
+    shared = False
+    """
+        Whether the stack, variables, frames and call stack are shared with an InterpreterState or a
+        forked interpreter. Shared containers are copied before the interpreter runs again, so that
+        only the states that go on to diverge pay for a copy. Call unshare before modifying them
+        directly.
+    """
+
     def __init__(self):
-        self.call_stack = []
-        self.commands = {}
-        self.callable_functions = {}
+        self.jit_invocations = {}
+        self.jit_back_edges = {}
+        self.jit_functions = {}
+        self.memo_caches = {}
+        self.variable_table = compiler.VariableTable()
+        self.callable_functions = compiler.LazyCallableTable()
+        self.threaded_callables = {}
         self.init_builtin_commands()
+        self.reset()
+
+    def reset(self):
+        """
+            Clears the state left behind by running a program: the stack, the variables, the call stack
+            and the loop and jump state. The registered callables, the commands and the compiled code
+            caches are kept, so the interpreter is ready to run another program right away.
+        """
 
         self.stack = []
         self.global_variables = {}
+        self.local_variables = None
+        self.global_slots = []
+        self.frame = []
+        self.call_stack = []
+        self.tail_returns = []
+        self.callable = None
+        self.instruction_pointer = None
+        self.jump_target = None
+        self.command_count = None
+        self.frame_history = None
+        self.event_loop = None
+        self.pending = None
+        self.memo_pending = []
+        self.shared = False
         self.last_update_time = datetime.datetime.now()
 
+    def snapshot(self):
+        """
+            Captures the execution state of the interpreter: the stack, variables, call stack, loop state,
+            instruction pointer and current callable. This takes constant time, as the containers are only
+            copied once the interpreter runs again.
+
+            :returns:
+                The InterpreterState, to be passed to restore.
+        """
+
+        self.store_slots()
+        self.shared = True
+        return InterpreterState(self)
+
+    def restore(self, state):
+        """
+            Returns the interpreter to a state captured by snapshot. The same state may be restored any
+            number of times, by this interpreter or others running the same program.
+
+            :parameters:
+                state - The InterpreterState to return to.
+        """
+
+        self.stack = state.stack
+        self.global_variables = state.global_variables
+        self.local_variables = state.local_variables
+        self.global_slots = state.global_slots
+        self.frame = state.frame
+        self.call_stack = state.call_stack
+        self.tail_returns = state.tail_returns
+        self.callable = state.callable
+        self.instruction_pointer = state.instruction_pointer
+        self.jump_target = state.jump_target
+        self.command_count = state.command_count
+        self.shared = True
+
+        # Calls in progress may not return the same way they did
+        self.memo_pending = []
+
+        # The recorded frames belong to a different path through the program
+        if self.frame_history is not None:
+            self.frame_history = FrameHistory(self.stack_debug_frames, self.stack_debug_sample_rate)
+
+    def fork(self):
+        """
+            Produces a new interpreter continuing from the current state of this one, with the same
+            settings, callables and commands. Neither interpreter sees the changes the other makes from
+            then on, and the execution state is only copied by whichever of them runs.
+
+            :returns:
+                The new interpreter.
+        """
+
+        fork = copy.copy(self)
+        fork.restore(self.snapshot())
+
+        fork.callable_functions = compiler.LazyCallableTable(dict(self.callable_functions.loaders))
+        dict.update(fork.callable_functions, self.callable_functions)
+        fork.memo_caches = dict(self.memo_caches)
+        fork.memo_effects = None
+        fork.variable_table = self.variable_table.copy()
+
+        # Threaded and compiled code is bound to the commands and variables of this interpreter, and
+        # leaving the integer mode patches its dispatch table in place, so the fork produces its own
+        fork.threaded_callables = {}
+        fork.threaded_dispatch = None
+        fork.jit_invocations = {}
+        fork.jit_back_edges = {}
+        fork.jit_functions = {}
+        fork.jit_key = None
+        fork.integer_dispatch = None
+
+        fork.event_loop = None
+        fork.pending = None
+
+        for name in ("commands", "superinstructions"):
+            table = getattr(self, name)
+            setattr(fork, name, table.copy() if type(table) is CommandTable else dict(table))
+
+        fork.dispatch_key = None
+        fork.build_dispatch_table()
+
+        # The fork starts out with the same commands and callables, so what was worked out still holds
+        if self.memo_effects is not None and self.memo_effects[0] is self.dispatch_table and self.memo_effects[1] == self.callable_functions.version:
+            fork.memo_effects = (fork.dispatch_table, fork.callable_functions.version, dict(self.memo_effects[2]))
+        return fork
+
+    def unshare(self):
+        """
+            Copies the containers the interpreter shares with snapshots and forks, so that it may modify
+            them. This happens by itself before the interpreter runs.
+        """
+
+        self.stack = list(self.stack)
+        self.global_variables = dict(self.global_variables)
+        if self.local_variables is not None:
+            self.local_variables = dict(self.local_variables)
+        self.global_slots = list(self.global_slots)
+        self.frame = list(self.frame)
+        # Returning makes the frames of the calls current again, so they are copied as well
+        self.call_stack = [(instruction_pointer, callable, list(frame)) for instruction_pointer, callable, frame in self.call_stack]
+        self.tail_returns = list(self.tail_returns)
+        self.shared = False
+
     def call(self, name):
         """
             Calls a callable function by name.
@@ -212,17 +957,420 @@ class Interpreter(object):
         callable = self.callable_functions[name]
         self.execute(callable)
 
+    @staticmethod
+    def extend_builtin_dispatch_table():
+        """
+            Extends the shared builtin dispatch table to cover every opcode assigned so far.
+
+            :returns:
+                The builtin dispatch table.
+        """
+
+        dispatch_table = Interpreter.builtin_dispatch_table
+        names = compiler.opcodes.names
+
+        while len(dispatch_table) < len(names):
+            name = names[len(dispatch_table)]
+            if compiler.checked_name(name) in integers.unchecked:
+                dispatch_table.append(integers.unchecked[compiler.checked_name(name)])
+            elif name[0] == "{" and name[-1] == "}" and name[1:-1] in Interpreter.builtin_superinstructions:
+                dispatch_table.append(Interpreter.builtin_superinstructions[name[1:-1]])
+            elif name in Interpreter.builtin_commands:
+                dispatch_table.append(Interpreter.builtin_commands[name])
+            else:
+                dispatch_table.append(deferred_handler(name))
+
+        return dispatch_table
+
+    def build_dispatch_table(self):
+        """
+            Builds the dispatch table from the commands and superinstructions, assigning opcodes to any
+            of them that do not have one yet.
+        """
+
+        commands = self.commands
+        superinstructions = self.superinstructions
+
+        # Tables layered over the builtins only need their changes patched into the builtin dispatch table
+        if type(commands) is CommandTable and type(superinstructions) is CommandTable and commands.base is Interpreter.builtin_commands and superinstructions.base is Interpreter.builtin_superinstructions:
+            if commands.is_pristine() and superinstructions.is_pristine():
+                self.dispatch_table = Interpreter.extend_builtin_dispatch_table()
+                self.dispatch_key = None
+                self.analysis_trusted = True
+                return
+
+            for name in list(commands.overrides) + list(commands.removed):
+                compiler.opcodes.lookup(name)
+            for name in list(superinstructions.overrides) + list(superinstructions.removed):
+                compiler.opcodes.lookup("{%s}" % name)
+
+            key = (commands, commands.version, superinstructions, superinstructions.version, len(compiler.opcodes.names))
+            if key == self.dispatch_key:
+                return
+
+            dispatch_table = list(Interpreter.extend_builtin_dispatch_table())
+            for name in commands.overrides:
+                dispatch_table[compiler.opcodes.lookup(name)] = commands.overrides[name]
+            for name in commands.removed:
+                dispatch_table[compiler.opcodes.lookup(name)] = deferred_handler(name)
+            for name in superinstructions.removed:
+                name = "{%s}" % name
+                dispatch_table[compiler.opcodes.lookup(name)] = commands[name] if name in commands else deferred_handler(name)
+            for name in superinstructions.overrides:
+                dispatch_table[compiler.opcodes.lookup("{%s}" % name)] = superinstructions.overrides[name]
+
+            # What the analysis proved no longer holds once a word it models is replaced
+            replaced = set(commands.overrides) | commands.removed | set("{%s}" % name for name in list(superinstructions.overrides) + list(superinstructions.removed))
+            self.analysis_trusted = len(replaced & compiler.analyzed_words) == 0
+            if self.analysis_trusted is False:
+                for opcode, name in enumerate(compiler.opcodes.names):
+                    if compiler.checked_name(name) is not None:
+                        dispatch_table[opcode] = dispatch_table[compiler.opcodes.lookup(compiler.checked_name(name))]
+
+            self.dispatch_table = dispatch_table
+            self.dispatch_key = key
+            return
+
+        for name in self.commands:
+            compiler.opcodes.lookup(name)
+        for name in self.superinstructions:
+            compiler.opcodes.lookup("{%s}" % name)
+
+        dispatch_table = [None, None]
+        for name in compiler.opcodes.names[2:]:
+            # Unchecked operations run as the command they were made from
+            if compiler.checked_name(name) is not None:
+                name = compiler.checked_name(name)
+
+            if name[0] == "{" and name[-1] == "}" and name[1:-1] in self.superinstructions:
+                dispatch_table.append(self.superinstructions[name[1:-1]])
+            elif name in self.commands:
+                dispatch_table.append(self.commands[name])
+            else:
+                dispatch_table.append(deferred_handler(name))
+
+        self.dispatch_table = dispatch_table
+        self.dispatch_key = None
+        self.analysis_trusted = False
+
+    def extend_dispatch_table(self):
+        """
+            Extends the dispatch table in place to cover the opcodes assigned since it was built, such as
+            those of the callables compiled lazily while the program runs. Dispatch loops hold on to the
+            table, so it is never replaced here.
+        """
+
+        dispatch_table = self.dispatch_table
+        if dispatch_table is Interpreter.builtin_dispatch_table:
+            Interpreter.extend_builtin_dispatch_table()
+        else:
+            names = compiler.opcodes.names
+
+            while len(dispatch_table) < len(names):
+                name = names[len(dispatch_table)]
+                checked = compiler.checked_name(name)
+
+                if checked is not None:
+                    # The base opcode always comes first, see OpcodeTable.lookup
+                    if self.analysis_trusted is True and checked in integers.unchecked:
+                        dispatch_table.append(integers.unchecked[checked])
+                    else:
+                        dispatch_table.append(dispatch_table[compiler.opcodes.lookup(checked)])
+                elif name[0] == "{" and name[-1] == "}" and name[1:-1] in self.superinstructions:
+                    dispatch_table.append(self.superinstructions[name[1:-1]])
+                elif name in self.commands:
+                    dispatch_table.append(self.commands[name])
+                else:
+                    dispatch_table.append(deferred_handler(name))
+
+            if self.dispatch_key is not None:
+                self.dispatch_key = self.dispatch_key[:-1] + (len(names),)
+
+        # So does the dispatch loop of the integer mode
+        if self.integer_dispatch is not None and self.integer_dispatch[0] is dispatch_table and self.integer_dispatch[1] is not None:
+            integer_table = self.integer_dispatch[1]
+            integer_table.extend(integers.build_dispatch_table(dispatch_table[len(integer_table):]))
+
+    def reserve_slots(self):
+        """
+            Grows the global variable slots to hold every global variable declared so far.
+        """
+
+        missing = len(self.variable_table.names) - len(self.global_slots)
+        if missing > 0:
+            if self.shared is True:
+                self.unshare()
+            self.global_slots.extend([builtins.UNSET] * missing)
+
+    def variables(self):
+        """
+            Produces the values of all global variables, whether they are kept in global_variables or in
+            a slot.
+
+            :returns:
+                A dictionary mapping variable names to their value.
+        """
+
+        result = dict(self.global_variables)
+        for slot, value in enumerate(self.global_slots):
+            if value is not builtins.UNSET:
+                result[self.variable_table.names[slot]] = value
+
+        # Ropes never leave the interpreter, even while it runs
+        for name, value in result.items():
+            if type(value) is ropes.Rope:
+                result[name] = value.flatten()
+        return result
+
+    def load_slots(self):
+        """
+            Takes the values of the declared global variables from global_variables, where they may have
+            been changed while the interpreter was not running.
+        """
+
+        self.reserve_slots()
+        for slot, name in enumerate(self.variable_table.names):
+            self.global_slots[slot] = self.global_variables.get(name, builtins.UNSET)
+
+    def store_slots(self):
+        """
+            Writes the values of the declared global variables back to global_variables, so that it holds
+            the value of every global variable while the interpreter is not running.
+        """
+
+        for name, value in zip(self.variable_table.names, self.global_slots):
+            if value is not builtins.UNSET and self.global_variables.get(name, builtins.UNSET) is not value:
+                if self.shared is True:
+                    self.unshare()
+                self.global_variables[name] = value
+
+    def integer_dispatch_table(self):
+        """
+            Produces the dispatch table of the integer mode if the stack, the current callable, the callables
+            on the call stack and everything they may call are proven to only hold and push numbers.
+
+            :returns:
+                The dispatch table to run with, which is the one of the integer mode if the proof holds.
+        """
+
+        if self.integer_dispatch is None or self.integer_dispatch[0] is not self.dispatch_table:
+            self.integer_dispatch = (self.dispatch_table, None, {})
+        dispatch_table, integer_table, proven = self.integer_dispatch
+
+        if integers.is_integer_callable(self.callable, dispatch_table, proven) is False:
+            return dispatch_table
+        for instruction_pointer, callable, frame in self.call_stack:
+            if integers.is_integer_callable(callable, dispatch_table, proven) is False:
+                return dispatch_table
+        if integers.is_integer_stack(self.stack) is False:
+            return dispatch_table
+
+        # Leaving the integer mode patches its dispatch table, so it is rebuilt for the next update
+        if integer_table is None:
+            integer_table = integers.build_dispatch_table(dispatch_table)
+            self.integer_dispatch = (dispatch_table, integer_table, proven)
+        return integer_table
+
+    def memoized_call(self, callable, tail):
+        """
+            Answers a call of a pure callable from its ResultCache if it was called with the same inputs
+            before, charging the commands it ran then. Otherwise the call is recorded so that its result is
+            stored once it returns. Should the budget run out within the call, it is run instead so that it
+            fails at the same operation. The caches are cleared whenever the dispatch table or the callable
+            table changes, since what the callables do may have changed with them.
+
+            :parameters:
+                callable - The callable being called.
+                tail - Whether this is a tail call, which returns in place of the caller.
+
+            :returns:
+                True if the values the callable left on the stack were applied in place of calling it,
+                False if it is to be called.
+        """
+
+        memo_effects = self.memo_effects
+        if memo_effects is None or memo_effects[0] is not self.dispatch_table or memo_effects[1] != self.callable_functions.version:
+            memo_effects = self.memo_effects = (self.dispatch_table, self.callable_functions.version, {})
+            self.memo_caches = {}
+
+        effect = memoization.stack_effect(callable, self.dispatch_table, memo_effects[2])
+        if effect is None:
+            return False
+
+        base = len(self.stack) - effect[0]
+        if base < 0:
+            return False
+
+        cache = self.memo_caches.get(callable)
+        if cache is None:
+            cache = memoization.ResultCache(self.memoize)
+            self.memo_caches[callable] = cache
+        else:
+            cache.maximum = self.memoize
+
+        key = memoization.make_key(self.stack, base)
+        result = cache.lookup(key)
+        if result is not None and (self.command_maximum <= 0 or self.command_count + result[1] < self.command_maximum):
+            del self.stack[base:]
+            self.stack.extend(result[0])
+            self.command_count = self.command_count + result[1]
+            return True
+
+        self.memo_pending.append((len(self.call_stack) if tail is True else len(self.call_stack) + 1, cache, key, base, self.command_count))
+        return False
+
+    def memoized_return(self):
+        """
+            Stores the results of the calls returning with the current one: the call itself and the calls
+            that tail called it. The returns those tail calls skipped are charged to the results of the
+            calls pending before them, so a result is not stored once the budget runs out at one of them.
+        """
+
+        depth = len(self.call_stack)
+        pending = self.memo_pending
+        tail_returns = self.tail_returns
+        exhausted = False
+
+        while len(pending) != 0 and pending[-1][0] >= depth:
+            while len(tail_returns) != 0 and tail_returns[-1][0] >= depth and tail_returns[-1][1] >= len(pending):
+                if self.charge_tail_returns(tail_returns.pop()[2]) is False:
+                    exhausted = True
+
+            call_depth, cache, key, base, command_count = pending.pop()
+            if call_depth == depth and exhausted is False:
+                cache.store(key, self.stack[base:], self.command_count - command_count)
+
+    def charge_tail_returns(self, count):
+        """
+            Charges returns skipped by tail calls to the command budget, as far as it goes. Should it run out,
+            the dispatch loop fails right after the current operation.
+
+            :parameters:
+                count - The number of returns.
+
+            :returns:
+                True if all of the returns were charged, False if the budget ran out.
+        """
+
+        if self.command_maximum > 0 and self.command_count + count > self.command_maximum:
+            self.command_count = max(self.command_count, self.command_maximum)
+            return False
+
+        self.command_count = self.command_count + count
+        return True
+
+    def step(self):
+        """
+            Executes the operation at the current instruction pointer, without any of the bookkeeping
+            done by update.
+        """
+
+        callable = self.callable
+        opcode = callable.code[self.instruction_pointer]
+        operand = callable.operands[self.instruction_pointer]
+
+        if opcode <= compiler.OPCODE_STRING:
+            self.stack.append(callable.constants.values[operand])
+        elif operand < 0:
+            self.dispatch_table[opcode](self)
+        else:
+            self.dispatch_table[opcode](self, callable.constants.values[operand])
+
     def register_codeblock(self, codeblock):
         """
             Registers a codeblock to the interpreter. This just takes all of the callables out of the codeblock and
-            allows them to be used within the interpreter as callable subroutines.
+            allows them to be used within the interpreter as callable subroutines. Callables the codeblock has
+            not loaded yet are only loaded once they are first used. The interpreter links a copy of the
+            codeblock of its own, see linker.link_codeblock, so the codeblock itself is left as it is.
 
             :parameters:
                 codeblock - The input codeblock to process.
         """
 
-        for callable_name in codeblock.callable_functions:
-            self.callable_functions[callable_name] = codeblock.callable_functions[callable_name]
+        replaced = [name for name in codeblock.callable_functions if name in self.callable_functions]
+
+        # Linking relies on the calls and returns behaving like the builtins
+        if self.commands.get("call") is builtins.call and self.commands.get("return") is builtins.returnop:
+            codeblock = codeblock.copy(self.variable_table)
+            self.callable_functions.merge(codeblock.callable_functions)
+            linker.link_codeblock(codeblock, self.callable_functions, self.inline_threshold)
+
+            # Code that inlined the callables replaced would still run the old ones
+            if len(replaced) != 0:
+                linker.relink(self.callable_functions, replaced, self.inline_threshold)
+        else:
+            # The callables access the slots of their global variables by number
+            codeblock = codeblock.relocate(self.variable_table)
+            self.callable_functions.merge(codeblock.callable_functions)
+
+        self.reserve_slots()
+        self.build_dispatch_table()
+
+    def thread_callable(self, callable):
+        """
+            Lowers the given callable into direct threaded code, a list of handlers matching its fast
+            code one to one. Literals become handlers pushing their value and words are bound directly
+            to their entries of the dispatch table, including the unchecked variants the analysis proved
+            safe. The result is cached for subsequent executions until the dispatch table is built again.
+
+            :parameters:
+                callable - The callable to lower.
+
+            :returns:
+                The list of handlers to call in order.
+        """
+
+        # Handlers bound to replaced commands must not run again
+        if self.threaded_dispatch is not self.dispatch_table:
+            self.threaded_callables = {}
+            self.threaded_dispatch = self.dispatch_table
+
+        handlers = self.threaded_callables.get(callable)
+
+        if handlers is None:
+            handlers = []
+            dispatch_table = self.dispatch_table
+            constants = callable.constants.values
+            for opcode, operand in zip(callable.fast_code, callable.operands):
+                if opcode <= compiler.OPCODE_STRING:
+                    handlers.append(literal_handler(constants[operand]))
+                elif operand < 0:
+                    handlers.append(dispatch_table[opcode])
+                else:
+                    handlers.append(superinstruction_handler(dispatch_table[opcode], constants[operand]))
+
+            self.threaded_callables[callable] = handlers
+
+        return handlers
+
+    def jit_lookup(self, callable, instruction_pointer):
+        """
+            Called when control is transferred to the given location. This keeps track of invocations
+            and compiles the callable once it is hot.
+
+            :parameters:
+                callable - The callable control was transferred to.
+                instruction_pointer - The instruction pointer control was transferred to.
+
+            :returns:
+                The compiled function to run from this location, or None if it should be interpreted.
+        """
+
+        if callable in self.jit_functions:
+            function = self.jit_functions[callable]
+        else:
+            if instruction_pointer == 0:
+                self.jit_invocations[callable] = self.jit_invocations.get(callable, 0) + 1
+
+            if self.jit_invocations.get(callable, 0) + self.jit_back_edges.get(callable, 0) < self.jit_threshold:
+                return None
+
+            function = jit.compile_callable(self, callable)
+            self.jit_functions[callable] = function
+
+        if function is None or instruction_pointer not in function.entries:
+            return None
+        return function
 
     def update(self):
         """
@@ -233,50 +1381,229 @@ class Interpreter(object):
                 True for the interpreter completing the program execution. False otherwise.
         """
 
-        current_op_count = 0
-        now = datetime.datetime.now()
+        # The strings strcat built are only joined once they leave the interpreter, which is whenever it
+        # stops running, be it at the end of the program, the end of a cycle or an error
+        try:
+            return self.run_cycle()
+        finally:
+            self.flatten_ropes()
 
-        if self.cycle_time is None or now - self.last_update_time >= self.cycle_time:
-            try:
-                while self.instruction_pointer < len(self.callable.payload):
-                    if self.cycle_ops is not None and current_op_count >= self.cycle_ops:
-                        return False
+    def flatten_ropes(self):
+        """
+            Joins the ropes strcat left on the stack and in the global variables, so that callers only ever
+            see plain strings.
+        """
 
-                    if (self.stack_debug is True):
-                        self.frame_snapshots.append({"stack": list(self.stack), "eip": self.instruction_pointer, "callable": self.callable})
+        if any(type(value) is ropes.Rope for value in itertools.chain(self.stack, self.global_slots, self.global_variables.itervalues())):
+            # Snapshots see the same strings either way, but their containers are never modified
+            if self.shared is True:
+                self.unshare()
 
-                    # Read the next operation to perform
-                    operation = self.callable.payload[self.instruction_pointer]
+            ropes.flatten_all(self.stack)
+            ropes.flatten_all(self.global_slots)
+            for name, value in self.global_variables.items():
+                if type(value) is ropes.Rope:
+                    self.global_variables[name] = value.flatten()
 
-                    # If it is a special type, append the payload
-                    if type(operation) is compiler.CodeString or type(operation) is compiler.CodeNumber:
-                        self.stack.append(operation.data)
-                    else:
-                        self.commands[operation](self)
+    def run_cycle(self):
+        """
+            Runs the program for the cycle time, or until completion if no cycle time is specified. See
+            update.
 
-                    # Exit execution
-                    if self.instruction_pointer is False:
-                        return True
+            :returns:
+                True for the interpreter completing the program execution. False otherwise.
+        """
 
-                    # Perform a jump if instructed to
-                    if (self.jump_target is not None):
-                        self.instruction_pointer = self.jump_target
-                        self.jump_target = None
-                    else:
-                        self.instruction_pointer = self.instruction_pointer + 1
+        if self.shared is True:
+            self.unshare()
+
+        # Only take the time when there is a cycle time to enforce
+        if self.cycle_time is not None and datetime.datetime.now() - self.last_update_time < self.cycle_time:
+            return self.instruction_pointer == len(self.callable.code)
 
-                    if (self.command_count >= self.command_maximum and self.command_maximum > 0):
-                        raise InterpreterRuntimeError("Terminated: Maximum of %u commands exceeded." % self.command_maximum)
+        self.load_slots()
+        try:
+            return self.run_loop()
+        except StandardError as e:
+            exc_type, exc_obj, exc_tb = sys.exc_info()
+            raise InterpreterRuntimeError(self, e, (exc_type, exc_obj, exc_tb))
+        finally:
+            self.store_slots()
 
-                    self.command_count = self.command_count + 1
+    def run_loop(self):
+        """
+            The dispatch loop shared by every execution mode. Regular and threaded execution dispatch
+            operations right here, charging whole basic blocks to the budget where they can. Profiled and JIT
+            execution each run an operation their own way, behind a single check of the regular path.
+            Everything after the operation, from exiting and jumping to charging the budget, is the same for
+            all of them.
+
+            :returns:
+                True for the interpreter completing the program execution. False otherwise.
+        """
+
+        current_op_count = 0
+        stack_debug = self.stack_debug is True
+
+        # Profiled execution always dispatches opcodes one by one regardless of the threaded and JIT settings.
+        # Compiled code does not account for every operation, so it is only used without anything to account for.
+        profiler = self.profiler
+        jit_enabled = profiler is None and self.jit_threshold is not None and self.command_maximum <= 0 and self.cycle_ops is None and stack_debug is False
+        threaded = profiler is None and jit_enabled is False and self.threaded is True
+        special = profiler is not None or jit_enabled is True or threaded is True
+
+        dispatch_table = self.dispatch_table
+        if special is False and self.integer_stack is True and stack_debug is False:
+            dispatch_table = self.integer_dispatch_table()
+
+        # Frame history is recorded for every operation, so blocks are only charged at once without it
+        blocks = (special is False or threaded is True) and stack_debug is False and self.analysis_trusted is True
+
+        # Code compiled for replaced commands or variables must not run again
+        if jit_enabled is True and (self.jit_key is None or self.jit_key[0] is not dispatch_table or self.jit_key[1] is not self.variable_table):
+            self.jit_invocations = {}
+            self.jit_back_edges = {}
+            self.jit_functions = {}
+            self.jit_key = (dispatch_table, self.variable_table)
+
+        clock = profiler.clock if profiler is not None else None
+        frames = None
+        depth = None
+        transferred = True
+
+        callable = None
+        code = None
+        operands = None
+        constants = None
+        block_lengths = None
+
+        while True:
+            # Calls and returns change the callable we are running
+            if self.callable is not callable:
+                callable = self.callable
+                operands = callable.operands
+                constants = callable.constants.values
+                frames = None
+
+                if threaded is True:
+                    code = self.thread_callable(callable)
+                    block_lengths = callable.block_lengths if blocks is True else None
+                elif special is True:
+                    code = callable.code
+                else:
+                    code = callable.fast_code
+                    block_lengths = callable.block_lengths if blocks is True else None
+
+            if self.instruction_pointer >= len(code):
+                break
+
+            if self.cycle_ops is not None and current_op_count >= self.cycle_ops:
+                return False
+
+            # The rest of a basic block is charged to the budget at once. Should the budget run out within it, only
+            # the operations it still covers are charged at once and the rest are checked one at a time as usual
+            if block_lengths is not None and block_lengths[self.instruction_pointer] > 1:
+                length = block_lengths[self.instruction_pointer]
+                if self.command_maximum > 0:
+                    length = min(length, self.command_maximum - self.command_count)
+                if self.cycle_ops is not None:
+                    length = min(length, self.cycle_ops - current_op_count)
+
+                if length > 1:
+                    start = self.instruction_pointer
+                    instruction_pointer = start
+                    end = start + length
+
+                    try:
+                        while threaded is True and instruction_pointer < end:
+                            code[instruction_pointer](self)
+                            instruction_pointer = instruction_pointer + 1
+
+                        while instruction_pointer < end:
+                            opcode = code[instruction_pointer]
+                            operand = operands[instruction_pointer]
+
+                            if opcode <= compiler.OPCODE_STRING:
+                                self.stack.append(constants[operand])
+                            elif operand < 0:
+                                dispatch_table[opcode](self)
+                            else:
+                                dispatch_table[opcode](self, constants[operand])
+
+                            instruction_pointer = instruction_pointer + 1
+                    except StandardError:
+                        # Fail at the operation that failed, with the operations before it counted
+                        self.instruction_pointer = instruction_pointer
+                        self.command_count = self.command_count + instruction_pointer - start
+                        raise
+
+                    self.instruction_pointer = end
+                    self.command_count = self.command_count + length
+                    current_op_count = current_op_count + length
+                    continue
+
+            if stack_debug is True:
+                self.frame_history.record(self)
+
+            if special is False:
+                # Read the next operation to perform
+                opcode = code[self.instruction_pointer]
+                operand = operands[self.instruction_pointer]
+
+                # Literals are pushed, superinstructions receive their operand
+                if opcode <= compiler.OPCODE_STRING:
+                    self.stack.append(constants[operand])
+                elif operand < 0:
+                    dispatch_table[opcode](self)
+                else:
+                    dispatch_table[opcode](self, constants[operand])
+            elif threaded is True:
+                code[self.instruction_pointer](self)
+            elif profiler is not None:
+                # Even recursive calls and returns change the frames the operation is accounted to
+                if frames is None or depth != len(self.call_stack):
+                    frames = profiler.frames(self)
+                    depth = len(self.call_stack)
+
+                instruction_pointer = self.instruction_pointer
+                start = clock()
+                self.step()
+                profiler.record(callable, instruction_pointer, code[instruction_pointer], frames, clock() - start)
+            else:
+                function = self.jit_lookup(callable, self.instruction_pointer) if transferred is True else None
+
+                if function is None:
+                    self.step()
+                elif function(self, self.instruction_pointer) is False:
+                    # A False return means we ran off the end of the payload or are to run the operation the
+                    # function stopped at ourselves, without handing it straight back to the function
+                    transferred = False
+                    continue
+
+            # Exit execution
+            if self.instruction_pointer is False:
+                return True
+
+            # Perform a jump if instructed to
+            transferred = self.jump_target is not None
+            if transferred is True:
+                if jit_enabled is True and self.callable is callable and self.jump_target <= self.instruction_pointer:
+                    self.jit_back_edges[callable] = self.jit_back_edges.get(callable, 0) + 1
+
+                self.instruction_pointer = self.jump_target
+                self.jump_target = None
+            else:
+                self.instruction_pointer = self.instruction_pointer + 1
 
-                    # Keep track of what our op count is for this cycle
-                    current_op_count = current_op_count + 1
-            except StandardError as e:
-                exc_type, exc_obj, exc_tb = sys.exc_info()
-                raise InterpreterRuntimeError(self, e, (exc_type, exc_obj, exc_tb))
+            if self.command_count >= self.command_maximum and self.command_maximum > 0:
+                raise InterpreterLimitError("Terminated: Maximum of %u commands exceeded." % self.command_maximum)
 
-        return self.instruction_pointer == len(self.callable.payload)
+            self.command_count = self.command_count + 1
+
+            # Keep track of what our op count is for this cycle
+            current_op_count = current_op_count + 1
+
+        return self.instruction_pointer == len(self.callable.code)
 
     def execute(self, callable):
         """
@@ -285,68 +1612,140 @@ class Interpreter(object):
             :parameters:
                 callable - The callable code block to execute.
         """
+        self.prepare(callable)
+        self.update()
+
+    def execute_async(self, callable, loop=None, slice_ops=100):
+        """
+            Executes the given FORTH callable on an asyncio event loop, yielding to the event loop every
+            slice_ops operations and whenever an awaitable builtin such as sleep, readline or query waits.
+
+            :parameters:
+                callable - The callable code block to execute.
+                loop - The event loop to run on, or None for the current event loop.
+                slice_ops - How many operations to run between yielding to the event loop.
+
+            :returns:
+                A future resolving to the final stack once the program completes.
+        """
+        return asynchronous.run(self, callable, loop, slice_ops)
+
+    def prepare(self, callable):
+        """
+            Prepares the interpreter to execute the given FORTH callable without running any of it yet,
+            so that the program can be run piece by piece with update.
+
+            :parameters:
+                callable - The callable code block to execute.
+        """
         if (type(callable) is not compiler.Callable):
             raise InterpreterTypeError("Cannot use non-Callable types with execute!")
 
+        # Callables of registered codeblocks run as the copies the interpreter made of them
+        if callable.name in self.callable_functions and self.callable_functions[callable.name].origin is callable:
+            callable = self.callable_functions[callable.name]
+
         self.callable = callable
         self.local_variables = {}
+        self.frame = [builtins.UNSET] * len(callable.local_variables)
         self.instruction_pointer = 0
         self.command_count = 0
-        self.frame_snapshots = []
-
-        self.update()
+        self.memo_pending = []
+        self.tail_returns = []
+        self.reserve_slots()
+        self.build_dispatch_table()
+        self.frame_history = FrameHistory(self.stack_debug_frames, self.stack_debug_sample_rate)
 
     def init_builtin_commands(self):
         """
             Initializes the standardized FORTH command list for the interpreter
-            to refer to when dispatching calls.
-        """
-        self.commands["strcat"] = builtins.strcat
-        self.commands["swap"] = builtins.swap
-        self.commands["pop"] = builtins.pop
-        self.commands["dup"] = builtins.dup
-        self.commands["random"] = builtins.randint
-
-        # Arithmetic
-        self.commands["+"] = builtins.add
-        self.commands["-"] = builtins.sub
-        self.commands["*"] = builtins.mult
-        self.commands["/"] = builtins.div
-        self.commands["%"] = builtins.mod
-
-        # Stack manipulations
-        self.commands["over"] = builtins.over
-        self.commands["rot"] = builtins.rot
-
-        # Comparisons
-        self.commands["<"] = builtins.less_than
-        self.commands[">"] = builtins.greater_than
-        self.commands[">="] = builtins.less_than_equal
-        self.commands["<="] = builtins.greater_than_equal
-        self.commands["="] = builtins.equals
-
-        # Control flow
-        self.commands["if"] = builtins.ifblock
-        self.commands["jump"] = builtins.jump
-        self.commands["not"] = builtins.not_command
-        self.commands["exit"] = builtins.exit
-        self.commands["else"] = builtins.elseblock
-        self.commands["call"] = builtins.call
-        self.commands["return"] = builtins.returnop
-        self.commands[";"] = builtins.nop
-        self.commands["then"] = builtins.nop
-
-        # Looping
-        self.commands["begin"] = builtins.begin
-        self.commands["until"] = builtins.until
-        self.commands["while"] = builtins.whileblock
-        self.commands["repeat"] = builtins.repeat
-
-        # Variables
-        self.commands["!"] = builtins.store
-        self.commands["@"] = builtins.fetch
-
-        # Debug
-        self.commands["print"] = builtins.println
-        self.commands["_stack"] = builtins.print_stack
-        self.commands["nop"] = builtins.nop
+            to refer to when dispatching calls. The commands and superinstructions
+            are layered over the shared builtin tables, so this costs next to nothing
+            and discards any commands added or replaced since.
+        """
+        self.commands = CommandTable(Interpreter.builtin_commands)
+        self.superinstructions = CommandTable(Interpreter.builtin_superinstructions)
+        self.build_dispatch_table()
+
+def standard_commands():
+    """
+        Produces the standardized FORTH command list that all interpreters start with.
+
+        :returns:
+            A tuple of the dictionary of commands and the dictionary of superinstructions.
+    """
+
+    commands = {}
+    superinstructions = {}
+
+    commands["strcat"] = builtins.strcat
+    commands["swap"] = builtins.swap
+    commands["pop"] = builtins.pop
+    commands["dup"] = builtins.dup
+    commands["random"] = builtins.randint
+
+    # Arithmetic
+    commands["+"] = builtins.add
+    commands["-"] = builtins.sub
+    commands["*"] = builtins.mult
+    commands["/"] = builtins.div
+    commands["%"] = builtins.mod
+
+    # Stack manipulations
+    commands["over"] = builtins.over
+    commands["rot"] = builtins.rot
+
+    # Comparisons
+    commands["<"] = builtins.less_than
+    commands[">"] = builtins.greater_than
+    commands[">="] = builtins.less_than_equal
+    commands["<="] = builtins.greater_than_equal
+    commands["="] = builtins.equals
+
+    # Control flow
+    commands["if"] = builtins.ifblock
+    commands["jump"] = builtins.jump
+    commands["not"] = builtins.not_command
+    commands["exit"] = builtins.exit
+    commands["else"] = builtins.elseblock
+    commands["call"] = builtins.call
+    commands["return"] = builtins.returnop
+    commands[";"] = builtins.nop
+    commands["then"] = builtins.nop
+
+    # Looping
+    commands["begin"] = builtins.begin
+    commands["until"] = builtins.until
+    commands["while"] = builtins.whileblock
+    commands["repeat"] = builtins.repeat
+
+    # Variables
+    commands["!"] = builtins.store
+    commands["@"] = builtins.fetch
+
+    # Debug
+    commands["print"] = builtins.println
+    commands["_stack"] = builtins.print_stack
+    commands["nop"] = builtins.nop
+
+    # Superinstructions produced by the optimizer
+    superinstructions["literal+"] = builtins.add_literal
+    superinstructions["literal-"] = builtins.sub_literal
+    superinstructions["literal*"] = builtins.mult_literal
+    superinstructions["literal/"] = builtins.div_literal
+    superinstructions["literal%"] = builtins.mod_literal
+    superinstructions["literal@"] = builtins.fetch_literal
+    superinstructions["literal!"] = builtins.store_literal
+    superinstructions["global@"] = builtins.fetch_global
+    superinstructions["global!"] = builtins.store_global
+    superinstructions["local@"] = builtins.fetch_local
+    superinstructions["local!"] = builtins.store_local
+    superinstructions["call-direct"] = builtins.call_direct
+    superinstructions["tail-call"] = builtins.tail_call
+    superinstructions["inline"] = builtins.inline
+    superinstructions["dup*"] = builtins.square
+    superinstructions["nip"] = builtins.nip
+
+    return commands, superinstructions
+
+Interpreter.builtin_commands, Interpreter.builtin_superinstructions = [FrozenTable(table) for table in standard_commands()]
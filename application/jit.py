@@ -0,0 +1,496 @@
+"""
+    jit.py
+
+    Python source file declaring the FORTH just in time compiler, which translates hot callables
+    into native Python functions.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import ropes
+import compiler
+import builtins
+
+class JITError(Exception):
+    """
+        Exception representing a construct that the JIT cannot translate. The callable in question
+        simply remains interpreted.
+    """
+
+    pass
+
+class Translator(object):
+    """
+        A class translating a single callable into the source code of a Python function.
+
+        The generated function accepts the interpreter and the instruction pointer to start at, which
+        must be the start of a basic block. Within a basic block, stack values are held in local variables
+        and only written out to the interpreter stack at the end of the block or before calling into
+        a command that was not inlined. Commands that were not inlined may transfer control (call, return,
+        exit, jump and so on), in which case the function returns True and the interpreter carries on
+        as if it had just executed that command itself. If the function runs off the end of the payload,
+        it returns False.
+
+        Should an inlined operation fail, the function writes out the stack as it was before the operation,
+        points the interpreter at it and returns False as well. The interpreter then runs the operation
+        itself, which fails exactly the way it would have without the JIT, with the same exception, stack
+        and instruction pointer.
+    """
+
+    _arithmetic = {"+": builtins.add, "-": builtins.sub, "*": builtins.mult, "/": builtins.div, "%": builtins.mod}
+    """
+        Arithmetic words that can be inlined, mapped to the builtin they must be bound to.
+    """
+
+    _comparisons = {"<": (builtins.less_than, "<"), ">": (builtins.greater_than, ">"), ">=": (builtins.less_than_equal, "<="), "<=": (builtins.greater_than_equal, ">="), "=": (builtins.equals, "==")}
+    """
+        Comparison words that can be inlined, mapped to the builtin they must be bound to and the Python
+        operator the builtin applies to the top of the stack and the element behind it.
+    """
+
+    _branches = {"if": builtins.ifblock, "else": builtins.elseblock, "until": builtins.until, "while": builtins.whileblock, "repeat": builtins.repeat}
+    """
+        Branching words that can be inlined, mapped to the builtin they must be bound to.
+    """
+
+    _markers = {"begin": builtins.begin, "then": builtins.nop, ";": builtins.nop, "nop": builtins.nop}
+    """
+        Words that do nothing, mapped to the builtin they must be bound to.
+    """
+
+    _superinstructions = {"literal+": builtins.add_literal, "literal-": builtins.sub_literal, "literal*": builtins.mult_literal, "literal/": builtins.div_literal,
+        "literal%": builtins.mod_literal, "literal@": builtins.fetch_literal, "literal!": builtins.store_literal, "global@": builtins.fetch_global,
+        "global!": builtins.store_global, "local@": builtins.fetch_local, "local!": builtins.store_local, "dup*": builtins.square, "nip": builtins.nip,
+        "call-direct": builtins.call_direct, "tail-call": builtins.tail_call, "inline": builtins.inline}
+    """
+        Superinstructions that can be inlined, mapped to the builtin they must be bound to.
+    """
+
+    _calls = ("call-direct", "tail-call")
+    """
+        Superinstructions transferring control to another callable, which always end a basic block.
+    """
+
+    _inlined = ("+", "-", "*", "/", "%", "<", ">", ">=", "<=", "=", "begin", "then", ";", "nop", "dup", "swap", "pop", "not", "strcat", "@", "!")
+    """
+        Words that are translated inline when bound to their builtin and therefore do not end a basic block.
+    """
+
+    interp = None
+    """
+        The interpreter the callable is being translated for, whose commands decide what can be inlined.
+    """
+
+    callable = None
+    """
+        The callable being translated.
+    """
+
+    lines = None
+    """
+        The lines of Python source produced so far.
+    """
+
+    stack = None
+    """
+        The values currently held in local variables rather than on the interpreter stack, as a list of
+        (expression, is integer) tuples from the bottom up.
+    """
+
+    temporary_count = None
+    """
+        How many temporary local variables have been allocated.
+    """
+
+    bindings = None
+    """
+        A dictionary of the global names the generated function refers to.
+    """
+
+    recoveries = None
+    """
+        The states to recover when an inlined operation fails, as a list of (instruction pointer, stack
+        expressions) tuples indexed by the checkpoint the generated code passed last.
+    """
+
+    current = None
+    """
+        The instruction pointer of the operation being translated.
+    """
+
+    held = None
+    """
+        The values held locally before the operation being translated.
+    """
+
+    drawn = None
+    """
+        The values the operation being translated popped from the interpreter stack so far, topmost first.
+    """
+
+    def __init__(self, interp, callable):
+        self.interp = interp
+        self.callable = callable
+        self.lines = []
+        self.stack = []
+        self.temporary_count = 0
+        self.recoveries = []
+        self.bindings = {"callable": callable, "unset": builtins.UNSET, "variable_slots": interp.variable_table.slots,
+            "read_global": builtins.read_global, "assign_global": builtins.assign_global, "concatenate": ropes.concatenate}
+
+    def is_builtin(self, word, builtin):
+        """
+            Returns whether the given word is bound to the given builtin in the interpreter.
+        """
+
+        return self.interp.commands.get(word) is builtin
+
+    def emit(self, line):
+        self.lines.append("                " + line)
+
+    def temporary(self, expression, is_integer=False):
+        """
+            Evaluates an expression into a new local variable, pushing it to the local stack.
+        """
+
+        name = "t%u" % self.temporary_count
+        self.temporary_count = self.temporary_count + 1
+        self.emit("%s = %s" % (name, expression))
+        self.stack.append((name, is_integer))
+
+    def pop(self):
+        """
+            Pops a value, reading it from the interpreter stack if there are none held locally.
+
+            :returns:
+                A tuple of the expression holding the value and whether it is known to be an integer.
+        """
+
+        if len(self.stack) != 0:
+            return self.stack.pop()
+
+        self.checkpoint()
+        self.temporary("pop()")
+        self.drawn.append(self.stack[-1])
+        return self.stack.pop()
+
+    def begin(self, index):
+        """
+            Starts translating the operation at the given instruction pointer.
+        """
+
+        self.current = index
+        self.held = list(self.stack)
+        self.drawn = []
+
+    def checkpoint(self):
+        """
+            Records the state to recover should the code emitted next fail, which is the stack as it was
+            before the operation being translated.
+        """
+
+        expressions = [value[0] for value in reversed(self.drawn)] + [value[0] for value in self.held]
+
+        self.emit("at = %u" % len(self.recoveries))
+        self.recoveries.append((self.current, expressions))
+
+    def integer(self, value):
+        """
+            Produces an expression coercing a value to an integer the same way the builtins do.
+        """
+
+        if value[1] is True:
+            return value[0]
+        return "int(%s)" % value[0]
+
+    def flush(self):
+        """
+            Writes all locally held values out to the interpreter stack.
+        """
+
+        for value in self.stack:
+            self.emit("push(%s)" % value[0])
+        self.stack = []
+
+    def leaders(self):
+        """
+            Determines the instruction pointers that begin a basic block.
+        """
+
+        result = set([0])
+        result.update(self.callable.branch_targets.values())
+
+        for index, op in enumerate(self.callable.payload):
+            if type(op) is compiler.CodeSuperinstruction and op.name in self._calls:
+                result.add(index + 1)
+            if type(op) is compiler.CodeString or type(op) is compiler.CodeNumber or type(op) is compiler.CodeSuperinstruction:
+                continue
+            if op not in self._inlined:
+                result.add(index + 1)
+
+        return result
+
+    def translate_generic(self, index, op):
+        """
+            Translates a command that is not inlined into a call of the command itself.
+        """
+
+        if op not in self.interp.commands:
+            raise JITError("Unknown command '%s'" % op)
+
+        binding = "command%u" % index
+        self.bindings[binding] = self.interp.commands[op]
+
+        self.flush()
+        self.emit("at = -1")
+        self.emit("interp.instruction_pointer = %u" % index)
+        self.emit("%s(interp)" % binding)
+        self.emit("if interp.jump_target is not None or interp.instruction_pointer is False or interp.callable is not callable:")
+        self.emit("    return True")
+        self.emit("stack = interp.stack")
+        self.emit("push = stack.append")
+        self.emit("pop = stack.pop")
+        self.emit("local_variables = interp.local_variables")
+        self.emit("global_variables = interp.global_variables")
+        self.emit("global_slots = interp.global_slots")
+        self.emit("frame = interp.frame")
+
+    def translate_call(self, index, op):
+        """
+            Translates a linked call into a call of the superinstruction, which always transfers control.
+        """
+
+        binding = "command%u" % index
+        self.bindings[binding] = self._superinstructions[op.name]
+        self.bindings["link%u" % index] = op.data
+
+        self.flush()
+        self.emit("at = -1")
+        self.emit("interp.instruction_pointer = %u" % index)
+        self.emit("%s(interp, link%u)" % (binding, index))
+        self.emit("return True")
+
+    def translate_fetch(self, key):
+        self.checkpoint()
+        self.temporary("local_variables[%s] if %s in local_variables else global_variables[%s] if %s not in variable_slots else read_global(interp, variable_slots[%s])" % ((key[0],) * 5))
+
+    def translate_store(self, key, value):
+        self.checkpoint()
+        self.emit("if %s in local_variables:" % key[0])
+        self.emit("    local_variables[%s] = %s" % (key[0], value[0]))
+        self.emit("elif %s in variable_slots:" % key[0])
+        self.emit("    assign_global(interp, variable_slots[%s], %s)" % (key[0], value[0]))
+        self.emit("else:")
+        self.emit("    global_variables[%s] = %s" % (key[0], value[0]))
+
+    def translate_global_fetch(self, slot):
+        name = "t%u" % self.temporary_count
+        self.checkpoint()
+        self.temporary("global_slots[%u]" % slot)
+        self.emit("if %s is unset:" % name)
+        self.emit("    %s = global_variables[%r]" % (name, slot.name))
+
+    def translate_local_fetch(self, slot):
+        name = "t%u" % self.temporary_count
+        self.checkpoint()
+        self.temporary("frame[%u]" % slot)
+        self.emit("if %s is unset:" % name)
+        self.emit("    raise KeyError(%r)" % self.callable.local_variables[slot])
+
+    def translate_operation(self, index, op):
+        """
+            Translates a single operation that is not a branch.
+        """
+
+        self.begin(index)
+
+        if type(op) is compiler.CodeNumber:
+            self.stack.append((repr(op.data), True))
+        elif type(op) is compiler.CodeString:
+            self.stack.append((repr(op.data), False))
+        elif type(op) is compiler.CodeSuperinstruction:
+            if op.name not in self._superinstructions or self.interp.superinstructions.get(op.name) is not self._superinstructions[op.name]:
+                raise JITError("Superinstruction '%s' is not a builtin" % op.name)
+
+            if op.name.startswith("literal") and op.name[-1] in self._arithmetic:
+                lhs = self.pop()
+                self.checkpoint()
+                self.temporary("%s %s %r" % (self.integer(lhs), op.name[-1], op.data), True)
+            elif op.name == "literal@":
+                self.translate_fetch((repr(op.data), False))
+            elif op.name == "literal!":
+                self.translate_store((repr(op.data), False), self.pop())
+            elif op.name in self._calls:
+                self.translate_call(index, op)
+            elif op.name == "inline":
+                # Compiled code is only used without a budget to charge the inlined call to
+                pass
+            elif op.name == "global@":
+                self.translate_global_fetch(op.data)
+            elif op.name == "global!":
+                value = self.pop()
+                self.checkpoint()
+                self.emit("global_slots[%u] = %s" % (op.data, value[0]))
+            elif op.name == "local@":
+                self.translate_local_fetch(op.data)
+            elif op.name == "local!":
+                self.emit("frame[%u] = %s" % (op.data, self.pop()[0]))
+            elif op.name == "dup*":
+                top = self.integer(self.pop())
+                self.checkpoint()
+                self.temporary("%s * %s" % (top, top), True)
+            else:
+                top = self.pop()
+                self.pop()
+                self.stack.append(top)
+        elif op in self._arithmetic and self.is_builtin(op, self._arithmetic[op]):
+            rhs = self.integer(self.pop())
+            lhs = self.integer(self.pop())
+            self.checkpoint()
+            self.temporary("%s %s %s" % (lhs, op, rhs), True)
+        elif op in self._comparisons and self.is_builtin(op, self._comparisons[op][0]):
+            rhs = self.pop()
+            lhs = self.pop()
+            self.checkpoint()
+            self.temporary("%s %s %s" % (rhs[0], self._comparisons[op][1], lhs[0]))
+        elif op in self._markers and self.is_builtin(op, self._markers[op]):
+            pass
+        elif op == "dup" and self.is_builtin(op, builtins.dup):
+            if len(self.stack) != 0:
+                self.stack.append(self.stack[-1])
+            else:
+                self.checkpoint()
+                self.temporary("stack[-1]")
+        elif op == "swap" and self.is_builtin(op, builtins.swap):
+            rhs = self.pop()
+            lhs = self.pop()
+            self.stack.append(rhs)
+            self.stack.append(lhs)
+        elif op == "pop" and self.is_builtin(op, builtins.pop):
+            if len(self.stack) != 0:
+                self.stack.pop()
+            else:
+                self.checkpoint()
+                self.emit("pop()")
+        elif op == "not" and self.is_builtin(op, builtins.not_command):
+            value = self.pop()
+            self.checkpoint()
+            self.temporary("not bool(%s)" % value[0])
+        elif op == "strcat" and self.is_builtin(op, builtins.strcat):
+            rhs = self.pop()
+            lhs = self.pop()
+            self.checkpoint()
+            self.temporary("concatenate(%s, %s)" % (lhs[0], rhs[0]))
+        elif op == "@" and self.is_builtin(op, builtins.fetch):
+            self.translate_fetch(self.pop())
+        elif op == "!" and self.is_builtin(op, builtins.store):
+            key = self.pop()
+            self.translate_store(key, self.pop())
+        else:
+            self.translate_generic(index, op)
+
+    def translate(self):
+        """
+            Translates the callable.
+
+            :returns:
+                The Python source code of a function named 'jitted'.
+        """
+
+        payload = self.callable.payload
+        targets = self.callable.branch_targets
+        leaders = sorted(self.leaders())
+
+        self.lines.append("def jitted(interp, block):")
+        self.lines.append("    stack = interp.stack")
+        self.lines.append("    push = stack.append")
+        self.lines.append("    pop = stack.pop")
+        self.lines.append("    local_variables = interp.local_variables")
+        self.lines.append("    global_variables = interp.global_variables")
+        self.lines.append("    global_slots = interp.global_slots")
+        self.lines.append("    frame = interp.frame")
+        self.lines.append("    at = -1")
+        self.lines.append("    try:")
+        self.lines.append("        while True:")
+
+        for position, start in enumerate(leaders):
+            if start >= len(payload):
+                continue
+
+            end = leaders[position + 1] if position + 1 < len(leaders) else len(payload)
+            self.lines.append("            %s block == %u:" % ("if" if position == 0 else "elif", start))
+
+            # Everything but a trailing branch is straight line code
+            for index in range(start, end):
+                op = payload[index]
+                if index in targets and self.is_builtin(op, self._branches[op]):
+                    break
+                self.translate_operation(index, op)
+            else:
+                self.flush()
+                self.emit("block = %u" % end)
+                continue
+
+            self.begin(index)
+            if op == "if" or op == "until" or op == "while":
+                condition = self.pop()
+                self.checkpoint()
+                self.temporary("bool(%s)" % condition[0])
+                condition = self.stack.pop()
+                self.flush()
+
+                if op == "while":
+                    self.emit("block = %u if %s else %u" % (targets[index], condition[0], end))
+                else:
+                    self.emit("block = %u if %s else %u" % (end, condition[0], targets[index]))
+            else:
+                self.flush()
+                self.emit("block = %u" % targets[index])
+
+        self.lines.append("            else:")
+        self.lines.append("                interp.instruction_pointer = %u" % len(payload))
+        self.lines.append("                return False")
+
+        # A failed operation is run again by the interpreter from the stack it started with
+        self.lines.append("    except StandardError:")
+        for number, recovery in enumerate(self.recoveries):
+            self.lines.append("        %s at == %u:" % ("if" if number == 0 else "elif", number))
+            for expression in recovery[1]:
+                self.lines.append("            push(%s)" % expression)
+            self.lines.append("            interp.instruction_pointer = %u" % recovery[0])
+            self.lines.append("            return False")
+        self.lines.append("        raise")
+
+        return "\n".join(self.lines) + "\n"
+
+def compile_callable(interp, callable):
+    """
+        Compiles the given callable into a native Python function for the given interpreter.
+
+        :parameters:
+            interp - The interpreter the function will be run by.
+            callable - The callable to compile.
+
+        :returns:
+            The compiled function or None if the callable cannot be compiled. The function has an entries
+            attribute listing the instruction pointers it may be started at.
+    """
+
+    # Compiled code accesses the slots of the globals it declared without checking their bounds
+    interp.reserve_slots()
+    translator = Translator(interp, callable)
+
+    try:
+        source = translator.translate()
+    except JITError:
+        return None
+
+    namespace = dict(translator.bindings)
+    exec(compile(source, "<jit %s>" % callable.name, "exec"), namespace)
+
+    function = namespace["jitted"]
+    function.entries = frozenset(index for index in translator.leaders() if index < len(callable.payload))
+    function.source = source
+    return function
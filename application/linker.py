@@ -0,0 +1,204 @@
+"""
+    linker.py
+
+    Python source file declaring the FORTH linker, which resolves the calls between the callables of
+    a codeblock once it is registered to an interpreter.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import copy
+import compiler
+
+_transfers = ("call", "return", "jump", "exit")
+"""
+    Words transferring control elsewhere, which a callable must not use to be inlined.
+"""
+
+_markers = (";", "nop")
+"""
+    Words doing nothing, which may follow the return of a callable without being reached.
+"""
+
+def is_inlinable(callable, inline_threshold):
+    """
+        Determines whether a callable may be inlined into its callers. Only small leaf callables qualify:
+        straight line code without local variables, ending in its only return. Markers following the
+        return, such as the ; closing a definition, are never reached and are left out.
+
+        :parameters:
+            callable - The callable.
+            inline_threshold - The maximum number of operations of an inlined callable, not counting
+                its return.
+
+        :returns:
+            The payload to inline in place of a call, without the return, or None if the callable may
+            not be inlined.
+    """
+
+    payload = callable.payload
+
+    end = len(payload)
+    while end != 0 and type(payload[end - 1]) is str and payload[end - 1] in _markers:
+        end = end - 1
+
+    if end == 0 or end - 1 > inline_threshold or payload[end - 1] != "return":
+        return None
+    if len(callable.branch_targets) != 0 or len(callable.local_variables) != 0:
+        return None
+
+    for op in payload[:end - 1]:
+        if type(op) is compiler.CodeSuperinstruction and type(op.data) is compiler.Link:
+            return None
+        if type(op) is not compiler.CodeNumber and type(op) is not compiler.CodeString and type(op) is not compiler.CodeSuperinstruction and op in _transfers:
+            return None
+
+    return payload[:end - 1]
+
+def link_callable(callable, table, inline_threshold):
+    """
+        Links a callable in place. Each call of a callable of the table by a string literal is replaced by
+        the callable's code if it may be inlined, by a tail call if a return follows it and by a direct
+        call otherwise. Callables using relative jumps are left alone, since the offsets of the jumps
+        would change. Only callables the table loaded already are inlined, so linking never compiles one.
+
+        The linked code is charged to the command budget just like the calls it replaces: an inlined
+        callable is framed by an inline marker standing for the call and a nop standing for its return,
+        and direct and tail calls charge the operations they skip themselves. See builtins.call_direct.
+
+        :parameters:
+            callable - The callable to link.
+            table - The LazyCallableTable of the interpreter, which calls are resolved in.
+            inline_threshold - The maximum number of operations of an inlined callable, or 0 to disable
+                inlining.
+
+        :returns:
+            The callable.
+    """
+
+    payload = callable.payload
+    callable.unlinked = (callable.code, callable.operands, callable.branch_targets)
+    callable.inlined = frozenset()
+    callable.inline_origins = {}
+    if "jump" in payload:
+        return callable
+
+    target_indices = set(callable.branch_targets.values())
+
+    output = []
+    origins = []
+    inlined_names = set()
+    inline_origins = {}
+    changed = False
+    index = 0
+    while index < len(payload):
+        op = payload[index]
+        following = payload[index + 1] if index + 1 < len(payload) else None
+
+        if type(op) is not compiler.CodeString or following != "call" or op.data not in table or index + 1 in target_indices:
+            output.append(op)
+            origins.append(index)
+            index = index + 1
+            continue
+
+        inlined = None
+        if inline_threshold > 0 and table.is_loaded(op.data) is True and table[op.data] is not callable:
+            inlined = is_inlinable(table[op.data], inline_threshold)
+
+        if inlined is not None:
+            # Errors within the inlined code are reported where it came from, even if that was inlined in turn
+            inlinee = table[op.data]
+            for position in range(len(inlined)):
+                inline_origins[len(output) + 1 + position] = (inlinee.inline_origins or {}).get(position, (inlinee, position))
+
+            output.append(compiler.CodeSuperinstruction("inline", op.data))
+            output.extend(inlined)
+            output.append("nop")
+            origins.extend([index] * (len(inlined) + 2))
+            # Whatever the callable inlined itself is now part of this one as well
+            inlined_names.add(op.data)
+            inlined_names.update(table[op.data].inlined or ())
+        elif index + 2 < len(payload) and payload[index + 2] == "return" and index + 2 not in target_indices:
+            output.append(compiler.CodeSuperinstruction("tail-call", compiler.Link(op.data, table)))
+            origins.append(index)
+        else:
+            output.append(compiler.CodeSuperinstruction("call-direct", compiler.Link(op.data, table)))
+            origins.append(index)
+        changed = True
+        index = index + 2
+
+    callable.inlined = frozenset(inlined_names)
+    callable.inline_origins = inline_origins
+    if changed is False:
+        return callable
+
+    branch_targets = compiler.remap_branches(len(payload), origins, callable.branch_targets)
+    linked = compiler.Callable(output, callable.name, branch_targets, callable.constants, callable.local_variables, callable.global_variables)
+
+    callable.code = linked.code
+    callable.operands = linked.operands
+    callable.branch_targets = linked.branch_targets
+    compiler.analyze(callable)
+    return callable
+
+def link_codeblock(codeblock, table, inline_threshold=8):
+    """
+        Links the calls between the callables of a codeblock, unless it is linked already. Callables the
+        codeblock has not loaded yet are linked once they are loaded.
+
+        Linking changes the callables in place, so the codeblock should be a copy owned by the interpreter,
+        see compiler.CodeBlock.copy. Its callables should already be merged into the table of the
+        interpreter, which calls are resolved in whenever it changes.
+
+        :parameters:
+            codeblock - The codeblock to link.
+            table - The LazyCallableTable of the interpreter.
+            inline_threshold - The maximum number of operations of an inlined callable, or 0 to disable
+                inlining.
+    """
+
+    if codeblock.linked is True:
+        return
+
+    callables = codeblock.callable_functions
+    codeblock.linked = True
+
+    def load(name, loader):
+        # The callable is stored before linking, so that calls back to it resolve as well
+        callable = loader()
+        dict.__setitem__(callables, name, callable)
+        return link_callable(callable, table, inline_threshold)
+
+    if isinstance(callables, compiler.LazyCallableTable):
+        for name in list(callables.loaders):
+            callables.loaders[name] = lambda name=name, loader=callables.loaders[name]: load(name, loader)
+
+    for name in list(dict.keys(callables)):
+        link_callable(dict.__getitem__(callables, name), table, inline_threshold)
+
+def relink(table, names, inline_threshold=8):
+    """
+        Links the callables of a table that inlined any of the given callables anew, once those were
+        replaced. The callables are replaced by relinked copies, so that code compiled or cached for
+        them is not used for the new code.
+
+        :parameters:
+            table - The LazyCallableTable of the interpreter.
+            names - The names of the callables that were replaced.
+            inline_threshold - The maximum number of operations of an inlined callable, or 0 to disable
+                inlining.
+    """
+
+    names = frozenset(names)
+
+    for name in list(dict.keys(table)):
+        callable = dict.__getitem__(table, name)
+        if callable.inlined is None or callable.inlined.isdisjoint(names):
+            continue
+
+        result = copy.copy(callable)
+        result.code, result.operands, result.branch_targets = callable.unlinked
+        compiler.analyze(result)
+        table[name] = link_callable(result, table, inline_threshold)
@@ -1,18 +1,17 @@
 import string
 
-import compiler
+import bytecode
 import interpreter
 
 class Application(object):
     def main(self):
-        with open("test.txt") as handle:
-            instance = compiler.Compiler()
-            block = instance.compile_muf(handle.read())
+        block = bytecode.compile_file("test.txt")
 
-            interp = interpreter.Interpreter()
-            #print(string.join(block.payload, "\n"))
-            interp.execute(block)
+        interp = interpreter.Interpreter()
+        interp.register_codeblock(block)
+        #print(string.join(block.payload, "\n"))
+        interp.execute(block.callable_functions["main"])
 
-            print(interp.stack)
+        print(interp.stack)
 if __name__ == "__main__":
     Application().main()
@@ -0,0 +1,294 @@
+"""
+    memoization.py
+
+    Python source file declaring the purity inference and the result caches that let calls of pure
+    callables be answered from the results of earlier calls with the same inputs.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import collections
+
+import builtins
+import compiler
+import integers
+
+_effects = {
+    builtins.add: (2, 1),
+    builtins.sub: (2, 1),
+    builtins.mult: (2, 1),
+    builtins.div: (2, 1),
+    builtins.mod: (2, 1),
+    builtins.equals: (2, 1),
+    builtins.less_than: (2, 1),
+    builtins.greater_than: (2, 1),
+    builtins.less_than_equal: (2, 1),
+    builtins.greater_than_equal: (2, 1),
+    builtins.strcat: (2, 1),
+    builtins.swap: (2, 2),
+    builtins.pop: (1, 0),
+    builtins.dup: (1, 2),
+    builtins.not_command: (1, 1),
+    builtins.nop: (0, 0),
+    builtins.begin: (0, 0),
+    builtins.add_literal: (1, 1),
+    builtins.sub_literal: (1, 1),
+    builtins.mult_literal: (1, 1),
+    builtins.div_literal: (1, 1),
+    builtins.mod_literal: (1, 1),
+    builtins.square: (1, 1),
+    builtins.nip: (2, 1),
+    builtins.fetch_local: (0, 1),
+    builtins.store_local: (1, 0),
+    builtins.inline: (0, 0),
+}
+"""
+    A dictionary mapping the builtins that only ever touch the top of the stack and the local variables
+    of the call to how many values they pop and push. Reading or storing any other variable, printing,
+    random numbers and the commands reaching below the values they pop (over and rot) are left out, so
+    callables using them are never considered pure.
+"""
+
+# The unchecked arithmetic the compiler substitutes has the effect of the builtin it was made from
+_effects.update((handler, (2, 1) if name[0] != "{" else (1, 1)) for name, handler in integers.unchecked.items())
+
+_conditionals = frozenset([builtins.ifblock, builtins.until, builtins.whileblock])
+"""
+    Builtins popping a condition and continuing either at the next operation or their branch target.
+"""
+
+_jumps = frozenset([builtins.elseblock, builtins.repeat])
+"""
+    Builtins always continuing at their branch target.
+"""
+
+_PENDING = object()
+"""
+    The placeholder for the stack effect of a callable that is being worked out.
+"""
+
+def _walk(callable, dispatch_table, effects, assumed):
+    """
+        Works out the stack effect of a callable by following the depth of the stack along its control
+        flow. See stack_effect.
+
+        :parameters:
+            callable - The callable.
+            dispatch_table - The dispatch table the callable runs with.
+            effects - The dictionary of the stack effects worked out so far.
+            assumed - The stack effect assumed for recursive calls, or None to treat them as never
+                returning.
+
+        :returns:
+            A tuple of the stack effect or None and whether the callable calls itself.
+    """
+
+    code = callable.code
+    operands = callable.operands
+    constants = callable.constants.values
+    branch_targets = callable.branch_targets
+
+    depths = {0: 0}
+    worklist = [0]
+    lowest = 0
+    outputs = None
+    recursive = False
+
+    while len(worklist) != 0:
+        index = worklist.pop()
+        depth = depths[index]
+        opcode = code[index]
+
+        successors = [index + 1]
+        if opcode <= compiler.OPCODE_STRING:
+            depth = depth + 1
+        else:
+            handler = dispatch_table[opcode] if opcode < len(dispatch_table) else None
+
+            if handler in _effects:
+                pops, pushes = _effects[handler]
+            elif handler in _conditionals:
+                pops, pushes = 1, 0
+                successors = [index + 1, branch_targets[index]]
+            elif handler in _jumps:
+                pops, pushes = 0, 0
+                successors = [branch_targets[index]]
+            elif handler is builtins.returnop:
+                pops, pushes = 0, 0
+                successors = []
+            elif handler is builtins.call_direct or handler is builtins.tail_call:
+                link = constants[operands[index]]
+                if link.name not in link.table:
+                    return None, recursive
+                callee = link.table[link.name]
+
+                if callee is callable:
+                    recursive = True
+                    effect = assumed
+                else:
+                    effect = stack_effect(callee, dispatch_table, effects)
+                    if effect is None:
+                        return None, recursive
+
+                # Until its effect is known, paths through a recursive call go nowhere
+                if effect is None:
+                    continue
+
+                pops, pushes = effect
+                if handler is builtins.tail_call:
+                    successors = []
+            else:
+                return None, recursive
+
+            lowest = min(lowest, depth - pops)
+            depth = depth - pops + pushes
+
+        if len(successors) == 0:
+            if outputs is not None and outputs != depth:
+                return None, recursive
+            outputs = depth
+
+        for successor in successors:
+            # Running off the end stops the program rather than returning
+            if successor >= len(code):
+                return None, recursive
+
+            if successor not in depths:
+                depths[successor] = depth
+                worklist.append(successor)
+            elif depths[successor] != depth:
+                return None, recursive
+
+    if outputs is None:
+        return None, recursive
+    return (-lowest, outputs - lowest), recursive
+
+def stack_effect(callable, dispatch_table, effects):
+    """
+        Works out whether a callable is pure, that is whether what it leaves on the stack only depends on
+        the values it takes from it, and if so how many values it takes and leaves. A pure callable only
+        uses builtins that touch the top of the stack and its local variables, only calls pure callables
+        and leaves the stack at the same depth whichever way it returns.
+
+        Recursive calls are assumed to have the effect of the paths that do not recurse, which is then
+        checked against the whole callable. Callables calling each other back are not considered pure.
+
+        :parameters:
+            callable - The callable.
+            dispatch_table - The dispatch table the callable runs with.
+            effects - A dictionary of the stack effects worked out so far, shared between calls with the
+                same dispatch table.
+
+        :returns:
+            A tuple of how many values the callable takes from the top of the stack and how many values
+            it leaves in their place, or None if the callable is not pure.
+    """
+
+    if callable in effects:
+        effect = effects[callable]
+        return effect if effect is not _PENDING else None
+
+    effects[callable] = _PENDING
+    effect, recursive = _walk(callable, dispatch_table, effects, None)
+    if effect is not None and recursive is True:
+        confirmed, recursive = _walk(callable, dispatch_table, effects, effect)
+        if confirmed != effect:
+            effect = None
+
+    effects[callable] = effect
+    return effect
+
+def make_key(stack, base):
+    """
+        Produces the key of the values a call takes from the stack. The types are part of the key, since
+        values such as 1 and True compare equal but may give different results.
+
+        :parameters:
+            stack - The stack.
+            base - The position of the first value the call takes.
+    """
+
+    values = tuple(stack[base:])
+    return values + tuple(map(type, values))
+
+class ResultCache(object):
+    """
+        A class holding the results of the most recent calls of a pure callable, mapping the values each
+        call took from the stack to the values it left in their place and how many commands it ran. Once
+        full, the least recently used result is evicted.
+    """
+
+    maximum = None
+    """
+        How many results the cache holds at most.
+    """
+
+    results = None
+    """
+        The ordered dictionary of results, each a tuple of the list of values left on the stack and the
+        number of commands run, from the least recently used.
+    """
+
+    hits = 0
+    """
+        How many calls were answered from the cache.
+    """
+
+    misses = 0
+    """
+        How many calls had to run the callable.
+    """
+
+    evictions = 0
+    """
+        How many results were evicted to make room for others.
+    """
+
+    def __init__(self, maximum):
+        self.maximum = maximum
+        self.results = collections.OrderedDict()
+
+    def lookup(self, key):
+        """
+            Looks up the result of a call, counting the hit or miss.
+
+            :returns:
+                A tuple of the list of values the call left on the stack and the number of commands it ran,
+                or None if it is not cached.
+        """
+
+        result = self.results.pop(key, None)
+        if result is None:
+            self.misses = self.misses + 1
+            return None
+
+        # Reinserting the result makes it the most recently used
+        self.results[key] = result
+        self.hits = self.hits + 1
+        return result
+
+    def store(self, key, result, cost):
+        """
+            Stores the result of a call, evicting the least recently used result if the cache is full.
+
+            :parameters:
+                key - The key of the values the call took from the stack. See make_key.
+                result - The list of values the call left on the stack.
+                cost - How many commands the call ran, from the call up to its return.
+        """
+
+        if self.maximum <= 0:
+            return
+
+        if key not in self.results and len(self.results) >= self.maximum:
+            self.results.popitem(last=False)
+            self.evictions = self.evictions + 1
+        self.results[key] = (result, cost)
+
+    def __len__(self):
+        return len(self.results)
+
+    def __repr__(self):
+        return "<ResultCache %u/%u hits=%u misses=%u evictions=%u>" % (len(self.results), self.maximum, self.hits, self.misses, self.evictions)
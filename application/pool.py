@@ -0,0 +1,175 @@
+"""
+    pool.py
+
+    Python source file declaring the interpreter pool, which recycles interpreters across many short
+    lived programs instead of constructing a new one for each.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import contextlib
+
+import interpreter
+
+class InterpreterPool(object):
+    """
+        A class handing out interpreters in a clean state and taking them back once they are done. A
+        returned interpreter has its stack, variables, call stack and loop state cleared and any command
+        or attribute changes undone, then waits for the next program. The codeblocks of the pool stay
+        registered, and the threaded code, the code compiled by the JIT, the proofs of the integer mode and
+        the memoized results stay cached across programs. Each of those caches is kept with the dispatch
+        table it was produced for, so it is dropped once a program had changed the commands.
+    """
+
+    settings = None
+    """
+        A dictionary of interpreter attributes to set on each interpreter handed out, such as
+        command_maximum or jit_threshold.
+    """
+
+    codeblocks = None
+    """
+        The codeblocks registered to each interpreter of the pool.
+    """
+
+    maximum_idle = None
+    """
+        How many returned interpreters are kept for reuse, or None for no limit. Interpreters returned
+        past the limit are dropped.
+    """
+
+    idle = None
+    """
+        The list of interpreters waiting to be handed out again.
+    """
+
+    attributes = None
+    """
+        The names of the attributes a newly set up interpreter of the pool has. Any other attribute set
+        on an interpreter is removed when it is returned.
+    """
+
+    created = None
+    """
+        How many interpreters the pool has constructed.
+    """
+
+    acquired = None
+    """
+        How many times the pool has handed out an interpreter.
+    """
+
+    def __init__(self, settings=None, codeblocks=None, maximum_idle=None):
+        """
+            :parameters:
+                settings - A dictionary of interpreter attributes to set on each interpreter handed out.
+                codeblocks - A list of codeblocks to register to each interpreter of the pool.
+                maximum_idle - How many returned interpreters to keep for reuse, or None for no limit.
+        """
+
+        self.settings = {} if settings is None else dict(settings)
+        self.codeblocks = [] if codeblocks is None else list(codeblocks)
+        self.maximum_idle = maximum_idle
+        self.idle = []
+        self.created = 0
+        self.acquired = 0
+
+    def create(self):
+        """
+            Constructs a new interpreter for the pool.
+
+            :returns:
+                The interpreter, with the settings of the pool applied and its codeblocks registered.
+        """
+
+        interp = interpreter.Interpreter()
+        for name in self.settings:
+            setattr(interp, name, self.settings[name])
+        for codeblock in self.codeblocks:
+            interp.register_codeblock(codeblock)
+
+        if self.attributes is None:
+            self.attributes = frozenset(interp.__dict__)
+
+        self.created = self.created + 1
+        return interp
+
+    def acquire(self):
+        """
+            Hands out an interpreter in a clean state.
+
+            :returns:
+                The interpreter, to be handed back with release once it is done.
+        """
+
+        interp = self.idle.pop() if len(self.idle) != 0 else self.create()
+        self.acquired = self.acquired + 1
+        return interp
+
+    def release(self, interp):
+        """
+            Takes an interpreter back, cleaning it for reuse. The interpreter must not be used by the
+            caller afterwards.
+
+            :parameters:
+                interp - The interpreter handed out by acquire.
+        """
+
+        if self.maximum_idle is not None and len(self.idle) >= self.maximum_idle:
+            return
+
+        interp.reset()
+
+        if len(interp.__dict__) != len(self.attributes):
+            for name in list(interp.__dict__):
+                if name not in self.attributes:
+                    delattr(interp, name)
+        for name in self.settings:
+            setattr(interp, name, self.settings[name])
+
+        # The commands are only rebuilt if the program changed or replaced them
+        commands = interp.commands
+        superinstructions = interp.superinstructions
+        if type(commands) is not interpreter.CommandTable or type(superinstructions) is not interpreter.CommandTable or commands.is_pristine() is False or superinstructions.is_pristine() is False:
+            interp.init_builtin_commands()
+
+        self.idle.append(interp)
+
+    @contextlib.contextmanager
+    def interpreter(self):
+        """
+            Hands out an interpreter for the duration of a with statement, taking it back afterwards
+            even if the program failed.
+        """
+
+        interp = self.acquire()
+        try:
+            yield interp
+        finally:
+            self.release(interp)
+
+    def run(self, callable, stack=None, global_variables=None):
+        """
+            Runs a callable on a pooled interpreter.
+
+            :parameters:
+                callable - The callable to run, or the name of a callable of the codeblocks of the pool.
+                stack - The initial stack, or None for an empty stack.
+                global_variables - The initial global variables, or None for none.
+
+            :returns:
+                The final stack of the interpreter.
+        """
+
+        with self.interpreter() as interp:
+            if type(callable) is str:
+                callable = interp.callable_functions[callable]
+            if stack is not None:
+                interp.stack = list(stack)
+            if global_variables is not None:
+                interp.global_variables = dict(global_variables)
+
+            interp.execute(callable)
+            return interp.stack
@@ -0,0 +1,199 @@
+"""
+    profiler.py
+
+    Python source file declaring the FORTH profiler, which accounts the operations an interpreter
+    executes and the time spent on them per opcode, per callable and per instruction pointer.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import json
+import time
+import timeit
+
+import compiler
+
+def _fallback_clock():
+    return int(timeit.default_timer() * 1000000000)
+
+default_clock = getattr(time, "perf_counter_ns", _fallback_clock)
+"""
+    Returns a monotonic time in integer nanoseconds. This is time.perf_counter_ns where it exists and
+    the most precise timer available otherwise.
+"""
+
+class Profiler(object):
+    """
+        A class accumulating the profile of every operation executed by the interpreters it is assigned
+        to. Each operation is accounted to its opcode, to the callable and instruction pointer it was
+        executed at and to the call stack it was executed under. Time spent within a call is accounted
+        to the callee, so all times are self times. Profiles accumulate across executions until reset.
+    """
+
+    clock = None
+    """
+        The function used to take the time, returning integer nanoseconds. This is default_clock
+        unless another one was given.
+    """
+
+    opcodes = None
+    """
+        A dictionary mapping opcodes to a list of their execution count and total nanoseconds.
+    """
+
+    callables = None
+    """
+        A dictionary mapping callables to a list of the count of operations executed within them and
+        the total nanoseconds.
+    """
+
+    instructions = None
+    """
+        A dictionary mapping (callable, instruction pointer) tuples to a list of their execution count
+        and total nanoseconds.
+    """
+
+    stacks = None
+    """
+        A dictionary mapping call stacks, as tuples of callable names from the outermost callable,
+        to the total nanoseconds spent executing operations under them.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = default_clock if clock is None else clock
+        self.reset()
+
+    def reset(self):
+        """
+            Discards everything profiled so far.
+        """
+
+        self.opcodes = {}
+        self.callables = {}
+        self.instructions = {}
+        self.stacks = {}
+
+    def frames(self, interp):
+        """
+            Produces the call stack of the given interpreter as a tuple of callable names.
+        """
+
+        return tuple(call[1].name for call in interp.call_stack) + (interp.callable.name,)
+
+    def record(self, callable, instruction_pointer, opcode, frames, elapsed):
+        """
+            Accounts a single executed operation.
+
+            :parameters:
+                callable - The callable the operation belongs to.
+                instruction_pointer - The instruction pointer of the operation.
+                opcode - The opcode of the operation.
+                frames - The call stack the operation was executed under, as produced by frames.
+                elapsed - How many nanoseconds the operation took.
+        """
+
+        entry = self.opcodes.get(opcode)
+        if entry is None:
+            entry = self.opcodes[opcode] = [0, 0]
+        entry[0] = entry[0] + 1
+        entry[1] = entry[1] + elapsed
+
+        entry = self.callables.get(callable)
+        if entry is None:
+            entry = self.callables[callable] = [0, 0]
+        entry[0] = entry[0] + 1
+        entry[1] = entry[1] + elapsed
+
+        key = (callable, instruction_pointer)
+        entry = self.instructions.get(key)
+        if entry is None:
+            entry = self.instructions[key] = [0, 0]
+        entry[0] = entry[0] + 1
+        entry[1] = entry[1] + elapsed
+
+        self.stacks[frames] = self.stacks.get(frames, 0) + elapsed
+
+    def summary(self):
+        """
+            Produces the profile in a form suitable for further processing.
+
+            :returns:
+                A dictionary with the 'opcodes', 'callables' and 'instructions' keys, each a list of
+                dictionaries sorted by the total time spent, the most expensive first.
+        """
+
+        opcodes = []
+        for opcode, (count, elapsed) in self.opcodes.items():
+            opcodes.append({"name": compiler.opcodes.names[opcode], "count": count, "nanoseconds": elapsed})
+
+        callables = []
+        for callable, (count, elapsed) in self.callables.items():
+            callables.append({"name": callable.name, "count": count, "nanoseconds": elapsed})
+
+        instructions = []
+        payloads = {}
+        for (callable, instruction_pointer), (count, elapsed) in self.instructions.items():
+            if callable not in payloads:
+                payloads[callable] = callable.payload
+
+            instructions.append({"callable": callable.name, "eip": instruction_pointer, "operation": str(payloads[callable][instruction_pointer]),
+                "count": count, "nanoseconds": elapsed})
+
+        for entries in (opcodes, callables, instructions):
+            entries.sort(key=lambda entry: entry["nanoseconds"], reverse=True)
+
+        return {"opcodes": opcodes, "callables": callables, "instructions": instructions}
+
+    def report(self, limit=10):
+        """
+            Produces a human readable report of the most expensive opcodes, callables and instructions.
+
+            :parameters:
+                limit - How many entries to list in each section.
+
+            :returns:
+                The report as a string.
+        """
+
+        summary = self.summary()
+        total = sum(entry["nanoseconds"] for entry in summary["callables"]) or 1
+
+        lines = []
+        for title, entries in (("Opcodes", summary["opcodes"]), ("Callables", summary["callables"])):
+            lines.append("%s:" % title)
+            for entry in entries[:limit]:
+                lines.append("    %-20s %10u calls %12u ns %6.2f%%" % (entry["name"], entry["count"], entry["nanoseconds"], entry["nanoseconds"] * 100.0 / total))
+
+        lines.append("Instructions:")
+        for entry in summary["instructions"][:limit]:
+            location = "%s:%u %s" % (entry["callable"], entry["eip"], entry["operation"])
+            lines.append("    %-20s %10u calls %12u ns %6.2f%%" % (location, entry["count"], entry["nanoseconds"], entry["nanoseconds"] * 100.0 / total))
+
+        return "\n".join(lines)
+
+    def folded_stacks(self):
+        """
+            Produces the profile as folded stacks, the input format of flamegraph tools.
+
+            :returns:
+                A string with a line per call stack of the semicolon separated callable names followed
+                by the nanoseconds spent under it.
+        """
+
+        return "\n".join("%s %u" % (";".join(frames), elapsed) for frames, elapsed in sorted(self.stacks.items()))
+
+    def dump(self, path):
+        """
+            Writes the summary and the folded stacks as JSON.
+
+            :parameters:
+                path - The path of the file to write.
+        """
+
+        result = self.summary()
+        result["stacks"] = [{"stack": list(frames), "nanoseconds": elapsed} for frames, elapsed in sorted(self.stacks.items())]
+
+        with open(path, "w") as handle:
+            json.dump(result, handle, indent=4, sort_keys=True)
@@ -0,0 +1,155 @@
+"""
+    ropes.py
+
+    Python source file declaring ropes, the string values strcat builds out of the strings it
+    concatenates so that appending to a long string does not copy it.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+MINIMUM_LENGTH = 512
+"""
+    How long the result of strcat has to be for it to produce a rope. Shorter strings are cheaper to
+    copy than to keep in parts.
+"""
+
+class Rope(object):
+    """
+        A class representing a string held as the list of the parts it was concatenated from, which is
+        only joined once the string is observed. Its fields are the list of parts, how many of the parts
+        belong to the rope, the length of the string and the joined string once it was produced.
+
+        Ropes behave as immutable values: appending produces a new rope. The list of parts is shared with
+        the rope appended to, which only ever looks at its own count of parts, so appending to the most
+        recent rope of a list takes amortized constant time. Appending to an older rope copies its parts.
+
+        Anything other than strcat observing a rope sees the joined string: printing, comparing, hashing
+        and converting it. The interpreter flattens the ropes left on the stack and in the global
+        variables whenever it stops running, whether the program completed, failed or only ran for a
+        cycle, so they never leave the interpreter.
+    """
+
+    __slots__ = ("parts", "count", "length", "flat")
+
+    def __init__(self, parts, length):
+        self.parts = parts
+        self.count = len(parts)
+        self.length = length
+        self.flat = None
+
+    def append(self, text):
+        """
+            Concatenates a string to the rope.
+
+            :parameters:
+                text - The string to append.
+
+            :returns:
+                The new rope.
+        """
+
+        parts = self.parts
+        if self.count != len(parts):
+            # A rope appended to this one already, so the parts past our own belong to it
+            parts = parts[:self.count]
+        parts.append(text)
+        return Rope(parts, self.length + len(text))
+
+    def flatten(self):
+        """
+            Joins the parts of the rope, only once.
+
+            :returns:
+                The string the rope holds.
+        """
+
+        if self.flat is None:
+            parts = self.parts
+            self.flat = "".join(parts if self.count == len(parts) else parts[:self.count])
+        return self.flat
+
+    def __str__(self):
+        return self.flatten()
+
+    def __repr__(self):
+        return repr(self.flatten())
+
+    def __reduce__(self):
+        # Copies and pickles of a rope are plain strings
+        return (str, (self.flatten(),))
+
+    def __len__(self):
+        return self.length
+
+    def __nonzero__(self):
+        return self.length != 0
+
+    def __hash__(self):
+        return hash(self.flatten())
+
+    def __int__(self):
+        return int(self.flatten())
+
+    def __long__(self):
+        return long(self.flatten())
+
+    def __float__(self):
+        return float(self.flatten())
+
+    def __eq__(self, other):
+        return self.flatten() == flatten(other)
+
+    def __ne__(self, other):
+        return self.flatten() != flatten(other)
+
+    def __lt__(self, other):
+        return self.flatten() < flatten(other)
+
+    def __le__(self, other):
+        return self.flatten() <= flatten(other)
+
+    def __gt__(self, other):
+        return self.flatten() > flatten(other)
+
+    def __ge__(self, other):
+        return self.flatten() >= flatten(other)
+
+def concatenate(lhs, rhs):
+    """
+        Concatenates two values as strings, producing a rope once the result is long enough.
+
+        :parameters:
+            lhs - The value to append to. A rope is appended to without being joined.
+            rhs - The value to append.
+
+        :returns:
+            The concatenated string or rope.
+    """
+
+    rhs = str(rhs)
+    if type(lhs) is Rope:
+        return lhs.append(rhs)
+
+    lhs = str(lhs)
+    length = len(lhs) + len(rhs)
+    if length < MINIMUM_LENGTH:
+        return lhs + rhs
+    return Rope([lhs, rhs], length)
+
+def flatten(value):
+    """
+        Produces the string a rope holds, leaving any other value as it is.
+    """
+
+    return value.flatten() if type(value) is Rope else value
+
+def flatten_all(values):
+    """
+        Flattens the ropes of a list of values in place.
+    """
+
+    for index, value in enumerate(values):
+        if type(value) is Rope:
+            values[index] = value.flatten()
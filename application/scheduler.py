@@ -0,0 +1,399 @@
+"""
+    scheduler.py
+
+    Python source file declaring the cooperative scheduler, which time slices many FORTH programs
+    running on their own interpreters.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import time
+import heapq
+import timeit
+
+import interpreter
+
+monotonic = getattr(time, "monotonic", timeit.default_timer)
+"""
+    Returns the current time in seconds. This is time.monotonic where it exists and the most precise
+    timer available otherwise.
+"""
+
+class Program(object):
+    """
+        A class representing a single program run by the scheduler along with its accounting.
+    """
+
+    interpreter = None
+    """
+        The interpreter the program runs on.
+    """
+
+    callable = None
+    """
+        The callable the program started at.
+    """
+
+    priority = None
+    """
+        The priority of the program. Each slice runs up to priority times the quantum of the scheduler,
+        and among programs eligible at the same time the one with the highest priority runs first.
+    """
+
+    budget = None
+    """
+        How many operations the program may execute in total, or None for no limit. A program that
+        exhausts its budget is stopped.
+    """
+
+    interval = None
+    """
+        The minimum time in seconds between the start of consecutive slices of the program.
+    """
+
+    operations = None
+    """
+        How many operations the program has executed so far.
+    """
+
+    slices = None
+    """
+        How many slices the program has run.
+    """
+
+    eligible_time = None
+    """
+        The time from which the program may run its next slice.
+    """
+
+    submit_time = None
+    """
+        The time the program was added to the scheduler.
+    """
+
+    finish_time = None
+    """
+        The time the program finished, or None if it has not.
+    """
+
+    state = None
+    """
+        One of 'waiting', 'running', 'finished', 'exhausted', 'failed' or 'removed'.
+    """
+
+    error = None
+    """
+        The InterpreterRuntimeError the program failed with, if it failed.
+    """
+
+    def __init__(self, interp, callable, priority, budget, interval, now):
+        self.interpreter = interp
+        self.callable = callable
+        self.priority = priority
+        self.budget = budget
+        self.interval = interval
+        self.operations = 0
+        self.slices = 0
+        self.eligible_time = now
+        self.submit_time = now
+        self.state = "waiting"
+
+    def is_done(self):
+        """
+            Returns whether the program will not run again.
+        """
+
+        return self.state != "waiting" and self.state != "running"
+
+class Scheduler(object):
+    """
+        A class time slicing programs cooperatively. Programs wait in a heap ordered by the time they
+        become eligible to run, so picking the next program costs logarithmic time no matter how many
+        programs are waiting. Each slice is bounded by the cycle_ops of the interpreter, after which
+        the program is put back in line behind every program that became eligible before it.
+    """
+
+    quantum = None
+    """
+        How many operations a slice of a program with priority 1 runs.
+    """
+
+    clock = None
+    """
+        The function used to take the time, returning seconds.
+    """
+
+    heap = None
+    """
+        The heap of (eligible time, negated priority, sequence number, program) tuples.
+    """
+
+    sequence = None
+    """
+        A counter keeping the heap order first in, first out among equal entries.
+    """
+
+    active = None
+    """
+        How many programs are waiting to run.
+    """
+
+    on_finish = None
+    """
+        If not None, a function called with each program once it is done. Finished programs are not
+        kept by the scheduler otherwise.
+    """
+
+    operations = None
+    """
+        How many operations all programs have executed.
+    """
+
+    busy_time = None
+    """
+        The total time in seconds spent running slices.
+    """
+
+    slice_count = None
+    """
+        How many slices have been run.
+    """
+
+    wait_time = None
+    """
+        The total time in seconds programs have waited past their eligible time before running.
+    """
+
+    wait_maximum = None
+    """
+        The longest time in seconds a program has waited past its eligible time before running.
+    """
+
+    finished_count = None
+    """
+        How many programs are done, whichever way they ended.
+    """
+
+    turnaround_time = None
+    """
+        The total time in seconds from submission to completion of the programs that are done.
+    """
+
+    turnaround_maximum = None
+    """
+        The longest time in seconds from submission to completion of a program.
+    """
+
+    def __init__(self, quantum=100, clock=None):
+        self.quantum = quantum
+        self.clock = monotonic if clock is None else clock
+        self.heap = []
+        self.sequence = 0
+        self.active = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+            Resets the throughput and latency statistics.
+        """
+
+        self.operations = 0
+        self.busy_time = 0.0
+        self.slice_count = 0
+        self.wait_time = 0.0
+        self.wait_maximum = 0.0
+        self.finished_count = 0
+        self.turnaround_time = 0.0
+        self.turnaround_maximum = 0.0
+
+    def push(self, program):
+        """
+            Puts a program in line to run at its eligible time.
+        """
+
+        heapq.heappush(self.heap, (program.eligible_time, -program.priority, self.sequence, program))
+        self.sequence = self.sequence + 1
+
+    def add(self, interp, callable, priority=1, budget=None, interval=0.0):
+        """
+            Adds a program to the scheduler. The interpreter is prepared to run the callable and the
+            program becomes eligible to run right away.
+
+            :parameters:
+                interp - The interpreter to run the program on. It should not be used by anything else
+                    while the program is scheduled.
+                callable - The callable to run.
+                priority - The priority of the program, a positive integer.
+                budget - How many operations the program may execute in total, or None for no limit.
+                interval - The minimum time in seconds between the start of consecutive slices.
+
+            :returns:
+                The Program.
+        """
+
+        if priority < 1:
+            raise ValueError("Program priorities must be at least 1")
+
+        interp.cycle_time = None
+        interp.prepare(callable)
+
+        program = Program(interp, callable, priority, budget, interval, self.clock())
+        self.push(program)
+        self.active = self.active + 1
+        return program
+
+    def remove(self, program):
+        """
+            Removes a program from the scheduler before it is done. It is dropped from the heap once it
+            comes up.
+        """
+
+        if program.is_done() is False:
+            self.finish(program, "removed", self.clock())
+
+    def finish(self, program, state, now):
+        """
+            Marks a program as done and accounts its turnaround time.
+        """
+
+        program.state = state
+        program.finish_time = now
+        self.active = self.active - 1
+
+        turnaround = now - program.submit_time
+        self.finished_count = self.finished_count + 1
+        self.turnaround_time = self.turnaround_time + turnaround
+        self.turnaround_maximum = max(self.turnaround_maximum, turnaround)
+
+        if self.on_finish is not None:
+            self.on_finish(program)
+
+    def step(self, now=None):
+        """
+            Runs a single slice of the program that has been eligible the longest, if any is.
+
+            :parameters:
+                now - The current time, or None to take it from the clock.
+
+            :returns:
+                The program that was run, or None if no program is eligible.
+        """
+
+        heap = self.heap
+        if now is None:
+            now = self.clock()
+
+        # Programs removed while waiting are dropped as they come up
+        while len(heap) != 0 and heap[0][3].state != "waiting":
+            heapq.heappop(heap)
+
+        if len(heap) == 0 or heap[0][0] > now:
+            return None
+
+        program = heapq.heappop(heap)[3]
+        interp = program.interpreter
+
+        wait = now - program.eligible_time
+        self.wait_time = self.wait_time + wait
+        self.wait_maximum = max(self.wait_maximum, wait)
+
+        operations = self.quantum * program.priority
+        if program.budget is not None:
+            operations = min(operations, program.budget - program.operations)
+        interp.cycle_ops = operations
+
+        program.state = "running"
+        count = interp.command_count
+        try:
+            completed = interp.update()
+        except interpreter.InterpreterRuntimeError as e:
+            program.error = e
+            completed = None
+
+        end = self.clock()
+        executed = interp.command_count - count
+        program.operations = program.operations + executed
+        program.slices = program.slices + 1
+
+        self.operations = self.operations + executed
+        self.busy_time = self.busy_time + (end - now)
+        self.slice_count = self.slice_count + 1
+
+        if completed is None:
+            self.finish(program, "failed", end)
+        elif completed is True:
+            self.finish(program, "finished", end)
+        elif program.budget is not None and program.operations >= program.budget:
+            self.finish(program, "exhausted", end)
+        else:
+            program.state = "waiting"
+            program.eligible_time = max(end, now + program.interval)
+            self.push(program)
+
+        return program
+
+    def next_time(self):
+        """
+            Returns the time the next program becomes eligible, or None if there are no programs.
+        """
+
+        heap = self.heap
+        while len(heap) != 0 and heap[0][3].state != "waiting":
+            heapq.heappop(heap)
+
+        if len(heap) == 0:
+            return None
+        return heap[0][0]
+
+    def run(self, duration=None):
+        """
+            Runs programs until none are left, sleeping whenever no program is eligible yet.
+
+            :parameters:
+                duration - The maximum time in seconds to run for, or None to run until every program
+                    is done.
+
+            :returns:
+                True if every program is done. False otherwise.
+        """
+
+        deadline = None if duration is None else self.clock() + duration
+
+        while True:
+            now = self.clock()
+            if deadline is not None and now >= deadline:
+                return self.active == 0
+
+            if self.step(now) is not None:
+                continue
+
+            eligible = self.next_time()
+            if eligible is None:
+                return True
+
+            if deadline is not None:
+                eligible = min(eligible, deadline)
+            time.sleep(max(0.0, eligible - now))
+
+    def stats(self):
+        """
+            Produces the throughput and latency statistics.
+
+            :returns:
+                A dictionary of the statistics. Times are in seconds.
+        """
+
+        return {
+            "active": self.active,
+            "finished": self.finished_count,
+            "slices": self.slice_count,
+            "operations": self.operations,
+            "busy_time": self.busy_time,
+            "operations_per_second": self.operations / self.busy_time if self.busy_time > 0 else 0.0,
+            "wait_mean": self.wait_time / self.slice_count if self.slice_count != 0 else 0.0,
+            "wait_maximum": self.wait_maximum,
+            "turnaround_mean": self.turnaround_time / self.finished_count if self.finished_count != 0 else 0.0,
+            "turnaround_maximum": self.turnaround_maximum,
+        }
@@ -0,0 +1,455 @@
+"""
+    vectorized.py
+
+    Python source file declaring the vectorized execution mode, which runs a single FORTH callable
+    over many independent inputs at once using NumPy arrays with one lane per input.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import compiler
+import builtins
+import interpreter
+
+class LaneError(StandardError):
+    """
+        Exception representing a program that cannot be run in lanes, such as one using strings
+        as values, calls or commands that are not builtins. It is also raised when NumPy is not
+        available.
+    """
+
+    pass
+
+LANE_RUNNING = 0
+"""
+    The status of a lane that has not finished yet.
+"""
+
+LANE_FINISHED = 1
+"""
+    The status of a lane that ran off the end of the callable or exited.
+"""
+
+LANE_FAILED = 2
+"""
+    The status of a lane that stopped on an error.
+"""
+
+class LaneResult(object):
+    """
+        A class holding the final state of every lane of a vectorized run.
+    """
+
+    stack = None
+    """
+        A two dimensional array of the stacks of every lane, indexed by stack slot then lane. Only the
+        first depth[lane] slots of a lane are meaningful.
+    """
+
+    depth = None
+    """
+        An array of the stack depth of every lane.
+    """
+
+    variables = None
+    """
+        A dictionary mapping variable names to a tuple of an array of the value in every lane and an
+        array of whether the variable is set in that lane.
+    """
+
+    status = None
+    """
+        An array of the LANE_* status of every lane.
+    """
+
+    errors = None
+    """
+        A dictionary mapping the lanes that failed to their error message.
+    """
+
+    command_count = None
+    """
+        An array of how many commands every lane executed.
+    """
+
+    def __init__(self, stack, depth, variables, status, errors, command_count):
+        self.stack = stack
+        self.depth = depth
+        self.variables = variables
+        self.status = status
+        self.errors = errors
+        self.command_count = command_count
+
+    def lane_stack(self, lane):
+        """
+            Returns the stack of a single lane as a list, from the bottom up.
+        """
+
+        return [int(value) for value in self.stack[:self.depth[lane], lane]]
+
+    def lane_variables(self, lane):
+        """
+            Returns the variables set in a single lane as a dictionary.
+        """
+
+        return dict((name, int(values[lane])) for name, (values, defined) in self.variables.items() if defined[lane])
+
+class LaneInterpreter(object):
+    """
+        A class running a callable over many lanes in a single interpreted pass. Every stack slot and
+        variable holds an array with an element per lane, and each operation is applied to all lanes
+        executing it at once. Lanes keep their own instruction pointer: the operation executed next is
+        always the lowest instruction pointer of any running lane, applied to the lanes at it, so lanes
+        that diverge at an 'if' or leave a loop early reconverge as soon as the others catch up.
+
+        Values are 64 bit integers, so they wrap around where Python integers would grow, and booleans
+        are represented as 0 and 1. Strings may only appear as variable names directly consumed by
+        '@' or '!', and calls are not supported. Declared global variables share the variables of the
+        same name, while local variables are only kept for the duration of the run.
+    """
+
+    _binary = {builtins.add: "+", builtins.sub: "-", builtins.mult: "*", builtins.div: "/", builtins.mod: "%"}
+    """
+        The arithmetic builtins, mapped to the operation they perform on the element behind the top of
+        the stack and the top of the stack.
+    """
+
+    _comparisons = {builtins.less_than: "<", builtins.greater_than: ">", builtins.less_than_equal: "<=", builtins.greater_than_equal: ">=", builtins.equals: "=="}
+    """
+        The comparison builtins, mapped to the operation they perform on the top of the stack and the
+        element behind it.
+    """
+
+    _simple = {builtins.dup: "dup", builtins.swap: "swap", builtins.pop: "pop", builtins.rot: "rot", builtins.not_command: "not",
+        builtins.randint: "random", builtins.nop: "nop", builtins.begin: "nop", builtins.exit: "exit", builtins.store: "!", builtins.fetch: "@"}
+    """
+        The other supported builtins, mapped to the operation implementing them.
+    """
+
+    _branches = {builtins.ifblock: "if", builtins.elseblock: "jump", builtins.until: "until", builtins.whileblock: "while", builtins.repeat: "jump"}
+    """
+        The branching builtins, mapped to the operation implementing them.
+    """
+
+    _superinstructions = {"literal+": "+", "literal-": "-", "literal*": "*", "literal/": "/", "literal%": "%"}
+    """
+        The arithmetic superinstructions, mapped to the operation they perform with their operand.
+    """
+
+    _requirements = {"+": 2, "-": 2, "*": 2, "/": 2, "%": 2, "compare": 2, "literal": 1, "store": 1, "dup": 1, "swap": 2, "pop": 1,
+        "not": 1, "square": 1, "nip": 2, "if": 1, "until": 1, "while": 1}
+    """
+        How many stack elements each operation needs. Lanes with fewer fail with a stack underflow.
+    """
+
+    commands = None
+    """
+        The commands of the interpreter whose semantics are vectorized. Words are translated by the
+        builtin they are bound to.
+    """
+
+    command_maximum = 0
+    """
+        The maximum number of commands each lane may execute before it fails, or 0 for no maximum.
+    """
+
+    stack = None
+    depth = None
+    variables = None
+    status = None
+    errors = None
+    retired = None
+
+    def __init__(self, commands=None):
+        if numpy is None:
+            raise LaneError("Vectorized execution requires NumPy")
+
+        self.commands = interpreter.Interpreter().commands if commands is None else commands
+
+    def translate(self, callable):
+        """
+            Translates a callable into a list of operations, one per instruction pointer.
+
+            :returns:
+                A list of (operation, argument) tuples. Variable accesses have the variable name and
+                how many operations they span as their argument.
+        """
+
+        payload = callable.payload
+        targets = callable.branch_targets
+        result = []
+
+        for index, op in enumerate(payload):
+            if type(op) is compiler.CodeNumber:
+                result.append(("push", op.data))
+            elif type(op) is compiler.CodeString:
+                following = payload[index + 1] if index + 1 < len(payload) else None
+                if index + 1 in targets.values() or following not in ("@", "!") or self._simple.get(self.commands.get(following)) != following:
+                    raise LaneError("Strings can only be used as variable names in vectorized execution (EIP %u)" % index)
+                result.append(("fetch" if following == "@" else "store", (op.data, 2)))
+            elif type(op) is compiler.CodeSuperinstruction:
+                if op.name in self._superinstructions:
+                    result.append(("literal", (self._superinstructions[op.name], op.data)))
+                elif op.name == "literal@":
+                    result.append(("fetch", (op.data, 1)))
+                elif op.name == "literal!":
+                    result.append(("store", (op.data, 1)))
+                elif op.name in ("global@", "global!"):
+                    result.append(("fetch" if op.name == "global@" else "store", (op.data.name, 1)))
+                elif op.name in ("local@", "local!"):
+                    # Locals are kept apart from the globals of the same name
+                    result.append(("fetch" if op.name == "local@" else "store", ((callable.name, callable.local_variables[op.data]), 1)))
+                elif op.name == "dup*":
+                    result.append(("square", None))
+                elif op.name == "nip":
+                    result.append(("nip", None))
+                else:
+                    raise LaneError("Unsupported superinstruction '%s' (EIP %u)" % (op.name, index))
+            else:
+                command = self.commands.get(op)
+                if command in self._binary:
+                    result.append((self._binary[command], None))
+                elif command in self._comparisons:
+                    result.append(("compare", self._comparisons[command]))
+                elif command in self._branches:
+                    result.append((self._branches[command], targets[index]))
+                elif command in self._simple:
+                    # The string before '@' and '!' already performed them
+                    name = self._simple[command]
+                    result.append(("nop" if name in ("@", "!") else name, None))
+                else:
+                    raise LaneError("Command '%s' is not supported in vectorized execution (EIP %u)" % (op, index))
+
+        return result
+
+    def fail(self, lanes, message):
+        """
+            Stops the given lanes with an error.
+        """
+
+        self.status[lanes] = LANE_FAILED
+        self.retired = True
+        for lane in lanes:
+            self.errors[int(lane)] = message
+
+    def pop(self, lanes):
+        """
+            Pops the top of the stack of the given lanes.
+
+            :returns:
+                An array of the values popped.
+        """
+
+        self.depth[lanes] -= 1
+        return self.stack[self.depth[lanes], lanes]
+
+    def push(self, lanes, values):
+        """
+            Pushes values to the stack of the given lanes, growing the stacks as needed.
+        """
+
+        if len(lanes) != 0 and self.depth[lanes].max() >= self.stack.shape[0]:
+            grown = numpy.zeros((self.stack.shape[0] * 2, self.stack.shape[1]), dtype=numpy.int64)
+            grown[:self.stack.shape[0]] = self.stack
+            self.stack = grown
+
+        self.stack[self.depth[lanes], lanes] = values
+        self.depth[lanes] += 1
+
+    def run(self, callable, lanes=None, stack=None, variables=None):
+        """
+            Runs a callable over many lanes.
+
+            :parameters:
+                callable - The callable to run.
+                lanes - How many lanes to run. If None, this is taken from the length of the initial
+                    stack and variable arrays.
+                stack - A list of the initial stack slots from the bottom up, each a scalar or an array
+                    with an element per lane.
+                variables - A dictionary mapping variable names to their initial value, each a scalar
+                    or an array with an element per lane.
+
+            :returns:
+                The LaneResult.
+        """
+
+        operations = self.translate(callable)
+        stack = [] if stack is None else stack
+        variables = {} if variables is None else variables
+
+        if lanes is None:
+            sizes = [numpy.size(values) for values in list(stack) + list(variables.values()) if numpy.ndim(values) != 0]
+            if len(sizes) == 0:
+                raise LaneError("The number of lanes cannot be inferred from scalar inputs")
+            lanes = sizes[0]
+
+        self.stack = numpy.zeros((max(8, len(stack) * 2), lanes), dtype=numpy.int64)
+        for slot, values in enumerate(stack):
+            self.stack[slot] = values
+        self.depth = numpy.empty(lanes, dtype=numpy.int64)
+        self.depth.fill(len(stack))
+
+        self.variables = {}
+        for name in variables:
+            values = numpy.zeros(lanes, dtype=numpy.int64)
+            values[:] = variables[name]
+            self.variables[name] = (values, numpy.ones(lanes, dtype=bool))
+
+        self.status = numpy.zeros(lanes, dtype=numpy.int8)
+        self.errors = {}
+        pointers = numpy.zeros(lanes, dtype=numpy.int64)
+        counts = numpy.zeros(lanes, dtype=numpy.int64)
+        length = len(operations)
+
+        # Only the lanes still running are looked at, so lanes retiring early stop costing anything
+        live = numpy.arange(lanes)
+        if length == 0:
+            self.status[:] = LANE_FINISHED
+            live = live[:0]
+
+        while len(live) != 0:
+            self.retired = False
+
+            live_pointers = pointers[live]
+            pointer = int(live_pointers.min())
+            active = live[live_pointers == pointer]
+            counts[active] += 1
+
+            if self.command_maximum > 0:
+                exceeded = counts[active] > self.command_maximum
+                if exceeded.any():
+                    self.fail(active[exceeded], "Terminated: Maximum of %u commands exceeded." % self.command_maximum)
+                    active = active[~exceeded]
+
+            operation, argument = operations[pointer]
+
+            required = self._requirements.get(operation, 0)
+            if required != 0:
+                underflow = self.depth[active] < required
+                if underflow.any():
+                    self.fail(active[underflow], "Stack underflow at EIP %u" % pointer)
+                    active = active[~underflow]
+
+            following = pointer + 1
+            if operation == "push":
+                self.push(active, argument)
+            elif operation in ("+", "-", "*", "/", "%") or operation == "literal":
+                if operation == "literal":
+                    operation, value = argument
+                    rhs = numpy.empty(len(active), dtype=numpy.int64)
+                    rhs.fill(value)
+                else:
+                    rhs = self.pop(active)
+                lhs = self.pop(active)
+
+                if operation in ("/", "%"):
+                    zero = rhs == 0
+                    if zero.any():
+                        self.fail(active[zero], "Division by zero at EIP %u" % pointer)
+                        active = active[~zero]
+                        lhs = lhs[~zero]
+                        rhs = rhs[~zero]
+
+                if operation == "+":
+                    result = lhs + rhs
+                elif operation == "-":
+                    result = lhs - rhs
+                elif operation == "*":
+                    result = lhs * rhs
+                elif operation == "/":
+                    result = numpy.floor_divide(lhs, rhs)
+                else:
+                    result = numpy.mod(lhs, rhs)
+                self.push(active, result)
+            elif operation == "compare":
+                rhs = self.pop(active)
+                lhs = self.pop(active)
+
+                if argument == "<":
+                    result = rhs < lhs
+                elif argument == ">":
+                    result = rhs > lhs
+                elif argument == "<=":
+                    result = rhs <= lhs
+                elif argument == ">=":
+                    result = rhs >= lhs
+                else:
+                    result = rhs == lhs
+                self.push(active, result)
+            elif operation == "fetch":
+                argument, span = argument
+                values, defined = self.variables.get(argument, (None, None))
+                missing = ~defined[active] if defined is not None else numpy.ones(len(active), dtype=bool)
+                if missing.any():
+                    self.fail(active[missing], "Unknown variable %r at EIP %u" % (argument, pointer))
+                    active = active[~missing]
+                if len(active) != 0:
+                    self.push(active, values[active])
+                counts[active] += span - 1
+                following = pointer + span
+            elif operation == "store":
+                argument, span = argument
+                if argument not in self.variables:
+                    self.variables[argument] = (numpy.zeros(lanes, dtype=numpy.int64), numpy.zeros(lanes, dtype=bool))
+                values, defined = self.variables[argument]
+                values[active] = self.pop(active)
+                defined[active] = True
+                counts[active] += span - 1
+                following = pointer + span
+            elif operation == "dup":
+                self.push(active, self.stack[self.depth[active] - 1, active])
+            elif operation == "swap" or operation == "rot":
+                if operation == "rot":
+                    # rot leaves stacks with fewer than two elements alone
+                    active = active[self.depth[active] >= 2]
+                rhs = self.pop(active)
+                lhs = self.pop(active)
+                self.push(active, rhs)
+                self.push(active, lhs)
+            elif operation == "pop":
+                self.depth[active] -= 1
+            elif operation == "nip":
+                top = self.pop(active)
+                self.depth[active] -= 1
+                self.push(active, top)
+            elif operation == "square":
+                top = self.pop(active)
+                self.push(active, top * top)
+            elif operation == "not":
+                self.push(active, self.pop(active) == 0)
+            elif operation == "random":
+                self.push(active, numpy.random.randint(0, 2 ** 32, size=len(active)).astype(numpy.int64))
+            elif operation == "exit":
+                self.status[active] = LANE_FINISHED
+                live = live[self.status[live] == LANE_RUNNING]
+                continue
+            elif operation == "jump":
+                following = argument
+            elif operation == "if" or operation == "until":
+                following = numpy.where(self.pop(active) != 0, pointer + 1, argument)
+            elif operation == "while":
+                following = numpy.where(self.pop(active) != 0, argument, pointer + 1)
+
+            pointers[active] = following
+
+            # Lanes past the end of the callable are done
+            if self.retired is True or numpy.max(following) >= length:
+                self.status[active[pointers[active] >= length]] = LANE_FINISHED
+                live = live[self.status[live] == LANE_RUNNING]
+
+        variables = dict((name, self.variables[name]) for name in self.variables if type(name) is not tuple)
+        return LaneResult(self.stack, self.depth, variables, self.status, self.errors, counts)
+
+def run_lanes(callable, lanes=None, stack=None, variables=None, commands=None):
+    """
+        Runs a callable over many lanes. See LaneInterpreter.run.
+    """
+
+    return LaneInterpreter(commands).run(callable, lanes, stack, variables)
@@ -0,0 +1,142 @@
+"""
+    harness.py
+
+    Helpers shared by the tests: compiling programs, setting up interpreters in each execution mode and
+    running programs to compare what they leave behind.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import os
+import sys
+import collections
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "application"))
+
+import builtins
+import compiler
+import interpreter
+
+Outcome = collections.namedtuple("Outcome", ["reason", "stack", "variables", "command_count", "instruction_pointer"])
+"""
+    What a program left behind: the type of the reason it failed for or None, the stack, the global
+    variables, the number of commands executed and the instruction pointer it failed at or None.
+"""
+
+def unlinked(interp):
+    """
+        Runs the callables as they were compiled, without linking calls to the callables they call.
+    """
+
+    interp.commands["call"] = lambda interp: builtins.call(interp)
+
+def linked(interp):
+    """
+        Runs the callables as the linker links them, which is the default.
+    """
+
+def jit(interp):
+    """
+        Compiles every callable with the JIT as soon as it is called.
+    """
+
+    interp.jit_threshold = 1
+
+def threaded(interp):
+    """
+        Runs the callables as direct threaded code.
+    """
+
+    interp.threaded = True
+
+def integer(interp):
+    """
+        Runs the callables proven to only push numbers in the integer mode.
+    """
+
+    interp.integer_stack = True
+
+def memoized(interp):
+    """
+        Answers calls of pure callables from their result caches.
+    """
+
+    interp.memoize = 64
+
+def compile(program, level=2, method="compile_forth"):
+    """
+        Compiles a program with a fresh compiler.
+
+        :parameters:
+            program - The FORTH source.
+            level - The optimization level of the compiler.
+            method - The name of the compiler method producing the codeblock.
+
+        :returns:
+            The CodeBlock.
+    """
+
+    return getattr(compiler.Compiler(level), method)(program)
+
+def make_interpreter(setup=None, command_maximum=0):
+    """
+        Constructs an interpreter without stack debugging.
+
+        :parameters:
+            setup - A function setting up the interpreter for an execution mode, or None.
+            command_maximum - The command budget, or 0 for none.
+
+        :returns:
+            The interpreter.
+    """
+
+    interp = interpreter.Interpreter()
+    interp.command_maximum = command_maximum
+    interp.stack_debug = False
+    if setup is not None:
+        setup(interp)
+    return interp
+
+def execute(interp, callable):
+    """
+        Executes a callable, catching the error it fails with if it does.
+
+        :parameters:
+            interp - The interpreter.
+            callable - The callable, or the name of a registered callable.
+
+        :returns:
+            The Outcome.
+    """
+
+    if type(callable) is str:
+        callable = interp.callable_functions[callable]
+
+    try:
+        interp.execute(callable)
+    except interpreter.InterpreterRuntimeError as e:
+        return Outcome(type(e.reason), list(interp.stack), interp.variables(), interp.command_count, interp.instruction_pointer)
+    return Outcome(None, list(interp.stack), interp.variables(), interp.command_count, None)
+
+def run(program, setup=None, level=2, method="compile_forth", command_maximum=0):
+    """
+        Runs the main callable of a program on a new interpreter.
+
+        :parameters:
+            program - The FORTH source or a CodeBlock compiled already.
+            setup - A function setting up the interpreter for an execution mode, or None.
+            level - The optimization level to compile the source with.
+            method - The name of the compiler method to compile the source with.
+            command_maximum - The command budget, or 0 for none.
+
+        :returns:
+            The Outcome.
+    """
+
+    codeblock = program if isinstance(program, compiler.CodeBlock) else compile(program, level, method)
+
+    interp = make_interpreter(setup, command_maximum)
+    interp.register_codeblock(codeblock)
+    return execute(interp, "main")
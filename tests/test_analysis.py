@@ -0,0 +1,77 @@
+"""
+    test_analysis.py
+
+    Tests of what the static analysis of the compiler proves about callables.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import compiler
+
+CASES = (
+    (":main\n 1 2 + 3 *\n;", [0, 1, 2, 3, 4, 5], [2, 4], 0, []),
+    (":main\n + 1 +\n;", [1, 2, 3], [2], 2, ["Callable 'main' takes 2 value(s) from the stack of its caller, the first at EIP 0 (+)."]),
+    (":main\n \"a\" 1 +\n;", [0, 1, 3], [], 0, ["Callable 'main' always fails at EIP 2 (+): it converts a string that is not a number."]),
+    (":main\n 1 if 2 else \"x\" then 3 +\n;", [0, 1, 2, 3, 4, 5, 6, 8], [], 0, []),
+    (":main\n 0 begin 1 + dup 5 = until\n;", [0, 1, 2, 3, 4, 5, 6, 7, 8], [3], 0, []),
+    (":main\n pop pop\n;", [2], [], 2, ["Callable 'main' takes 2 value(s) from the stack of its caller, the first at EIP 0 (pop)."]),
+)
+"""
+    Programs, each with the instruction pointers of the operations proven safe and of those run unchecked,
+    how many values it takes from its caller and the diagnostics about it. The string may reach the + of
+    the conditional program, so that one stays checked.
+"""
+
+class AnalysisTest(unittest.TestCase):
+    def test_proofs(self):
+        for source, safe, unchecked, inputs, diagnostics in CASES:
+            instance = compiler.Compiler(0)
+            callable = instance.compile_forth(source).callable_functions["main"]
+            analysis = callable.analysis
+
+            self.assertEqual(sorted(analysis.safe), safe, source)
+            self.assertEqual(sorted(analysis.unchecked), unchecked, source)
+            self.assertEqual(analysis.inputs, inputs, source)
+            self.assertEqual(analysis.diagnostics, diagnostics, source)
+            self.assertEqual(instance.diagnostics, diagnostics)
+            self.assertEqual((instance.analyzed_operations, instance.safe_operations), (len(callable.code), len(safe)))
+
+    def test_unchecked_code(self):
+        for source, safe, unchecked, inputs, diagnostics in CASES:
+            callable = harness.compile(source, 0).callable_functions["main"]
+
+            for index, opcode in enumerate(callable.code):
+                name = compiler.opcodes.names[callable.fast_code[index]]
+                if index in unchecked:
+                    self.assertEqual(name, compiler.unchecked_name(compiler.opcodes.names[opcode]))
+                else:
+                    self.assertEqual(callable.fast_code[index], opcode)
+
+    def test_unchecked_code_fails_like_checked_code(self):
+        for stack in ([], [1], ["a", 1], [1, "2"], [3, 4]):
+            for source, safe, unchecked, inputs, diagnostics in CASES:
+                interp = harness.make_interpreter()
+                interp.register_codeblock(harness.compile(source, 0))
+                interp.stack = list(stack)
+                outcome = harness.execute(interp, "main")
+
+                interp = harness.make_interpreter()
+                interp.analysis_trusted = False
+                interp.register_codeblock(harness.compile(source, 0))
+                interp.stack = list(stack)
+                self.assertEqual(harness.execute(interp, "main"), outcome, (source, stack))
+
+    def test_relative_jumps_are_not_analyzed(self):
+        analysis = harness.compile(":main\n 1 2 + 3 jump 4 5 6\n;", 0).callable_functions["main"].analysis
+
+        self.assertIs(analysis.inputs, None)
+        self.assertEqual(analysis.safe, set())
+
+if __name__ == "__main__":
+    unittest.main()
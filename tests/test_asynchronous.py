@@ -0,0 +1,122 @@
+"""
+    test_asynchronous.py
+
+    Tests of running programs on an asyncio event loop.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import asynchronous
+import interpreter
+
+PROGRAM = """
+:main
+    0 begin
+        1 + "ready" query pop
+        dup 10 =
+    until
+    1 sleep
+;
+"""
+
+@unittest.skipIf(asynchronous.asyncio is None, "asyncio is not available")
+class AsynchronousTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asynchronous.asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def interpreter(self):
+        interp = harness.make_interpreter()
+        interp.register_codeblock(harness.compile(PROGRAM))
+        interp.service = asynchronous.LocalService({"ready": "yes"})
+        interp.cycle_ops = 7
+        return interp
+
+    def assertRestored(self, interp):
+        self.assertIs(interp.event_loop, None)
+        self.assertEqual(interp.cycle_ops, 7)
+        for name in asynchronous.commands:
+            self.assertNotIn(name, interp.commands)
+        self.assertIs(interp.commands.is_pristine(), True)
+
+    def test_completed_programs_restore_the_interpreter(self):
+        interp = self.interpreter()
+        result = interp.execute_async(interp.callable_functions["main"], self.loop, 3)
+
+        self.assertEqual(self.loop.run_until_complete(result), [10])
+        self.assertRestored(interp)
+
+    def test_failed_programs_restore_the_interpreter(self):
+        interp = self.interpreter()
+        interp.service = None
+        result = interp.execute_async(interp.callable_functions["main"], self.loop, 3)
+
+        self.assertRaises(interpreter.InterpreterRuntimeError, self.loop.run_until_complete, result)
+        self.assertRestored(interp)
+
+    def test_cancelled_programs_restore_the_interpreter(self):
+        interp = self.interpreter()
+        result = interp.execute_async(interp.callable_functions["main"], self.loop, 3)
+        self.loop.call_soon(result.cancel)
+
+        self.assertRaises(asynchronous.asyncio.CancelledError, self.loop.run_until_complete, result)
+        self.assertRestored(interp)
+
+    def test_programs_ending_in_awaitable_builtins_await_them(self):
+        interp = harness.make_interpreter()
+        interp.register_codeblock(harness.compile(":main\n \"ready\" query\n;", 2))
+        interp.service = asynchronous.LocalService({"ready": "yes"})
+        result = interp.execute_async(interp.callable_functions["main"], self.loop)
+
+        self.assertEqual(self.loop.run_until_complete(result), ["yes"])
+
+    def test_replaced_builtins_are_kept(self):
+        interp = self.interpreter()
+        interp.commands["sleep"] = lambda interp: interp.stack.pop()
+        result = interp.execute_async(interp.callable_functions["main"], self.loop, 3)
+
+        self.assertEqual(self.loop.run_until_complete(result), [10])
+        self.assertIn("sleep", interp.commands)
+        self.assertNotIn("query", interp.commands)
+
+class SuspendTest(unittest.TestCase):
+    def interpreter(self, program):
+        interp = harness.make_interpreter()
+        interp.commands["wait"] = lambda interp: asynchronous.suspend(interp, "awaitable")
+        interp.register_codeblock(harness.compile(program, 2))
+        interp.prepare(interp.callable_functions["main"])
+        interp.event_loop = object()
+        interp.cycle_ops = 100
+        return interp
+
+    def test_suspending_ends_the_slice(self):
+        interp = self.interpreter(":main\n 1 wait 2 3\n;")
+        self.assertIs(interp.update(), False)
+        self.assertEqual(interp.pending, "awaitable")
+        self.assertEqual(interp.stack, [1])
+
+        interp.pending = None
+        interp.cycle_ops = 100
+        self.assertIs(interp.update(), True)
+        self.assertEqual(interp.stack, [1, 2, 3])
+
+    def test_suspending_last_operation_leaves_it_pending(self):
+        interp = self.interpreter(":main\n 1 wait\n;")
+        self.assertIs(interp.update(), True)
+        self.assertEqual(interp.pending, "awaitable")
+
+    def test_suspending_requires_an_event_loop(self):
+        interp = self.interpreter(":main\n 1 wait\n;")
+        interp.event_loop = None
+        self.assertRaises(interpreter.InterpreterRuntimeError, interp.update)
+
+if __name__ == "__main__":
+    unittest.main()
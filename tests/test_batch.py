@@ -0,0 +1,59 @@
+"""
+    test_batch.py
+
+    Tests of running a codeblock over many inputs with the batch executor.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import batch
+
+PROGRAM = """
+:main
+    variable scale
+    dup * "scale" @ * "square" strcat
+;
+"""
+
+SETTINGS = {"command_maximum": 50, "jit_threshold": None}
+
+INPUTS = [([index], {"scale": index + 1}) for index in range(6)] + [(["x"], {"scale": 1}), ([2], {})]
+"""
+    The inputs of the runs, the last two of which fail.
+"""
+
+class BatchTest(unittest.TestCase):
+    def test_runs(self):
+        codeblock = harness.compile(PROGRAM)
+        results = sorted(batch.run_batch(codeblock, "main", INPUTS, 2, SETTINGS, 3), key=lambda result: result.index)
+
+        self.assertEqual([result.index for result in results], range(len(INPUTS)))
+        for index in range(6):
+            self.assertEqual(results[index].stack, ["%usquare" % (index * index * (index + 1))])
+            self.assertEqual(results[index].global_variables, {"scale": index + 1})
+            self.assertIs(results[index].error, None)
+
+        for result in results[6:]:
+            self.assertIsNot(result.reason, None)
+            self.assertIn("Frame", result.error)
+        self.assertIn("ValueError", results[6].reason)
+        self.assertIn("KeyError", results[7].reason)
+
+    def test_settings_apply_to_every_run(self):
+        codeblock = harness.compile(":main\n begin 1 0 until\n;")
+        results = list(batch.run_batch(codeblock, "main", [[]] * 3, 1, SETTINGS))
+
+        self.assertEqual([result.command_count for result in results], [50] * 3)
+        self.assertEqual(set("InterpreterLimitError" in result.reason for result in results), set([True]))
+
+    def test_unknown_entries(self):
+        self.assertRaises(KeyError, batch.BatchExecutor, harness.compile(PROGRAM), "missing", 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+    test_blocks.py
+
+    Tests of the basic blocks the command budget is charged for at once.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+PROGRAM = """
+:main
+    variable total
+    0 "total" !
+    0 begin
+        dup dup * "total" @ + "total" !
+        1 + dup 6 =
+    until
+    "total" @ 3 "square" call +
+;
+:square
+    dup *
+return
+"""
+
+FAILING = ":main\n 1 2 3 + + \"a\" 4 + 5 + +\n;"
+"""
+    A program failing in the middle of its only basic block.
+"""
+
+def per_operation(interp):
+    """
+        Charges the budget one operation at a time, as the frame history has to be recorded for each.
+    """
+
+    interp.stack_debug = True
+
+class BlockTest(unittest.TestCase):
+    def test_block_lengths(self):
+        callable = harness.compile(":main\n 1 2 + if 3 4 else 5 then 6 7\n;", 0).callable_functions["main"]
+
+        # Operations transferring control are charged on their own, while a then does not end a block
+        self.assertEqual(list(callable.block_lengths), [3, 2, 1, 0, 2, 1, 0, 5, 4, 3, 2, 1])
+
+    def test_budgets_run_out_at_the_same_operation(self):
+        for source in (PROGRAM, FAILING):
+            for level in (0, 2):
+                codeblock = harness.compile(source, level)
+                total = harness.run(codeblock).command_count
+
+                for maximum in range(1, total + 2):
+                    self.assertEqual(harness.run(codeblock, command_maximum=maximum),
+                        harness.run(codeblock, per_operation, command_maximum=maximum), (source, level, maximum))
+
+    def test_failures_count_the_operations_before_them(self):
+        outcome = harness.run(FAILING, level=0)
+
+        self.assertEqual(outcome, harness.run(FAILING, per_operation, 0))
+        self.assertEqual((outcome.instruction_pointer, outcome.command_count), (7, 7))
+
+    def test_cycles_end_within_blocks(self):
+        codeblock = harness.compile(PROGRAM)
+        counts = []
+        for setup in (None, per_operation):
+            interp = harness.make_interpreter(setup)
+            interp.register_codeblock(codeblock)
+            interp.cycle_ops = 4
+            interp.prepare(interp.callable_functions["main"])
+
+            steps = [interp.command_count]
+            while interp.update() is False:
+                steps.append(interp.command_count)
+            counts.append((steps, interp.stack))
+
+        self.assertEqual(counts[0], counts[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+    test_branches.py
+
+    Tests of the branch targets the compiler resolves for conditionals and loops.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import compiler
+
+PROGRAMS = (
+    (":main\n 1 if 2 else 3 then 4\n;", [2, 4]),
+    (":main\n 0 if 2 else 3 then 4\n;", [3, 4]),
+    (":main\n 1 if 0 if 5 else 6 then 7 else 8 then\n;", [6, 7]),
+    (":main\n 0 if 1 if 5 then 6 else 1 if 7 else 8 then then 9\n;", [7, 9]),
+    (":main\n 0 begin 1 + dup 3 = until\n;", [3]),
+    (":main\n 0 begin 0 begin 1 + dup 2 = until pop 1 + dup 3 = until\n;", [3]),
+    (":main\n 0 begin dup 3 = while 1 + repeat 10\n;", [3, 10]),
+    (":main\n 1 if 0 begin dup 2 = while 1 + repeat then 10\n;", [2, 10]),
+)
+"""
+    Programs nesting conditionals and loops, with the stack each of them leaves.
+"""
+
+LEGACY = (
+    (":main\n 0 begin dup 3 = while 1 + repeat then 10\n;", ":main\n 0 begin dup 3 = while 1 + repeat 10\n;"),
+    (":main\n 0 begin 1 + dup 3 = while repeat then 10\n;", ":main\n 0 begin 1 + dup 3 = while repeat 10\n;"),
+    (":main\n 0 begin 0 begin 1 + dup 2 = while repeat then pop 1 + dup 3 = while repeat then\n;", ":main\n 0 begin 0 begin 1 + dup 2 = while repeat pop 1 + dup 3 = while repeat\n;"),
+)
+"""
+    Loops ending in a then after their repeat, as they were written before branch targets were resolved at
+    compile time, each with the same loop written without it.
+"""
+
+UNMATCHED = (
+    ":main\n 1 else 2\n;",
+    ":main\n 1 then\n;",
+    ":main\n 1 if 2\n;",
+    ":main\n 1 while\n;",
+    ":main\n 1 until\n;",
+    ":main\n begin 1\n;",
+    ":main\n 1 if begin 0 else until then\n;",
+    ":main\n begin 1 until then\n;",
+)
+"""
+    Programs with a branching word that has no match.
+"""
+
+class BranchTest(unittest.TestCase):
+    def test_nested_blocks(self):
+        for source, stack in PROGRAMS:
+            for level in (0, 2):
+                for setup in (None, harness.threaded, harness.jit):
+                    self.assertEqual(harness.run(source, setup, level)[:3], (None, stack, {}), source)
+
+    def test_loops_ending_in_then(self):
+        for source, modern in LEGACY:
+            for level in (0, 2):
+                for setup in (None, harness.threaded, harness.jit):
+                    self.assertEqual(harness.run(source, setup, level)[:3], harness.run(modern, setup, level)[:3], source)
+
+    def test_while_exits_past_the_then(self):
+        callable = harness.compile(LEGACY[0][0], 0).callable_functions["main"]
+        payload = list(callable.payload)
+
+        self.assertEqual(callable.branch_targets[payload.index("while")], payload.index("then") + 1)
+        self.assertEqual(callable.branch_targets[payload.index("repeat")], payload.index("begin") + 1)
+
+    def test_unmatched_words(self):
+        for source in UNMATCHED:
+            self.assertRaises(compiler.CompilerError, harness.compile, source)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+    test_bytecode.py
+
+    Tests of the binary serialization of codeblocks and of the bytecode cache.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import os
+import types
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+import harness
+
+import bytecode
+import compiler
+
+PROGRAM = """
+:main
+    variable total
+    0 "total" !
+    4 begin
+        dup "total" @ + "total" !
+        1 - dup 0 =
+    until
+    "total" @ 3 "square" call + "done" strcat
+;
+:square
+    dup *
+return
+"""
+
+SOURCE_HASH = hashlib.sha1(PROGRAM).digest()
+
+class BytecodeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        bytecode._fingerprints.clear()
+
+    def test_round_trip(self):
+        for level in (0, 2):
+            instance = compiler.Compiler(level)
+            loaded = bytecode.loads(bytecode.dumps(instance.compile_forth(PROGRAM), instance, SOURCE_HASH), instance, SOURCE_HASH)
+
+            self.assertEqual(loaded.statistics()["loaded"], 0)
+            for setup in (None, harness.threaded, harness.jit):
+                self.assertEqual(harness.run(loaded, setup)[:3], harness.run(PROGRAM, setup, level)[:3])
+
+    def test_cache(self):
+        source_path = os.path.join(self.directory, "program.fth")
+        with open(source_path, "wb") as handle:
+            handle.write(PROGRAM)
+
+        compiled = bytecode.compile_file(source_path, compiler.Compiler(2), self.directory)
+        cached = bytecode.compile_file(source_path, compiler.Compiler(2), self.directory)
+        self.assertIsNot(type(compiled.callable_functions), compiler.LazyCallableTable)
+        self.assertIs(type(cached.callable_functions), compiler.LazyCallableTable)
+        self.assertEqual(harness.run(cached)[:3], harness.run(compiled)[:3])
+
+        # Changed source is compiled again
+        with open(source_path, "wb") as handle:
+            handle.write(PROGRAM.replace("3 \"square\"", "5 \"square\""))
+        changed = bytecode.compile_file(source_path, compiler.Compiler(2), self.directory)
+        self.assertIsNot(type(changed.callable_functions), compiler.LazyCallableTable)
+        self.assertEqual(harness.run(changed).stack, [0, "35done"])
+
+    def test_opcode_modules_invalidate(self):
+        instance = compiler.Compiler(2)
+        path = os.path.join(self.directory, "opcodes.py")
+        with open(path, "wb") as handle:
+            handle.write("def add(interp):\n    pass\n")
+
+        module = types.ModuleType("opcodes")
+        module.__file__ = path
+        fingerprinted = bytecode._fingerprinted
+        bytecode._fingerprinted = fingerprinted + (module,)
+        try:
+            data = bytecode.dumps(instance.compile_forth(PROGRAM), instance, SOURCE_HASH)
+
+            with open(path, "wb") as handle:
+                handle.write("def add(interp):\n    interp.stack.pop()\n")
+            bytecode._fingerprints.clear()
+
+            self.assertRaises(bytecode.BytecodeError, bytecode.loads, data, instance, SOURCE_HASH)
+        finally:
+            bytecode._fingerprinted = fingerprinted
+
+        self.assertIn(compiler, fingerprinted)
+        self.assertTrue(len(fingerprinted) > 1)
+
+    def test_corrupt_callables(self):
+        instance = compiler.Compiler(2)
+        data = bytecode.dumps(instance.compile_forth(PROGRAM), instance, SOURCE_HASH)
+
+        for corrupt in (data[:-3], data[:-40], data[:-1] + "\xff"):
+            try:
+                loaded = bytecode.loads(corrupt, instance, SOURCE_HASH)
+            except bytecode.BytecodeError:
+                continue
+
+            with self.assertRaises(bytecode.BytecodeError):
+                for name in ("main", "square"):
+                    loaded.callable_functions[name]
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+    test_commands.py
+
+    Tests of the command tables interpreters layer over the shared builtin commands.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import builtins
+import interpreter
+
+class CommandTableTest(unittest.TestCase):
+    def test_fresh_table(self):
+        commands = interpreter.Interpreter().commands
+        builtin_commands = interpreter.Interpreter.builtin_commands
+
+        self.assertEqual(len(commands), len(builtin_commands))
+        self.assertTrue(commands)
+        self.assertEqual(sorted(commands), sorted(builtin_commands))
+        self.assertEqual(sorted(commands.keys()), sorted(builtin_commands.keys()))
+        self.assertEqual(dict(commands), builtin_commands)
+        self.assertEqual(commands, builtin_commands)
+        self.assertEqual(repr(commands), repr(dict(builtin_commands)))
+
+    def test_changes(self):
+        interp = interpreter.Interpreter()
+        commands = interp.commands
+
+        commands["twice"] = builtins.dup
+        commands["+"] = builtins.sub
+        del commands["print"]
+
+        self.assertEqual(len(commands), len(interpreter.Interpreter.builtin_commands))
+        self.assertIs(commands["twice"], builtins.dup)
+        self.assertIs(commands["+"], builtins.sub)
+        self.assertNotIn("print", commands)
+        self.assertRaises(KeyError, lambda: commands["print"])
+        self.assertEqual(set(dict(commands)), set(commands))
+        self.assertFalse(commands.is_pristine())
+
+        # The shared builtins are left alone
+        self.assertIs(interpreter.Interpreter.builtin_commands["+"], builtins.add)
+        self.assertIn("print", interpreter.Interpreter().commands)
+
+        commands["print"] = builtins.println
+        self.assertIn("print", commands)
+
+        commands.clear()
+        self.assertEqual(len(commands), 0)
+        self.assertFalse(commands)
+        self.assertEqual(dict(commands), {})
+
+    def test_fork_copies_changes(self):
+        interp = interpreter.Interpreter()
+        interp.commands["twice"] = builtins.dup
+
+        fork = interp.fork()
+        fork.commands["thrice"] = builtins.dup
+        del fork.commands["twice"]
+
+        self.assertIn("twice", interp.commands)
+        self.assertNotIn("thrice", interp.commands)
+        self.assertNotIn("twice", fork.commands)
+
+    def test_builtins_are_read_only(self):
+        builtin_commands = interpreter.Interpreter.builtin_commands
+
+        def assign():
+            builtin_commands["+"] = builtins.sub
+
+        self.assertRaises(TypeError, assign)
+        self.assertRaises(TypeError, builtin_commands.update, {"+": builtins.sub})
+        self.assertRaises(TypeError, builtin_commands.pop, "+")
+        self.assertIs(builtin_commands["+"], builtins.add)
+
+if __name__ == "__main__":
+    unittest.main()
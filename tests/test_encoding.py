@@ -0,0 +1,65 @@
+"""
+    test_encoding.py
+
+    Tests of the opcode arrays callables are stored as and of the constant pool they share.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import array
+import unittest
+
+import harness
+
+import compiler
+
+PROGRAM = """
+:main
+    1 "1" "one" pop 1 "sum" call 5
+;
+:sum
+    "one" pop 1 + 1 +
+return
+"""
+
+class EncodingTest(unittest.TestCase):
+    def test_code_is_stored_as_arrays(self):
+        for level in (0, 2):
+            codeblock = harness.compile(PROGRAM, level)
+            for name in ("main", "sum"):
+                callable = codeblock.callable_functions[name]
+
+                self.assertIs(type(callable.code), array.array)
+                self.assertIs(type(callable.operands), array.array)
+                self.assertEqual(len(callable.code), len(callable.operands))
+                self.assertIs(callable.constants, codeblock.constants)
+
+    def test_constants_are_stored_once(self):
+        codeblock = harness.compile(PROGRAM, 0)
+        values = codeblock.constants.values
+
+        # Equal values of different types are kept apart
+        self.assertEqual(sorted(values), sorted([1, "1", "one", "sum", 5]))
+        self.assertEqual(len(values), 5)
+        self.assertIs(type(values[values.index("1")]), str)
+
+    def test_decoding(self):
+        callable = harness.compile(PROGRAM, 0).callable_functions["main"]
+        payload = callable.payload
+
+        self.assertEqual([type(op) for op in payload[:4]], [compiler.CodeNumber, compiler.CodeString, compiler.CodeString, str])
+        self.assertEqual([op.data for op in payload[:3]], [1, "1", "one"])
+        self.assertEqual(payload[6], "call")
+
+        rebuilt = compiler.Callable(payload, "main")
+        self.assertEqual(list(rebuilt.code), list(callable.code))
+        self.assertEqual([rebuilt.constants.values[operand] if operand >= 0 else None for operand in rebuilt.operands],
+            [callable.constants.values[operand] if operand >= 0 else None for operand in callable.operands])
+
+    def test_programs_run_from_the_pool(self):
+        self.assertEqual(harness.run(PROGRAM, level=0)[:3], (None, [1, "1", 3, 5], {}))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+    test_frames.py
+
+    Tests of the stacks the frame history of an interpreter rebuilds for error reports.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+PROGRAM = ":main\n 1 2 3 4 over 5 6 + pop 7 0 /\n;"
+
+STACKS = [[], [1], [1, 2], [1, 2, 3], [1, 2, 3, 4], [4, 1, 2, 3, 4], [4, 1, 2, 3, 4, 5], [4, 1, 2, 3, 4, 5, 6],
+    [4, 1, 2, 3, 4, 11], [4, 1, 2, 3, 4], [4, 1, 2, 3, 4, 7], [4, 1, 2, 3, 4, 7, 0]]
+"""
+    The stack before each operation of the program.
+"""
+
+def rebuild(setup=None, program=PROGRAM):
+    """
+        Runs a program with stack debugging enabled until it fails, then rebuilds its frames.
+    """
+
+    interp = harness.make_interpreter(setup)
+    interp.stack_debug = True
+    interp.register_codeblock(harness.compile(program, 0))
+    harness.execute(interp, "main")
+    return interp.frame_history.rebuild(interp.stack)
+
+class FrameHistoryTest(unittest.TestCase):
+    def test_operations_below_the_window(self):
+        for setup in (None, harness.threaded):
+            frames = rebuild(setup)
+
+            self.assertEqual([frame["count"] for frame in frames], range(1, len(STACKS) + 1))
+            self.assertEqual([frame["stack"] for frame in frames], STACKS)
+
+    def test_replaced_commands(self):
+        def burying(interp):
+            interp.commands["bury"] = lambda interp: interp.stack.insert(0, interp.stack.pop())
+
+        frames = rebuild(burying, ":main\n 1 2 3 4 5 bury 6 0 /\n;")
+
+        self.assertEqual([frame["stack"] for frame in frames][4:], [[1, 2, 3, 4], [1, 2, 3, 4, 5], [5, 1, 2, 3, 4],
+            [5, 1, 2, 3, 4, 6], [5, 1, 2, 3, 4, 6, 0]])
+
+if __name__ == "__main__":
+    unittest.main()
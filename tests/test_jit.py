@@ -0,0 +1,86 @@
+"""
+    test_jit.py
+
+    Tests of programs failing within code compiled by the just in time compiler.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import builtins
+
+FAILING = (
+    ":main\n 1 2 3 \"x\" +\n;",
+    ":main\n 5 0 /\n;",
+    ":main\n 1 \"a\" \"b\" +\n;",
+    ":main\n 7 \"nope\" @\n;",
+    ":main\n 3 begin 1 - dup \"q\" swap 0 = until\n;",
+    ":main\n 4 begin dup 1 - dup 0 = until 2 3 \"z\" *\n;",
+    ":main\n +\n;",
+    ":main\n 1 pop pop\n;",
+    ":main\n 1 2 + 10 + \"s\" +\n;",
+)
+"""
+    Programs failing at an inlined operation, with values held locally, drawn from the stack or both.
+"""
+
+class FailureTest(unittest.TestCase):
+    def test_failures_match_interpreter(self):
+        for source in FAILING:
+            codeblock = harness.compile(source)
+            expected = harness.run(codeblock)
+
+            interp = harness.make_interpreter(harness.jit)
+            interp.register_codeblock(codeblock)
+            result = harness.execute(interp, "main")
+
+            self.assertIsNot(expected.reason, None, source)
+            self.assertNotIn(None, interp.jit_functions.values(), source)
+            # Compiled code does not count the commands it runs
+            self.assertEqual(result._replace(command_count=None), expected._replace(command_count=None), source)
+
+PROGRAM = """
+:main
+    variable total
+    0 "total" !
+    4 begin
+        dup "total" @ + "total" !
+        1 - dup 0 =
+    until
+    "total" @ 3 +
+;
+"""
+
+class InvalidationTest(unittest.TestCase):
+    def test_replaced_commands_are_compiled_again(self):
+        def subtracting(interp):
+            interp.commands["+"] = builtins.sub
+
+        interp = harness.make_interpreter(harness.jit)
+        interp.register_codeblock(harness.compile(PROGRAM, 0))
+        self.assertEqual(harness.execute(interp, "main")[:3], harness.run(PROGRAM, level=0)[:3])
+        function = interp.jit_functions[interp.callable_functions["main"]]
+
+        subtracting(interp)
+        interp.stack = []
+        self.assertEqual(harness.execute(interp, "main")[:3], harness.run(PROGRAM, subtracting, 0)[:3])
+        self.assertIsNot(interp.jit_functions[interp.callable_functions["main"]], function)
+
+    def test_replaced_variable_tables_are_compiled_again(self):
+        interp = harness.make_interpreter(harness.jit)
+        interp.register_codeblock(harness.compile(PROGRAM))
+        expected = harness.execute(interp, "main")
+        function = interp.jit_functions[interp.callable_functions["main"]]
+
+        interp.variable_table = interp.variable_table.copy()
+        interp.stack = []
+        self.assertEqual(harness.execute(interp, "main"), expected)
+        self.assertIsNot(interp.jit_functions[interp.callable_functions["main"]], function)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+    test_lazy.py
+
+    Tests of the codeblocks compiling each definition the first time its callable is looked up.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import compiler
+
+PROGRAM = """
+( A library, most of which goes unused )
+:main
+    variable total
+    4 dup "total" ! "triple" call "total" @ + "square" call
+;
+:square
+    dup *
+return
+:triple
+    3 *
+return
+:unused
+    1 2 +
+return
+variable late
+:uses_late
+    5 "late" ! "late" @
+return
+"""
+
+BROKEN = PROGRAM + ":broken\n 1 if 2\nreturn\n"
+"""
+    The program with a definition that fails to compile.
+"""
+
+class LazyTest(unittest.TestCase):
+    def test_programs_run_the_same(self):
+        for level in (0, 2):
+            expected = harness.run(PROGRAM, None, level)
+            self.assertIs(expected.reason, None)
+
+            # Callables not loaded yet are called rather than inlined, which compiled code only counts under a budget
+            for setup in (None, harness.unlinked, harness.threaded, harness.jit, harness.memoized):
+                self.assertEqual(harness.run(PROGRAM, setup, level, "compile_lazy", 1000), harness.run(PROGRAM, setup, level, command_maximum=1000), (setup, level))
+
+    def test_callables_are_loaded_on_first_use(self):
+        codeblock = harness.compile(PROGRAM, 2, "compile_lazy")
+        callables = codeblock.callable_functions
+
+        self.assertEqual(sorted(callables), ["main", "square", "triple", "unused", "uses_late"])
+        self.assertEqual(codeblock.statistics(), {"indexed": 5, "loaded": 0, "pending": 5})
+
+        interp = harness.make_interpreter()
+        interp.register_codeblock(codeblock)
+        self.assertEqual(harness.execute(interp, "main").stack, [256])
+
+        self.assertIs(callables.is_loaded("unused"), False)
+        self.assertIs(callables.is_loaded("uses_late"), False)
+        self.assertEqual(codeblock.statistics()["pending"], 2)
+
+    def test_loaded_callables_match_compiled_ones(self):
+        compiled = harness.compile(PROGRAM).callable_functions
+        lazy = harness.compile(PROGRAM, 2, "compile_lazy").callable_functions
+
+        for name in compiled:
+            self.assertEqual(lazy[name].disassemble(), compiled[name].disassemble(), name)
+
+    def test_errors_are_raised_on_first_use(self):
+        codeblock = harness.compile(BROKEN, 2, "compile_lazy")
+
+        self.assertEqual(harness.run(codeblock).stack, [256])
+        self.assertRaises(compiler.CompilerError, codeblock.callable_functions.__getitem__, "broken")
+        self.assertRaises(compiler.CompilerError, harness.compile, BROKEN)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+"""
+    test_linker.py
+
+    Tests of the calls the linker resolves in the copies interpreters make of registered codeblocks.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import compiler
+import interpreter
+
+PROGRAM = """
+:main
+    0 "i" !
+    begin
+        "i" @ "square" call "count" call pop
+        "i" @ 1 + "i" !
+        "i" @ 4 =
+    until
+    3 "square" call
+;
+:square
+    dup *
+return
+:count
+    "square" call "i" @ +
+return
+"""
+
+RECURSIVE = """
+:main
+    12 "countdown" call
+;
+:countdown
+    dup 0 = if depth return then
+    1 - "countdown" call
+return
+"""
+"""
+    A program counting down by tail calling itself, looking at the depth of the call stack at the end.
+"""
+
+def depth(depths):
+    """
+        Produces a setup providing a depth command that adds the depth of the call stack to a list, with
+        the tail call left to the linker.
+    """
+
+    def setup(interp):
+        interp.commands["depth"] = lambda interp: depths.append(len(interp.call_stack))
+        interp.inline_threshold = 0
+    return setup
+
+class LinkerTest(unittest.TestCase):
+    def test_codeblock_is_left_alone(self):
+        codeblock = harness.compile(PROGRAM)
+        code = list(codeblock.callable_functions["main"].code)
+
+        interp = interpreter.Interpreter()
+        interp.register_codeblock(codeblock)
+
+        self.assertEqual(list(codeblock.callable_functions["main"].code), code)
+        self.assertNotEqual(list(interp.callable_functions["main"].code), code)
+        self.assertIs(interp.callable_functions["main"].origin, codeblock.callable_functions["main"])
+
+    def test_replaced_callables_are_called(self):
+        interp = interpreter.Interpreter()
+        interp.register_codeblock(harness.compile(PROGRAM))
+        interp.execute(interp.callable_functions["main"])
+        self.assertEqual(interp.stack, [9])
+
+        interp.register_codeblock(harness.compile(":square\n 100 +\nreturn\n"))
+        interp.stack = []
+        interp.execute(interp.callable_functions["main"])
+        self.assertEqual(interp.stack, [103])
+
+    def test_pending_callables_are_not_loaded(self):
+        codeblock = harness.compile(PROGRAM + ":unused\n 1\nreturn\n", 2, "compile_lazy")
+
+        interp = interpreter.Interpreter()
+        interp.register_codeblock(codeblock)
+        self.assertEqual(codeblock.statistics()["loaded"], 0)
+
+        interp.execute(codeblock.callable_functions["main"])
+        self.assertEqual(interp.stack, [9])
+        self.assertEqual(codeblock.statistics()["pending"], 1)
+
+    def test_callables_are_inlined_at_default_level(self):
+        interp = interpreter.Interpreter()
+        interp.register_codeblock(compiler.Compiler().compile_forth(":leaf\n 2 +\nreturn\n;\n:main\n 1 \"leaf\" call\n;"))
+
+        main = interp.callable_functions["main"]
+        self.assertEqual(main.inlined, frozenset(["leaf"]))
+        self.assertNotIn("call-direct", [op.name for op in main.payload if type(op) is compiler.CodeSuperinstruction])
+
+        interp.execute(main)
+        self.assertEqual(interp.stack, [3])
+
+    def test_errors_in_inlined_code_name_their_callable(self):
+        codeblock = harness.compile(":inner\n \"s3\" strcat 2 *\nreturn\n;\n:main\n 3 0 \"inner\" call\n;", 0)
+
+        for setup in (harness.unlinked, harness.linked):
+            interp = harness.make_interpreter(setup)
+            interp.register_codeblock(codeblock)
+
+            try:
+                interp.execute(interp.callable_functions["main"])
+            except interpreter.InterpreterRuntimeError as e:
+                self.assertEqual((e.callable.name, e.instruction_pointer), ("inner", 3))
+                self.assertIn("Final Instruction Pointer: 3 in callable 'inner'", str(e))
+            else:
+                self.fail("The program did not fail")
+
+        self.assertEqual(interp.callable_functions["main"].inlined, frozenset(["inner"]))
+
+    def test_linked_code_is_charged_like_calls(self):
+        for level in (0, 2):
+            codeblock = harness.compile(PROGRAM, level)
+            expected = harness.run(codeblock, harness.unlinked)
+            self.assertEqual(harness.run(codeblock, harness.linked), expected)
+
+            # Linked code is laid out differently, so the operations programs fail at are not compared
+            for command_maximum in range(1, expected.command_count + 2):
+                expected = harness.run(codeblock, harness.unlinked, command_maximum=command_maximum)
+                self.assertEqual(harness.run(codeblock, harness.linked, command_maximum=command_maximum)[:4], expected[:4])
+
+    def test_tail_calls_under_budgets(self):
+        codeblock = harness.compile(RECURSIVE, 0)
+        unlinked_depths = []
+        linked_depths = []
+
+        def unlinked(interp):
+            depth(unlinked_depths)(interp)
+            harness.unlinked(interp)
+
+        def memoized(interp):
+            depth(linked_depths)(interp)
+            harness.memoized(interp)
+
+        for setup in (depth(linked_depths), memoized):
+            expected = harness.run(codeblock, unlinked)
+            for command_maximum in [0] + range(1, expected.command_count + 2):
+                expected = harness.run(codeblock, unlinked, command_maximum=command_maximum)
+                self.assertEqual(harness.run(codeblock, setup, command_maximum=command_maximum)[:4], expected[:4], command_maximum)
+
+        # The linked calls replace each other rather than stacking up
+        self.assertEqual(set(unlinked_depths), set([13]))
+        self.assertEqual(set(linked_depths), set([1]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+    test_memoization.py
+
+    Tests of calls of pure callables answered from their result caches.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import interpreter
+
+PROGRAM = """
+:main
+    variable i
+    0 "i" !
+    begin
+        "i" @ 3 % "fib" call pop
+        "i" @ 1 + "i" !
+        "i" @ 12 =
+    until
+    6 "fib" call
+;
+:fib
+    dup 1 < if
+        dup 1 - "fib" call swap 2 - "fib" call +
+    then
+return
+"""
+
+class MemoizationTest(unittest.TestCase):
+    def test_hits_are_charged_like_calls(self):
+        for level in (0, 2):
+            codeblock = harness.compile(PROGRAM, level)
+            expected = harness.run(codeblock)
+            self.assertEqual(harness.run(codeblock, harness.memoized), expected)
+
+            for command_maximum in range(1, expected.command_count + 2):
+                self.assertEqual(harness.run(codeblock, harness.memoized, command_maximum=command_maximum), harness.run(codeblock, command_maximum=command_maximum))
+
+    def test_tail_calls_are_charged_like_calls(self):
+        def setup(interp):
+            harness.memoized(interp)
+            interp.inline_threshold = 0
+
+        def linked(interp):
+            interp.inline_threshold = 0
+
+        programs = (":leaf\n 2\nreturn\n:outer\n 1 \"leaf\" call\nreturn\n:main\n \"outer\" call \"outer\" call \"outer\" call\n;",
+                    ":c\n 3 +\nreturn\n:b\n 2 * \"c\" call\nreturn\n:a\n 1 + \"b\" call\nreturn\n:main\n 1 \"a\" call 1 \"a\" call 2 \"b\" call 1 \"a\" call\n;")
+
+        for program in programs:
+            for level in (0, 2):
+                codeblock = harness.compile(program, level)
+                expected = harness.run(codeblock, linked, command_maximum=100)
+                self.assertEqual(harness.run(codeblock, setup, command_maximum=100), expected)
+
+                for command_maximum in range(1, expected.command_count + 2):
+                    self.assertEqual(harness.run(codeblock, setup, command_maximum=command_maximum), harness.run(codeblock, linked, command_maximum=command_maximum))
+
+    def test_replaced_callables_are_not_answered(self):
+        interp = harness.make_interpreter(harness.memoized)
+        interp.register_codeblock(harness.compile(":square\n dup *\nreturn\n:main\n 3 \"square\" call\n;"))
+        interp.execute(interp.callable_functions["main"])
+        self.assertEqual(interp.stack, [9])
+
+        interp.register_codeblock(harness.compile(":square\n 100 +\nreturn\n"))
+        interp.stack = []
+        interp.execute(interp.callable_functions["main"])
+        self.assertEqual(interp.stack, [103])
+
+    def test_replaced_commands_are_not_answered(self):
+        interp = harness.make_interpreter(harness.memoized)
+        interp.register_codeblock(harness.compile(":double\n 2 *\nreturn\n:main\n 3 \"double\" call\n;", 0))
+        interp.execute(interp.callable_functions["main"])
+        self.assertEqual(interp.stack, [6])
+
+        interp.commands["*"] = lambda interp: interp.stack.append(interp.stack.pop() + interp.stack.pop())
+        interp.stack = []
+        interp.execute(interp.callable_functions["main"])
+        self.assertEqual(interp.stack, [5])
+
+    def test_pending_calls_are_dropped(self):
+        interp = harness.make_interpreter(harness.memoized, 5)
+        interp.inline_threshold = 0
+        interp.register_codeblock(harness.compile(":slow\n 1 + 1 + 1 +\nreturn\n:main\n 3 \"slow\" call\n;", 0))
+        self.assertRaises(interpreter.InterpreterRuntimeError, interp.execute, interp.callable_functions["main"])
+        self.assertNotEqual(interp.memo_pending, [])
+
+        interp.prepare(interp.callable_functions["main"])
+        self.assertEqual(interp.memo_pending, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+"""
+    test_modes.py
+
+    Differential tests running the same programs in every execution mode of the interpreter and comparing
+    what they leave behind with a plain run.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+PROGRAMS = {
+    "nested-loops": """
+:main
+    0 "total" !
+    0 "i" !
+    begin
+        0 "j" !
+        begin
+            "total" @ "i" @ "j" @ * + "total" !
+            "j" @ 1 + "j" !
+            "j" @ 7 =
+        until
+        "i" @ 1 + "i" !
+        "i" @ 5 =
+    until
+;
+""",
+
+    "recursion": """
+:main
+    0 "i" !
+    begin
+        "i" @ "fib" call
+        "i" @ 1 + "i" !
+        "i" @ 8 =
+    until
+    6 "fib" call
+;
+:fib
+    dup 1 < if
+        dup 1 - "fib" call
+        swap 2 - "fib" call +
+    then
+return
+""",
+
+    "tail-calls": """
+:main
+    12 "countdown" call
+    5 "square" call
+;
+:countdown
+    dup 0 = if
+        return
+    then
+    1 - "countdown" call
+return
+:square
+    dup *
+return
+""",
+
+    "strings": """
+:main
+    "" "text" !
+    0 "j" !
+    begin
+        "text" @ "j" @ strcat "," strcat "text" !
+        "j" @ 1 + "j" !
+        "j" @ 6 =
+    until
+    "text" @ "!" strcat
+;
+""",
+
+    "variables-declared": """
+:main
+    variable a variable b variable c variable i
+    0 "a" ! 1 "b" ! 2 "c" !
+    0 "i" !
+    begin
+        "a" @ "b" @ + "c" !
+        "b" @ "c" @ + "a" !
+        "c" @ "a" @ - "b" !
+        "a" @ 1000 % "a" !
+        "i" @ 1 + "i" !
+        "i" @ 20 =
+    until
+;
+""",
+
+    "variables-local": """
+:main
+    local a local b
+    3 "a" ! 4 "b" !
+    "a" @ "b" @ "hypot" call
+    "a" @ "b" @ -
+;
+:hypot
+    local x
+    dup * swap dup * + "x" !
+    "x" @ 2 /
+return
+""",
+
+    "mixed": """
+:main
+    variable n
+    4 "n" !
+    "n" @ "twice" call "n" @ "twice" call =
+    "label" "n" @ strcat
+    7 2 % 7 2 / over rot
+;
+:twice
+    2 *
+return
+""",
+
+    "type-error": """
+:main
+    1 2 "increment" call
+;
+:increment
+    1 + "x" +
+return
+""",
+
+    "division-by-zero": """
+:main
+    variable d
+    0 "d" !
+    5 "half" call 10 "d" @ /
+;
+:half
+    2 /
+return
+""",
+
+    "unknown-variable": """
+:main
+    1 2 + "nowhere" @
+;
+""",
+
+    "tail-call-failure": """
+:main
+    3 "outer" call
+;
+:outer
+    0 "inner" call
+return
+:inner
+    "s3" strcat 2 *
+return
+;
+""",
+
+    "stack-underflow": """
+:main
+    1 "drop-two" call
+;
+:drop-two
+    pop pop
+return
+""",
+}
+"""
+    The programs every mode runs, as a dictionary of name to source. Each runs its main callable, and the
+    last few fail partway through.
+"""
+
+MODES = (
+    ("regular", 0, "compile_forth", harness.unlinked),
+    ("optimized", 2, "compile_forth", harness.unlinked),
+    ("linked", 2, "compile_forth", harness.linked),
+    ("lazy", 2, "compile_lazy", harness.linked),
+    ("jit", 2, "compile_forth", harness.jit),
+    ("threaded", 2, "compile_forth", harness.threaded),
+    ("integer", 2, "compile_forth", harness.integer),
+    ("memoized", 2, "compile_forth", harness.memoized),
+)
+"""
+    The modes each program runs in, as tuples of the name of the mode, the optimization level of the
+    compiler, the compiler method producing the codeblock and the function setting up the interpreter.
+    The first is the plain run the others are compared with.
+"""
+
+class ModeTest(unittest.TestCase):
+    def test_modes_match(self):
+        # Only the error, the stack and the variables are compared, as the modes run different code
+        for name, source in sorted(PROGRAMS.items()):
+            expected = harness.run(source, MODES[0][3], MODES[0][1], MODES[0][2])
+
+            for mode, level, method, setup in MODES[1:]:
+                self.assertEqual(harness.run(source, setup, level, method)[:3], expected[:3], "%s in %s mode" % (name, mode))
+
+    def test_counts_match(self):
+        # Compiled code does not count the commands it runs, and the optimizations change how many a program runs,
+        # so every other mode is compared with a plain run of the same compiled code
+        for name, source in sorted(PROGRAMS.items()):
+            for mode, level, method, setup in MODES[1:]:
+                if setup is harness.jit:
+                    continue
+
+                expected = harness.run(source, harness.unlinked, level)
+                self.assertEqual(harness.run(source, setup, level, method)[:4], expected[:4], "%s in %s mode" % (name, mode))
+
+    def test_budgets_match(self):
+        # The optimizations change how many commands a program runs, so each mode is compared with a plain
+        # run of the same compiled code
+        for name, source in sorted(PROGRAMS.items()):
+            for command_maximum in (1, 7, 40):
+                for mode, level, method, setup in MODES[1:]:
+                    expected = harness.run(source, harness.unlinked, level, command_maximum=command_maximum)
+                    result = harness.run(source, setup, level, method, command_maximum)
+                    self.assertEqual(result[:4], expected[:4], "%s in %s mode within %u commands" % (name, mode, command_maximum))
+
+if __name__ == "__main__":
+    unittest.main()
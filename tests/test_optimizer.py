@@ -0,0 +1,84 @@
+"""
+    test_optimizer.py
+
+    Tests of the peephole optimizer and the superinstructions it fuses operations into.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import compiler
+
+PROGRAMS = (
+    ":main\n 2 3 + 4 *\n;",
+    ":main\n 7 dup * 1 swap pop 9 5 % 3 -\n;",
+    ":main\n variable x\n 6 \"x\" ! \"x\" @ 5 + \"x\" @ 2 /\n;",
+    ":main\n 1 if 2 else 3 then 4 +\n;",
+    ":main\n 0 if 2 else 3 then 4 +\n;",
+    ":main\n 0 begin 1 + dup 4 = until 2 *\n;",
+    ":main\n 1 0 /\n;",
+    ":main\n 5 0 %\n;",
+    ":main\n 2 3 + 3 jump 1 2 3\n;",
+)
+"""
+    Programs the optimizer rewrites, including ones failing at run time.
+"""
+
+def payload(source, level):
+    """
+        Compiles a program, describing the payload of its main callable with numbers as integers, strings
+        as repr strings and superinstructions as tuples of their name and operand.
+    """
+
+    result = []
+    for op in harness.compile(source, level).callable_functions["main"].payload:
+        if type(op) is compiler.CodeNumber:
+            result.append(op.data)
+        elif type(op) is compiler.CodeString:
+            result.append(repr(op.data))
+        elif type(op) is compiler.CodeSuperinstruction:
+            result.append((op.name, op.data))
+        else:
+            result.append(op)
+    return result
+
+class OptimizerTest(unittest.TestCase):
+    def test_optimized_programs_behave_the_same(self):
+        for source in PROGRAMS:
+            expected = harness.run(source, level=0)[:3]
+            for level in (1, 2):
+                for setup in (None, harness.threaded, harness.jit):
+                    self.assertEqual(harness.run(source, setup, level)[:3], expected, (source, level))
+
+    def test_constant_folding(self):
+        self.assertEqual(payload(PROGRAMS[0], 0), [2, 3, "+", 4, "*", ";"])
+        self.assertEqual(payload(PROGRAMS[0], 1), [20])
+        self.assertEqual(payload(PROGRAMS[1], 1), [7, "dup", "*", 1, "swap", "pop", 1])
+
+        # Divisions by zero are left to fail at run time
+        self.assertEqual(payload(PROGRAMS[6], 2), [1, 0, "/"])
+        self.assertEqual(payload(PROGRAMS[7], 2), [5, 0, "%"])
+
+    def test_superinstructions(self):
+        self.assertEqual(payload(PROGRAMS[1], 2), [7, ("dup*", None), 1, ("nip", None), 1])
+        self.assertEqual(payload(PROGRAMS[5], 2), [0, ("literal+", 1), "dup", 4, "=", "until", ("literal*", 2)])
+        self.assertEqual([op[0] for op in payload(PROGRAMS[2], 2)[1:]], ["global!", "global@", "literal+", "global@", "literal/"])
+
+    def test_branch_targets_are_not_fused_into(self):
+        callable = harness.compile(PROGRAMS[3], 2).callable_functions["main"]
+        target = callable.branch_targets[callable.payload.index("else")]
+
+        # The then lands on the 4, so it is fused with the + after it rather than folded with the 3 before it
+        self.assertEqual(payload(PROGRAMS[3], 2), [1, "if", 2, "else", 3, ("literal+", 4)])
+        self.assertEqual(target, 5)
+
+    def test_relative_jumps_disable_the_optimizer(self):
+        self.assertEqual(payload(PROGRAMS[8], 2), payload(PROGRAMS[8], 0))
+
+if __name__ == "__main__":
+    unittest.main()
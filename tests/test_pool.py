@@ -0,0 +1,89 @@
+"""
+    test_pool.py
+
+    Tests of the interpreters handed out by an interpreter pool.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import builtins
+import pool
+
+PROGRAM = """
+:main
+    variable total
+    0 "total" !
+    4 begin
+        dup "total" @ + "total" !
+        1 - dup 0 =
+    until
+    "total" @ 3 "square" call +
+;
+:square
+    dup *
+return
+"""
+
+MODES = (None, harness.threaded, harness.jit, harness.integer, harness.memoized)
+"""
+    The execution modes the pooled interpreters run in.
+"""
+
+def settings(setup):
+    """
+        Produces the pool settings of an execution mode.
+    """
+
+    interp = harness.make_interpreter(setup)
+    return dict((name, getattr(interp, name)) for name in ("command_maximum", "stack_debug", "threaded", "jit_threshold", "integer_stack", "memoize"))
+
+class PoolTest(unittest.TestCase):
+    def test_released_interpreters_are_reset(self):
+        interpreters = pool.InterpreterPool(settings(None), [harness.compile(PROGRAM)], 1)
+
+        with interpreters.interpreter() as interp:
+            interp.global_variables["left"] = 1
+            interp.stack_debug = True
+            interp.scratch = True
+            self.assertEqual(harness.execute(interp, "main").stack, [0, 19])
+
+        with interpreters.interpreter() as reused:
+            self.assertIs(reused, interp)
+            self.assertEqual(reused.stack, [])
+            self.assertEqual(reused.variables(), {})
+            self.assertIs(reused.stack_debug, False)
+            self.assertFalse(hasattr(reused, "scratch"))
+
+        self.assertEqual(interpreters.created, 1)
+        self.assertEqual(interpreters.acquired, 2)
+
+    def test_overridden_words_are_restored(self):
+        def subtracting(interp):
+            interp.commands["+"] = builtins.sub
+
+        for setup in MODES:
+            codeblock = harness.compile(PROGRAM, 0)
+            expected = harness.run(codeblock, setup)[:3]
+            interpreters = pool.InterpreterPool(settings(setup), [codeblock], 1)
+
+            # Warm up the caches of the mode with the builtins, then with the override
+            for attempt in range(2):
+                self.assertEqual(interpreters.run("main"), expected[1])
+
+            with interpreters.interpreter() as interp:
+                subtracting(interp)
+                self.assertEqual(harness.execute(interp, "main")[:3], harness.run(codeblock, subtracting)[:3])
+
+            with interpreters.interpreter() as reused:
+                self.assertIs(reused, interp)
+                self.assertIs(reused.commands["+"], builtins.add)
+                self.assertEqual(harness.execute(reused, "main")[:3], expected)
+
+if __name__ == "__main__":
+    unittest.main()
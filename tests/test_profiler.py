@@ -0,0 +1,101 @@
+"""
+    test_profiler.py
+
+    Tests of the profile the profiler accounts the operations of a program to.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import itertools
+import unittest
+
+import harness
+
+import profiler
+
+PROGRAM = """
+:main
+    3 "square" call "square" call 1 +
+;
+:square
+    dup *
+return
+"""
+
+def profiled(instance, setup=None):
+    """
+        Produces a setup profiling the calls of a program with the given profiler, on top of another setup.
+    """
+
+    def profile(interp):
+        if setup is not None:
+            setup(interp)
+        harness.unlinked(interp)
+        interp.profiler = instance
+    return profile
+
+def ticking():
+    """
+        Produces a clock advancing by 10 nanoseconds every time it is read.
+    """
+
+    return itertools.count(0, 10).next
+
+class ProfilerTest(unittest.TestCase):
+    def test_profiled_programs_run_the_same(self):
+        for setup in (None, harness.threaded, harness.jit):
+            instance = profiler.Profiler()
+            outcome = harness.run(PROGRAM, profiled(instance, setup), 0)
+
+            self.assertEqual(outcome, harness.run(PROGRAM, profiled(None), 0))
+            self.assertEqual(sum(count for count, elapsed in instance.opcodes.values()), outcome.command_count)
+
+    def test_operations_are_accounted(self):
+        instance = profiler.Profiler(ticking())
+        harness.run(PROGRAM, profiled(instance), 0)
+        summary = instance.summary()
+
+        self.assertEqual(dict((entry["name"], entry["count"]) for entry in summary["callables"]), {"main": 8, "square": 6})
+        self.assertEqual(dict((entry["name"], entry["count"]) for entry in summary["opcodes"]),
+            {"<number>": 2, "<string>": 2, "call": 2, "dup": 2, "*": 2, "return": 2, "+": 1, ";": 1})
+        # The instructions took as long as each other, so their order is not defined
+        self.assertEqual(sorted((entry["eip"], entry["operation"], entry["count"]) for entry in summary["instructions"] if entry["callable"] == "square"),
+            [(0, "dup", 2), (1, "*", 2), (2, "return", 2)])
+
+        # Every operation took one tick
+        self.assertEqual(instance.folded_stacks(), "main 80\nmain;square 60")
+        self.assertIn("square                        6 calls           60 ns  42.86%", instance.report())
+
+    def test_profiles_accumulate_until_reset(self):
+        instance = profiler.Profiler(ticking())
+        for attempt in range(2):
+            harness.run(PROGRAM, profiled(instance), 0)
+        self.assertEqual(instance.folded_stacks(), "main 160\nmain;square 120")
+
+        instance.reset()
+        self.assertEqual(instance.summary(), {"opcodes": [], "callables": [], "instructions": []})
+
+    def test_dump(self):
+        instance = profiler.Profiler(ticking())
+        harness.run(PROGRAM, profiled(instance), 0)
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "profile.json")
+            instance.dump(path)
+            with open(path) as handle:
+                dumped = json.load(handle)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(dumped["stacks"], [{"stack": ["main"], "nanoseconds": 80}, {"stack": ["main", "square"], "nanoseconds": 60}])
+        self.assertEqual(len(dumped["instructions"]), 11)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+    test_ropes.py
+
+    Tests of the ropes strcat builds long strings as, and of the strings leaving the interpreter.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import ropes
+
+PROGRAM = """
+:main
+    variable text
+    "" "text" !
+    0 begin
+        "text" @ "0123456789abcdef0123456789abcdef" strcat "text" !
+        1 + dup 64 =
+    until
+    "text" @ "!" strcat
+;
+"""
+
+FAILING = PROGRAM.replace("\"!\" strcat\n;", "\"!\" strcat 1 +\n;")
+"""
+    The program failing once it built its strings.
+"""
+
+def plain(values):
+    """
+        Returns whether none of the values is a rope.
+    """
+
+    return all(type(value) is not ropes.Rope for value in values)
+
+class RopeTest(unittest.TestCase):
+    def test_ropes_behave_as_strings(self):
+        first = ropes.concatenate("a" * ropes.MINIMUM_LENGTH, "b")
+        second = ropes.concatenate(first, "c")
+        branch = ropes.concatenate(first, "d")
+
+        self.assertIs(type(first), ropes.Rope)
+        self.assertEqual(second, "a" * ropes.MINIMUM_LENGTH + "bc")
+        self.assertEqual(branch, "a" * ropes.MINIMUM_LENGTH + "bd")
+        self.assertEqual(first, "a" * ropes.MINIMUM_LENGTH + "b")
+        self.assertEqual(len(second), ropes.MINIMUM_LENGTH + 2)
+        self.assertEqual(hash(second), hash(str(second)))
+        self.assertIs(type(ropes.concatenate("a", "b")), str)
+
+    def test_completed_programs_leave_strings(self):
+        text = "0123456789abcdef0123456789abcdef" * 64
+        for setup in (None, harness.threaded, harness.jit):
+            outcome = harness.run(PROGRAM, setup)
+
+            self.assertEqual(outcome.stack, [64, text + "!"], setup)
+            self.assertEqual(outcome.variables, {"text": text})
+            self.assertTrue(plain(outcome.stack) and plain(outcome.variables.values()))
+
+    def test_failed_programs_leave_strings(self):
+        interp = harness.make_interpreter()
+        interp.register_codeblock(harness.compile(FAILING))
+        outcome = harness.execute(interp, "main")
+
+        self.assertIsNot(outcome.reason, None)
+        self.assertTrue(plain(interp.stack))
+        self.assertTrue(plain(interp.global_variables.values()))
+        self.assertTrue(plain(interp.global_slots))
+
+    def test_cycles_leave_strings(self):
+        interp = harness.make_interpreter()
+        interp.register_codeblock(harness.compile(PROGRAM))
+        interp.cycle_ops = 50
+        interp.prepare(interp.callable_functions["main"])
+
+        while interp.update() is False:
+            self.assertTrue(plain(interp.stack))
+            self.assertTrue(plain(interp.global_variables.values()))
+            self.assertTrue(plain(interp.variables().values()))
+        self.assertEqual(interp.stack, harness.run(PROGRAM).stack)
+
+if __name__ == "__main__":
+    unittest.main()
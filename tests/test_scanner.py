@@ -0,0 +1,72 @@
+"""
+    test_scanner.py
+
+    Tests of the tokens the compiler scans its input into.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import compiler
+
+SOURCE = "\n\n:main\n 1 -2 +3 \"a b\" \"\" x\t\"y\" 4 ( note\n more ) 5 -x\n ( unterminated \"s\"\n;"
+
+TOKENS = [
+    (compiler.TOKEN_DEFINITION, "main", 1, 0),
+    (compiler.TOKEN_NUMBER, 1, 2, 0),
+    (compiler.TOKEN_NUMBER, -2, 2, 2),
+    (compiler.TOKEN_NUMBER, 3, 2, 5),
+    (compiler.TOKEN_STRING, "a b", 2, 8),
+    (compiler.TOKEN_STRING, "", 2, 13),
+    (compiler.TOKEN_WORD, "x", 2, 17),
+    (compiler.TOKEN_STRING, "y", 2, 19),
+    (compiler.TOKEN_NUMBER, 4, 2, 22),
+    (compiler.TOKEN_NUMBER, 5, 2, 26),
+    (compiler.TOKEN_WORD, "-x", 2, 28),
+    (compiler.TOKEN_WORD, "(", 3, 0),
+    (compiler.TOKEN_WORD, "unterminated", 3, 2),
+    (compiler.TOKEN_STRING, "s", 3, 15),
+    (compiler.TOKEN_WORD, ";", 4, 0),
+]
+"""
+    The kind, value, line number and position of each token of the source. The comment spanning lines
+    joins them, and the parenthesis that is never closed is a word.
+"""
+
+def describe(tokens):
+    """
+        Describes tokens by their kind, value, line number and position.
+    """
+
+    return [(token.kind, token.value, token.line, token.start) for token in tokens]
+
+class ScannerTest(unittest.TestCase):
+    def test_tokens(self):
+        self.assertEqual(describe(compiler.Compiler().scan(SOURCE)), TOKENS)
+
+    def test_chunks(self):
+        instance = compiler.Compiler()
+
+        # Comments and lines split across chunks are put back together
+        for size in (1, 2, 3, 7, 16):
+            chunks = [SOURCE[start:start + size] for start in range(0, len(SOURCE), size)]
+            tokens = []
+            for line_tokens in instance.scan_lines(instance.strip_comments(chunks)):
+                tokens.extend(line_tokens)
+            self.assertEqual(describe(tokens), TOKENS, size)
+
+    def test_plain_lines(self):
+        instance = compiler.Compiler()
+        plain = instance.scan_line("1 -2 dup \"x\" +5 - 007", 1)
+        spaced = instance.scan_line("1\t-2 dup \t\"x\"  +5 -\t007", 1)
+
+        self.assertEqual([(token.kind, token.value) for token in plain], [(token.kind, token.value) for token in spaced])
+        self.assertEqual([token.value for token in plain], [1, -2, "dup", "x", 5, "-", 7])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+    test_scheduler.py
+
+    Tests of time slicing programs with the cooperative scheduler.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import scheduler
+
+PROGRAM = """
+:main
+    0 begin
+        1 + dup 50 =
+    until
+;
+"""
+
+class Clock(object):
+    """
+        A clock advancing by a fixed step every time it is read, besides when told to.
+    """
+
+    def __init__(self, step=0.0):
+        self.time = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.time = self.time + self.step
+        return self.time
+
+def add(instance, source=PROGRAM, **arguments):
+    """
+        Adds a program to a scheduler on an interpreter of its own.
+    """
+
+    interp = harness.make_interpreter()
+    interp.register_codeblock(harness.compile(source))
+    return instance.add(interp, interp.callable_functions["main"], **arguments)
+
+def run(instance):
+    """
+        Runs the eligible programs of a scheduler until none is left, producing the order they ran in.
+    """
+
+    order = []
+    program = instance.step()
+    while program is not None:
+        order.append(program)
+        program = instance.step()
+    return order
+
+class SchedulerTest(unittest.TestCase):
+    def test_programs_take_turns(self):
+        instance = scheduler.Scheduler(10, Clock(0.001))
+        first = add(instance)
+        second = add(instance)
+        order = run(instance)
+
+        self.assertEqual(order[:6], [first, second, first, second, first, second])
+        self.assertEqual(len(order), first.slices + second.slices)
+        for program in (first, second):
+            self.assertEqual(program.state, "finished")
+            self.assertEqual(program.interpreter.stack, harness.run(PROGRAM).stack)
+            self.assertEqual(program.operations, harness.run(PROGRAM).command_count)
+        self.assertEqual(instance.stats()["finished"], 2)
+        self.assertEqual(instance.stats()["active"], 0)
+
+    def test_priorities_run_longer_slices_first(self):
+        clock = Clock()
+        instance = scheduler.Scheduler(10, clock)
+        low = add(instance)
+        high = add(instance, priority=3)
+        clock.step = 0.001
+
+        self.assertIs(instance.step(), high)
+        self.assertEqual(high.operations, 30)
+
+        # Having run, the program waits behind the one that was eligible before it
+        self.assertIs(instance.step(), low)
+        self.assertEqual(low.operations, 10)
+        self.assertIs(instance.step(), high)
+        self.assertRaises(ValueError, add, instance, priority=0)
+
+    def test_budgets_and_failures_end_programs(self):
+        finished = []
+        instance = scheduler.Scheduler(10, Clock())
+        instance.on_finish = finished.append
+        exhausted = add(instance, budget=25)
+        failed = add(instance, ":main\n 1 0 /\n;")
+        removed = add(instance)
+        completed = add(instance)
+        instance.remove(removed)
+        run(instance)
+
+        self.assertEqual((exhausted.state, exhausted.operations), ("exhausted", 25))
+        self.assertEqual(failed.state, "failed")
+        self.assertIs(failed.error.reason.__class__, ZeroDivisionError)
+        self.assertEqual((removed.state, removed.slices), ("removed", 0))
+        self.assertEqual(completed.state, "finished")
+        self.assertEqual(set(finished), set([exhausted, failed, removed, completed]))
+
+    def test_intervals(self):
+        clock = Clock()
+        instance = scheduler.Scheduler(10, clock)
+        program = add(instance, interval=1.0)
+
+        self.assertIs(instance.step(), program)
+        self.assertIs(instance.step(), None)
+        self.assertEqual(instance.next_time(), 1.0)
+
+        clock.time = 1.0
+        self.assertIs(instance.step(), program)
+        self.assertEqual(program.slices, 2)
+
+if __name__ == "__main__":
+    unittest.main()
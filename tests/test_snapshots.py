@@ -0,0 +1,82 @@
+"""
+    test_snapshots.py
+
+    Tests of interpreter snapshots, restoring them and forking interpreters.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import builtins
+
+PROGRAM = """
+:main
+    variable count
+    "count" @ 1 + "count" !
+    0 begin
+        dup "count" @ + "total" !
+        1 + dup 5 =
+    until
+    "total" @ 10 *
+;
+"""
+
+class SnapshotTest(unittest.TestCase):
+    def test_restore_repeats_the_rest(self):
+        interp = harness.make_interpreter()
+        interp.register_codeblock(harness.compile(PROGRAM))
+        interp.global_variables["count"] = 0
+        interp.cycle_ops = 6
+
+        interp.prepare(interp.callable_functions["main"])
+        interp.update()
+        state = interp.snapshot()
+        stack = list(state.stack)
+        interp.cycle_ops = None
+
+        interp.update()
+        expected = (list(interp.stack), interp.variables())
+
+        for attempt in range(2):
+            interp.restore(state)
+            interp.update()
+            self.assertEqual((interp.stack, interp.variables()), expected)
+
+        # Restoring leaves the state as it was taken
+        self.assertEqual(state.stack, stack)
+
+    def test_forks_are_isolated(self):
+        def adding(interp):
+            interp.commands["*"] = builtins.add
+
+        for setup in (None, harness.jit, harness.threaded, harness.integer):
+            interp = harness.make_interpreter(setup)
+            interp.register_codeblock(harness.compile(PROGRAM, 0))
+            interp.global_variables["count"] = 0
+            self.assertEqual(harness.execute(interp, "main").stack, [5, 50])
+
+            fork = interp.fork()
+            adding(fork)
+            fork.stack = []
+            outcome = harness.execute(fork, "main")
+
+            self.assertEqual(outcome[:3], (None, [5, 16], {"count": 2, "total": 6}))
+            self.assertEqual(interp.variables(), {"count": 1, "total": 5})
+
+            # Nothing threaded or compiled for the parent runs in the fork
+            for name in ("threaded_callables", "jit_functions"):
+                parent = getattr(interp, name).values()
+                self.assertEqual([code for code in getattr(fork, name).values() if code is not None and any(code is other for other in parent)], [])
+
+            # The parent goes on with its own commands and variables
+            interp.stack = []
+            self.assertEqual(harness.execute(interp, "main")[:3], (None, [5, 60], {"count": 2, "total": 6}))
+            self.assertEqual(fork.variables(), {"count": 2, "total": 6})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+    test_streaming.py
+
+    Tests of compiling FORTH read incrementally from a stream.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+import StringIO
+
+import harness
+
+import compiler
+
+PROGRAM = """
+( Squares numbers
+  of the stack )
+:main
+    variable total
+    0 "total" !
+    4 begin
+        dup "square" call "total" @ + "total" !
+        1 - dup 0 =
+    until
+    "total" @ "done"
+;
+:square
+    dup * ( squared )
+return
+"""
+
+class CountingStream(object):
+    """
+        A file like object over a string keeping track of how much of it was read.
+    """
+
+    def __init__(self, text):
+        self.stream = StringIO.StringIO(text)
+        self.position = 0
+
+    def read(self, size):
+        data = self.stream.read(size)
+        self.position = self.position + len(data)
+        return data
+
+class StreamingTest(unittest.TestCase):
+    def test_streamed_programs_run_like_compiled_ones(self):
+        for level in (0, 2):
+            for chunk_size in (1, 5, 64, 65536):
+                instance = compiler.Compiler(level)
+                callables = dict((callable.name, callable) for callable in instance.compile_stream(StringIO.StringIO(PROGRAM), chunk_size))
+                codeblock = compiler.CodeBlock(callables, callables["main"].constants, instance.variables)
+
+                self.assertIs(callables["square"].constants, callables["main"].constants)
+                for setup in (None, harness.threaded, harness.jit):
+                    self.assertEqual(harness.run(codeblock, setup)[:3], harness.run(PROGRAM, setup, level)[:3])
+
+    def test_callables_are_produced_as_they_complete(self):
+        stream = CountingStream(PROGRAM + "".join(":word%u\n %u 1 +\nreturn\n" % (index, index) for index in range(100)))
+        callables = compiler.Compiler(2).compile_stream(stream, 16)
+
+        # Only the definition of main and the start of the next one have been read
+        self.assertEqual(next(callables).name, "main")
+        self.assertTrue(stream.position < PROGRAM.index(":square") + 32, stream.position)
+
+        self.assertEqual([callable.name for callable in callables], ["square"] + ["word%u" % index for index in range(100)])
+
+    def test_errors_are_raised_as_they_are_read(self):
+        callables = compiler.Compiler().compile_stream(StringIO.StringIO(":main\n 1\n;\n:broken\n 1 if 2\n;\n"))
+
+        self.assertEqual(next(callables).name, "main")
+        self.assertRaises(compiler.CompilerError, list, callables)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+    test_threaded.py
+
+    Tests of callables run as direct threaded code.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import builtins
+
+PROGRAM = """
+:main
+    variable total
+    0 "total" !
+    4 begin
+        dup "total" @ + "total" !
+        1 - dup 0 =
+    until
+    "total" @ 3 "twice" call +
+;
+:twice
+    2 *
+return
+"""
+
+class ThreadedTest(unittest.TestCase):
+    def test_threaded_matches_regular(self):
+        for level in (0, 2):
+            expected = harness.run(PROGRAM, level=level)
+            self.assertEqual(harness.run(PROGRAM, harness.threaded, level), expected)
+
+    def test_replaced_commands_are_bound_again(self):
+        def subtracting(interp):
+            interp.commands["+"] = builtins.sub
+
+        interp = harness.make_interpreter(harness.threaded)
+        interp.register_codeblock(harness.compile(PROGRAM, 0))
+        self.assertEqual(harness.execute(interp, "main"), harness.run(PROGRAM, level=0))
+
+        subtracting(interp)
+        interp.stack = []
+        self.assertEqual(harness.execute(interp, "main"), harness.run(PROGRAM, subtracting, 0))
+
+        # Going back to the builtins threads the callables once more
+        interp.commands["+"] = builtins.add
+        interp.stack = []
+        self.assertEqual(harness.execute(interp, "main"), harness.run(PROGRAM, level=0))
+
+if __name__ == "__main__":
+    unittest.main()
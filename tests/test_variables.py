@@ -0,0 +1,56 @@
+"""
+    test_variables.py
+
+    Tests of the slots declared global variables are kept in.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import compiler
+import interpreter
+
+FIRST = ":main\n variable x variable y\n 5 \"x\" ! 7 \"y\" ! \"x\" @ \"y\" @ +\n;"
+SECOND = ":other\n variable y variable z\n \"z\" @ \"z\" ! 2 \"y\" ! \"y\" @ \"z\" @ *\n;"
+
+class VariableTest(unittest.TestCase):
+    def test_tables_are_per_compiler(self):
+        harness.compile(FIRST)
+
+        self.assertEqual(compiler.Compiler(2).variables.names, [])
+
+    def test_global_variables_hold_slots(self):
+        codeblock = harness.compile(FIRST)
+
+        interp = interpreter.Interpreter()
+        interp.register_codeblock(codeblock)
+        interp.execute(interp.callable_functions["main"])
+
+        self.assertEqual(interp.stack, [12])
+        self.assertEqual(interp.global_variables, {"x": 5, "y": 7})
+
+    def test_codeblocks_are_relocated(self):
+        first = harness.compile(FIRST)
+        second = harness.compile(SECOND)
+
+        interp = interpreter.Interpreter()
+        interp.register_codeblock(first)
+        interp.register_codeblock(second)
+        interp.global_variables["z"] = 3
+        interp.execute(interp.callable_functions["other"])
+
+        self.assertEqual(interp.variable_table.names, ["x", "y", "z"])
+        self.assertEqual(interp.stack, [6])
+        self.assertEqual(interp.global_variables, {"y": 2, "z": 3})
+
+        # The original callables keep the slots of their own compiler
+        slots = [value for value in second.constants.values if type(value) is compiler.GlobalSlot]
+        self.assertEqual(sorted((slot.name, int(slot)) for slot in slots), [("y", 0), ("z", 1)])
+
+if __name__ == "__main__":
+    unittest.main()
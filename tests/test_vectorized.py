@@ -0,0 +1,93 @@
+"""
+    test_vectorized.py
+
+    Tests of running a callable over many lanes at once in the vectorized mode.
+
+    Copyright (c) 2016 Robert MacGregor
+    This software is licensed under the MIT license. Refer to LICENSE.txt for
+    more information.
+"""
+
+import unittest
+
+import harness
+
+import vectorized
+
+PROGRAM = """
+:main
+    variable total
+    0 "total" !
+    begin
+        dup "total" @ + "total" !
+        1 - dup 0 =
+    until
+    pop 100 swap / "total" @
+    dup 10 > if 1000 - else 1000 + then
+;
+"""
+
+BOTTOMS = [3, 0, 5, 2, 7]
+TOPS = [4, 1, 6, 2, 3]
+"""
+    The two initial stack slots of each lane. The second lane divides by zero.
+"""
+
+def run(source, bottom, top, level):
+    """
+        Runs a program on the stack of a single lane.
+    """
+
+    interp = harness.make_interpreter()
+    interp.register_codeblock(harness.compile(source, level))
+    interp.stack = [bottom, top]
+    return harness.execute(interp, "main")
+
+@unittest.skipIf(vectorized.numpy is None, "NumPy is not available")
+class VectorizedTest(unittest.TestCase):
+    def test_lanes_run_like_the_interpreter(self):
+        numpy = vectorized.numpy
+
+        for level in (0, 2):
+            callable = harness.compile(PROGRAM, level).callable_functions["main"]
+            result = vectorized.run_lanes(callable, stack=[numpy.array(BOTTOMS), numpy.array(TOPS)])
+
+            for lane in range(len(BOTTOMS)):
+                expected = run(PROGRAM, BOTTOMS[lane], TOPS[lane], level)
+
+                self.assertEqual(result.lane_stack(lane), expected.stack, (level, lane))
+                self.assertEqual(result.lane_variables(lane), expected.variables)
+                if expected.reason is None:
+                    self.assertEqual(result.status[lane], vectorized.LANE_FINISHED)
+                    self.assertEqual(result.command_count[lane], expected.command_count)
+                    self.assertNotIn(lane, result.errors)
+                else:
+                    self.assertEqual(result.status[lane], vectorized.LANE_FAILED)
+                    self.assertIn("Division by zero", result.errors[lane])
+
+    def test_scalar_inputs(self):
+        numpy = vectorized.numpy
+        callable = harness.compile(":main\n \"scale\" @ *\n;").callable_functions["main"]
+        result = vectorized.run_lanes(callable, stack=[numpy.arange(4)], variables={"scale": 3})
+
+        self.assertEqual([result.lane_stack(lane) for lane in range(4)], [[0], [3], [6], [9]])
+        self.assertRaises(vectorized.LaneError, vectorized.run_lanes, callable, None, [2], {"scale": 3})
+
+    def test_command_maximum(self):
+        numpy = vectorized.numpy
+        callable = harness.compile(":main\n begin 1 - dup 0 = until\n;").callable_functions["main"]
+
+        lanes = vectorized.LaneInterpreter()
+        lanes.command_maximum = 20
+        result = lanes.run(callable, stack=[numpy.array([2, 50])])
+
+        self.assertEqual(list(result.status), [vectorized.LANE_FINISHED, vectorized.LANE_FAILED])
+        self.assertEqual(result.lane_stack(0), [0])
+
+    def test_unsupported_programs(self):
+        for source in (":main\n \"text\" 1 +\n;", ":main\n 1 \"square\" call\n;\n:square\n dup *\nreturn\n"):
+            callable = harness.compile(source, 0).callable_functions["main"]
+            self.assertRaises(vectorized.LaneError, vectorized.run_lanes, callable, 2)
+
+if __name__ == "__main__":
+    unittest.main()